@@ -0,0 +1,51 @@
+# Benchmark: LLM simulations one game at a time vs many games in flight
+#
+#   python3 -m benchmarks.async_bench [num_games] [latency_ms]
+#
+# AsyncLLMStrategy plays AI-Basic through a fake client that answers every
+# request after latency_ms, standing in for the API. With one game at a
+# time a run takes about (decisions x latency); with more games in flight
+# the waits overlap, until the strategy's request limit is reached.
+
+import sys
+import time
+import asyncio
+from types import SimpleNamespace
+from crib import async_games
+from crib.ai_strategy import AsyncLLMStrategy, BasicStrategy
+
+
+class FakeAsyncClient:
+    """Answers "0,1" to every request after latency seconds."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.messages = self
+
+    async def create(self, **request):
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(content=[SimpleNamespace(text='0,1')])
+
+
+def run(num_games, latency, concurrency, max_requests):
+    llm = AsyncLLMStrategy('fake-model', 'Fake', client=FakeAsyncClient(latency), max_concurrency=max_requests)
+    results = {'p1_wins': 0, 'p2_wins': 0}
+    start = time.perf_counter()
+    async_games.run_simulation_concurrent(llm, BasicStrategy(), num_games, 121, None, results, 1,
+                                          concurrency=concurrency, db_path=None)
+    return time.perf_counter() - start, llm.stats['requests']
+
+
+def main(num_games=16, latency_ms=20):
+    latency = latency_ms / 1000
+    print('%d games, %g ms per request' % (num_games, latency_ms))
+    print('%-12s %-14s %10s %10s %12s' % ('games', 'request limit', 'seconds', 'requests', 'requests/s'))
+    for concurrency, max_requests in ((1, 1), (4, 8), (16, 8), (16, 16)):
+        seconds, requests = run(num_games, latency, concurrency, max_requests)
+        print('%-12d %-14d %10.2f %10d %12.1f' % (concurrency, max_requests, seconds, requests,
+                                                  requests / seconds))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 16,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 20)
@@ -0,0 +1,50 @@
+# Benchmark: numpy count_hands_batch vs per-call count_hand
+#
+#   python3 -m benchmarks.batch_scoring_bench [num_hands]
+
+import sys
+import random
+import time
+import numpy as np
+from card_deck import card_deck
+from crib.scoring import count_hand
+from crib.batch_scoring import count_hands_batch, keep_starter_scores
+
+
+def main(num_hands=100000):
+    rng = random.Random(0)
+    dealt = [rng.sample(range(52), 5) for _ in range(num_hands)]
+    hands = np.array([d[:4] for d in dealt])
+    starters = np.array([d[4] for d in dealt])
+    cards = [([card_deck.CARDS[i] for i in d[:4]], card_deck.CARDS[d[4]]) for d in dealt]
+
+    count_hands_batch(hands[:10], starters[:10])  # build tables
+
+    start = time.perf_counter()
+    for hand, turn_up in cards:
+        count_hand(hand, turn_up)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    count_hands_batch(hands, starters)
+    batch_time = time.perf_counter() - start
+
+    deck = card_deck.Deck()
+    deck.shuffle()
+    hand = card_deck.Hand()
+    for _ in range(6):
+        hand.receive_card(deck.deal_card())
+    start = time.perf_counter()
+    for _ in range(100):
+        keep_starter_scores(hand, 2)
+    discard_time = (time.perf_counter() - start) / 100
+
+    print('hands scored:              %d' % num_hands)
+    print('count_hand loop:           %.3f us/hand' % (loop_time / num_hands * 1e6))
+    print('count_hands_batch:         %.3f us/hand' % (batch_time / num_hands * 1e6))
+    print('speedup:                   %.1fx' % (loop_time / batch_time))
+    print('15 keeps x 46 starters:    %.2f ms/discard' % (discard_time * 1000))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
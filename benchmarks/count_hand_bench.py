@@ -0,0 +1,48 @@
+# Benchmark: table-driven count_hand vs the enumerating reference scorer
+#
+#   python3 -m benchmarks.count_hand_bench [num_hands]
+
+import sys
+import random
+import time
+from card_deck import card_deck
+from crib.scoring import count_hand, count_hand_reference, rank_table
+
+
+def make_hands(num_hands, seed=0):
+    """Return a list of (4-card list, turn up) pairs dealt from a seeded RNG."""
+    rng = random.Random(seed)
+    cards = card_deck.Deck(52).cards
+    hands = []
+    for _ in range(num_hands):
+        dealt = rng.sample(cards, 5)
+        hands.append((dealt[:4], dealt[4]))
+    return hands
+
+
+def time_scorer(scorer, hands):
+    start = time.perf_counter()
+    for hand, turn_up in hands:
+        scorer(hand, turn_up)
+    return time.perf_counter() - start
+
+
+def main(num_hands=20000):
+    hands = make_hands(num_hands)
+
+    start = time.perf_counter()
+    rank_table()
+    build_time = time.perf_counter() - start
+
+    ref_time = time_scorer(count_hand_reference, hands)
+    table_time = time_scorer(count_hand, hands)
+
+    print('hands scored:        %d' % num_hands)
+    print('table build (once):  %.1f ms' % (build_time * 1000))
+    print('reference:           %.2f us/hand' % (ref_time / num_hands * 1e6))
+    print('table-driven:        %.2f us/hand' % (table_time / num_hands * 1e6))
+    print('speedup:             %.1fx' % (ref_time / table_time))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
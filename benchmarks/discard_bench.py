@@ -0,0 +1,67 @@
+# Benchmark: OptimizedStrategy discard evaluation vs a per-starter count_hand loop
+#
+#   python3 -m benchmarks.discard_bench [num_hands]
+
+import sys
+import random
+import time
+from itertools import combinations
+from card_deck import card_deck
+from crib.scoring import count_hand, rank_table
+from crib.ai_strategy import OptimizedStrategy
+
+
+def starter_loop(hand, num_crib_cards):
+    """The pre-aggregation evaluator: every keep against all 46 starters."""
+    starters = card_deck.Deck(52).remove_cards(hand.cards).cards
+    best_keep, best_points = None, -1
+    for keep in combinations(range(hand.num_cards), hand.num_cards - num_crib_cards):
+        kept = [hand.cards[i] for i in keep]
+        points = 0
+        for s in starters:
+            points += count_hand(kept, s)
+        if points > best_points:
+            best_keep, best_points = keep, points
+    return [i for i in range(hand.num_cards) if i not in best_keep]
+
+
+def make_hands(num_hands, seed=0):
+    rng = random.Random(seed)
+    hands = []
+    for _ in range(num_hands):
+        hand = card_deck.Hand()
+        for c in rng.sample(card_deck.CARDS, 6):
+            hand.receive_card(c)
+        hands.append(hand)
+    return hands
+
+
+def main(num_hands=300):
+    hands = make_hands(num_hands)
+    rank_table()
+    strategy = OptimizedStrategy(crib_aware=False)
+    crib_strategy = OptimizedStrategy()
+
+    start = time.perf_counter()
+    loop_choices = [starter_loop(h, 2) for h in hands]
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    choices = [strategy.choose_crib_cards(h, 2) for h in hands]
+    agg_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for h in hands:
+        crib_strategy.choose_crib_cards(h, 2, is_my_crib=True)
+    crib_time = time.perf_counter() - start
+
+    print('hands:                  %d' % num_hands)
+    print('per-starter loop:       %.2f ms/discard' % (loop_time / num_hands * 1000))
+    print('rank-aggregated:        %.2f ms/discard' % (agg_time / num_hands * 1000))
+    print('speedup:                %.1fx' % (loop_time / agg_time))
+    print('identical choices:      %s' % (choices == loop_choices))
+    print('crib-aware:             %.2f ms/discard' % (crib_time / num_hands * 1000))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
@@ -0,0 +1,43 @@
+# Benchmark: precision of duplicate-deal simulations against independent
+# games for the same number of games
+#
+#   python3 -m benchmarks.duplicate_bench [num_games] [repeats]
+#
+# AI-Opt plays AI-Opt without the crib EV adjustment; games are not logged. Each mode is run repeats
+# times with different master seeds, and the spread of the estimated win
+# rates is reported next to the confidence interval half widths.
+
+import sys
+import time
+import statistics
+from crib import simulation, stats
+from crib.ai_strategy import OptimizedStrategy
+
+
+def run(num_games, master_seed, duplicate):
+    results = {'p1_wins': 0, 'p2_wins': 0}
+    simulation.run_simulation(OptimizedStrategy(), OptimizedStrategy(crib_aware=False), num_games, 121, None, results,
+                              master_seed, db_path=None, duplicate=duplicate)
+    if duplicate:
+        return stats.paired_ci(results['pair_wins'], results['pair_wins_sq'], results['pairs'])
+    return stats.proportion_ci(results['p1_wins'], results['p1_wins'] + results['p2_wins'])
+
+
+def main(num_games=1000, repeats=5):
+    for duplicate in (False, True):
+        start = time.perf_counter()
+        runs = [run(num_games, seed, duplicate) for seed in range(1, repeats + 1)]
+        elapsed = time.perf_counter() - start
+        rates = [rate for rate, _ in runs]
+        half = statistics.mean(half for _, half in runs)
+        rate = statistics.mean(rates)
+        print('%-11s %d games x %d: win rate %.1f%%  95%% CI +/- %.2f%%  spread (sd) %.2f%%  '
+              '~%d independent games  %.1fs' % (
+                  'duplicate' if duplicate else 'independent', num_games, repeats, rate * 100,
+                  half * 100, statistics.stdev(rates) * 100 if repeats > 1 else 0.0,
+                  stats.equivalent_games(rate, half), elapsed))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 5)
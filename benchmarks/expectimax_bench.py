@@ -0,0 +1,59 @@
+# Benchmark: ExpectimaxStrategy decision latency and win rate against AI-Opt
+#
+#   python3 -m benchmarks.expectimax_bench [num_games] [samples]
+#
+# Half the games are played with each strategy as player 1. Games are logged
+# to a temporary database.
+
+import os
+import sys
+import time
+import tempfile
+from crib import simulation
+from crib.ai_strategy import ExpectimaxStrategy, OptimizedStrategy
+
+
+class TimedExpectimax(ExpectimaxStrategy):
+
+    def __init__(self, samples):
+        super().__init__(samples=samples)
+        self.latencies = []
+
+    def choose_play_card(self, hand, current_count, context=None):
+        start = time.perf_counter()
+        idx = super().choose_play_card(hand, current_count, context)
+        self.latencies.append(time.perf_counter() - start)
+        return idx
+
+
+def main(num_games=200, samples=24):
+    expectimax = TimedExpectimax(samples)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            start = time.perf_counter()
+            first = {'p1_wins': 0, 'p2_wins': 0}
+            simulation.run_simulation(expectimax, OptimizedStrategy(), num_games // 2, 121, None,
+                                      first, master_seed=1)
+            second = {'p1_wins': 0, 'p2_wins': 0}
+            simulation.run_simulation(OptimizedStrategy(), expectimax, num_games - num_games // 2, 121,
+                                      None, second, master_seed=2)
+            elapsed = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+
+    wins = first['p1_wins'] + second['p2_wins']
+    latencies = sorted(expectimax.latencies)
+    print('samples per decision: %d' % samples)
+    print('decisions: %d  mean %.2f ms  p50 %.2f ms  p99 %.2f ms  max %.2f ms' % (
+        len(latencies), 1000 * sum(latencies) / len(latencies),
+        1000 * latencies[len(latencies) // 2], 1000 * latencies[int(len(latencies) * 0.99)],
+        1000 * latencies[-1]))
+    print('AI-Expectimax vs AI-Opt: won %d of %d (%.1f%%) in %.1fs' % (
+        wins, num_games, 100.0 * wins / num_games, elapsed))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 24)
@@ -0,0 +1,62 @@
+# Benchmark: per-game overhead of the terminal Interface versus the
+# NullInterface used for headless games
+#
+#   python3 -m benchmarks.interface_bench [num_games]
+#
+# The terminal interface writes escape codes; stdout is sent to /dev/null
+# while it is timed. Games are not logged.
+
+import os
+import sys
+import time
+import random
+import contextlib
+from crib import crib
+from crib.ai_strategy import OptimizedStrategy
+from interface import interface
+
+
+def per_game(num_games, make_interface, repeats=3):
+    """Seconds per game, calling make_interface for each game; the best of
+    several runs over the same seeded games."""
+    strategy = OptimizedStrategy()
+    best = None
+    for _ in range(repeats):
+        elapsed = 0.0
+        for i in range(num_games):
+            random.seed(i)
+            players = [crib.AI_Player(strategy, simulate=True), crib.AI_Player(strategy, simulate=True)]
+            start = time.perf_counter()
+            g = crib.Game(2, players, make_interface(), target_score=121, db_path=None)
+            g.play()
+            elapsed += time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / num_games
+
+
+def construct(make_interface, n=200):
+    start = time.perf_counter()
+    for _ in range(n):
+        make_interface()
+    return (time.perf_counter() - start) / n
+
+
+def main(num_games=200):
+    per_game(10, interface.NullInterface, 1)  # warm up the lazily built scoring tables
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        terminal_build = construct(interface.Interface)
+        terminal_game = per_game(num_games, interface.Interface)
+        shared = interface.Interface()
+        shared_game = per_game(num_games, lambda: shared)
+    null_build = construct(interface.NullInterface)
+    null_game = per_game(num_games, interface.NullInterface)
+
+    print('construct  Interface: %8.1f us   NullInterface: %8.2f us' % (
+        terminal_build * 1e6, null_build * 1e6))
+    for label, t in [('Interface per game', terminal_game), ('shared Interface', shared_game)]:
+        print('%-20s %8.1f us/game   NullInterface %8.1f us/game   (%.1f us saved, %.1f%%)' % (
+            label, t * 1e6, null_game * 1e6, (t - null_game) * 1e6, 100.0 * (t - null_game) / t))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
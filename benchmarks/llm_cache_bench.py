@@ -0,0 +1,46 @@
+# Benchmark: API requests saved by the persistent LLM reply cache
+#
+#   python3 -m benchmarks.llm_cache_bench [num_games] [latency_ms]
+#
+# AsyncLLMStrategy plays AI-Basic through the fake client of async_bench,
+# one game at a time, three times over the same seeded deals: without a
+# cache, with an empty cache (hits come from suit-canonical hands repeating
+# within the run) and again with the cache that run filled.
+
+import os
+import sys
+import time
+import tempfile
+from crib import async_games
+from crib.ai_strategy import AsyncLLMStrategy, BasicStrategy
+from crib.cache import DiskCache
+from benchmarks.async_bench import FakeAsyncClient
+
+
+def run(num_games, latency, cache=None):
+    llm = AsyncLLMStrategy('fake-model', 'Fake', client=FakeAsyncClient(latency))
+    llm.cache = cache
+    results = {'p1_wins': 0, 'p2_wins': 0}
+    start = time.perf_counter()
+    async_games.run_simulation_concurrent(llm, BasicStrategy(), num_games, 121, None, results, 1,
+                                          concurrency=1, db_path=None)
+    return time.perf_counter() - start, llm.stats['requests'], cache.stats()['hit_rate'] if cache else 0.0
+
+
+def main(num_games=8, latency_ms=5):
+    latency = latency_ms / 1000
+    print('%d games, %g ms per request' % (num_games, latency_ms))
+    print('%-14s %10s %10s %10s' % ('cache', 'seconds', 'requests', 'hit rate'))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'llm_cache.db')
+        for label in ('none', 'empty', 'filled'):
+            cache = None if label == 'none' else DiskCache(path)
+            seconds, requests, hit_rate = run(num_games, latency, cache)
+            if cache:
+                cache.close()
+            print('%-14s %10.2f %10d %9.1f%%' % (label, seconds, requests, hit_rate * 100))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 8,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 5)
@@ -0,0 +1,43 @@
+# Benchmark: simulation games/sec and database size for each log level,
+# for the binary game log (full detail) and with logging off
+#
+#   python3 -m benchmarks.logging_bench [num_games]
+#
+# Logged games are written to a temporary directory.
+
+import os
+import sys
+import time
+import tempfile
+from crib import simulation
+from crib.ai_strategy import OptimizedStrategy
+from logger.logger import LOG_LEVELS
+
+
+def games_per_sec(num_games, db_path, log_level='full', record_path=None, master_seed=1):
+    results = {'p1_wins': 0, 'p2_wins': 0}
+    start = time.perf_counter()
+    simulation.run_simulation(OptimizedStrategy(), OptimizedStrategy(), num_games, 121, None,
+                              results, master_seed, db_path=db_path, log_level=log_level,
+                              record_path=record_path)
+    return num_games / (time.perf_counter() - start)
+
+
+def main(num_games=100):
+    games_per_sec(10, None)  # warm up the lazily built scoring tables
+    unlogged = games_per_sec(num_games, None)
+    for level in LOG_LEVELS + ('binary',):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.db')
+            if level == 'binary':
+                rate = games_per_sec(num_games, None, record_path=path)
+            else:
+                rate = games_per_sec(num_games, path, level)
+            size = os.path.getsize(path)
+        print('%-8s %7.1f games/sec  %8.1f KB/game  (overhead %5.1f%%)' % (
+            level, rate, size / 1024.0 / num_games, 100.0 * (unlogged / rate - 1)))
+    print('%-8s %7.1f games/sec' % ('off', unlogged))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
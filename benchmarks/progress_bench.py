@@ -0,0 +1,63 @@
+# Benchmark: cost of simulation progress reporting and decision latency
+# tracking
+#
+#   python3 -m benchmarks.progress_bench [num_games]
+#
+# Times one progress call for the old print-every-game progress and the
+# throttled ProgressReporter (output to /dev/null; a real terminal is slower
+# still), against the time of a game. AI-Basic plays AI-Random to a target
+# of 61 so games are fast and overheads show. Games are not logged.
+
+import os
+import sys
+import time
+import contextlib
+from crib import simulation
+from crib.ai_strategy import BasicStrategy, RandomStrategy
+from crib.progress import ProgressReporter
+
+
+def print_every_game(game_num, total, results):
+    # the old CribInterface.show_simulation_progress
+    print('  Game %d/%d: %s %d - %s %d' % (game_num, total, 'P1', results['p1_wins'],
+                                           'P2', results['p2_wins']))
+
+
+def per_call(progress, n=100000):
+    results = {'p1_name': 'P1', 'p2_name': 'P2', 'p1_wins': 0, 'p2_wins': 0}
+    start = time.perf_counter()
+    for i in range(1, n + 1):
+        progress(i, n, results)
+    return (time.perf_counter() - start) / n
+
+
+def per_game(num_games, track_latency, repeats):
+    best = None
+    for _ in range(repeats):
+        results = {'p1_wins': 0, 'p2_wins': 0}
+        start = time.perf_counter()
+        simulation.run_simulation(BasicStrategy(), RandomStrategy(), num_games, 61, None, results, 1,
+                                  db_path=None, track_latency=track_latency)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / num_games, results
+
+
+def main(num_games=2000, repeats=5):
+    per_game(50, False, 1)  # warm up the lazily built scoring tables
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        printed = per_call(print_every_game)
+        throttled = per_call(ProgressReporter())
+    plain, _ = per_game(num_games, False, repeats)
+    tracked, results = per_game(num_games, True, repeats)
+    decisions = sum(hist.count for hist in results['latency']) / num_games
+
+    print('game                      %8.1f us' % (plain * 1e6))
+    print('print every game          %8.2f us/call  (%.1f%% of a game)' % (printed * 1e6, 100 * printed / plain))
+    print('ProgressReporter          %8.2f us/call  (%.1f%% of a game)' % (throttled * 1e6, 100 * throttled / plain))
+    print('game + latency tracking   %8.1f us  (%.1f decisions/game, %+.1f%%)' % (
+        tracked * 1e6, decisions, 100 * (tracked - plain) / plain))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
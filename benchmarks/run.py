@@ -0,0 +1,356 @@
+# Benchmark suite - seeded timings of the hot paths with JSON baselines
+#
+#   python3 -m benchmarks.run                        run every benchmark
+#   python3 -m benchmarks.run -k strategy            only names containing "strategy"
+#   python3 -m benchmarks.run --save base.json       save the timings as a baseline
+#   python3 -m benchmarks.run --compare base.json    flag slowdowns against a baseline
+#
+# Every input is built from fixed seeds, so runs on the same machine time the
+# same work. Each benchmark reports the best of --repeats runs, per operation,
+# with garbage collection off while timing.
+# With --compare the exit status is 1 if any benchmark is more than
+# --threshold percent slower than the baseline.
+
+import os
+import gc
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+from card_deck import card_deck
+from crib import crib
+from crib.ai_strategy import RandomStrategy, BasicStrategy, OptimizedStrategy, ExpectimaxStrategy
+from crib.scoring import count_hand
+from crib.simulation import RecordCollector
+from interface.interface import NullInterface
+from logger import logger
+from benchmarks.count_hand_bench import make_hands
+
+STRATEGIES = [RandomStrategy, BasicStrategy, OptimizedStrategy, ExpectimaxStrategy]
+
+
+def copy_hand(cards):
+    hand = card_deck.Hand()
+    for c in cards:
+        hand.receive_card(c)
+    return hand
+
+
+def play_game(strategies, seed, interf, **kwargs):
+    random.seed(seed)
+    players = [crib.AI_Player(s, simulate=True) for s in strategies]
+    g = crib.Game(2, players, interf, target_score=121, rng=random.Random(seed), **kwargs)
+    g.play()
+    return g
+
+
+class FrozenPlayContext:
+    """ A copy of what a crib.PlayContext showed at one decision, so the
+    decision can be replayed after the round is over. """
+
+    def __init__(self, context):
+        self.num_players = context.num_players
+        self.player_index = context.player_index
+        self.pegging = context.pegging.copy()
+        self.gos = context.gos
+        self.who_played_last = context.who_played_last
+        self._cards_left = [context.cards_left(i) for i in range(context.num_players)]
+        self._unseen = context.unseen_mask()
+
+    def cards_left(self, player_index):
+        return self._cards_left[player_index]
+
+    def unseen_mask(self):
+        return self._unseen
+
+    def unseen_cards(self):
+        return card_deck.cards_of(self._unseen)
+
+
+class RecordingStrategy(BasicStrategy):
+    """ AI-Basic that records every play decision it is asked to make. """
+
+    def __init__(self):
+        self.decisions = []
+
+    def choose_play_card(self, hand, current_count, context=None):
+        self.decisions.append((list(hand.cards), current_count, FrozenPlayContext(context)))
+        return super().choose_play_card(hand, current_count, context)
+
+
+def play_decisions(num_decisions, seed=1):
+    """(cards, count, context) for the first num_decisions play decisions
+    of seeded AI-Basic games, skipping those with only a go."""
+    recorder = RecordingStrategy()
+    game = 0
+    while True:
+        play_game([recorder, BasicStrategy()], seed * 1000 + game, NullInterface(), db_path=None)
+        game += 1
+        decisions = [d for d in recorder.decisions if any(c.value + d[1] <= 31 for c in d[0])]
+        if len(decisions) >= num_decisions:
+            return decisions[:num_decisions]
+
+
+def crib_hands(num_hands, seed=2):
+    rng = random.Random(seed)
+    cards = card_deck.Deck(52).cards
+    return [rng.sample(cards, 6) for _ in range(num_hands)]
+
+
+class PlaySequencePlayer(crib.AI_Player):
+    """ AI-Basic that records the hand index of every card it plays (-1
+    for a go), giving a Test_Player play sequence for the same deal. """
+
+    def __init__(self):
+        super().__init__(BasicStrategy(), simulate=True)
+        self.sequence = []
+
+    def play_card(self, current_count):
+        idx = self.strategy.choose_play_card(self.hand, current_count)
+        self.sequence.append(-1 if idx is None else idx)
+        return None if idx is None else self.hand.play_card(idx)
+
+
+def round_deals(num_rounds, seed=3):
+    """(hands, play sequences, crib player) for seeded deals of four cards
+    each, with the sequences AI-Basic plays them in."""
+    rng = random.Random(seed)
+    cards = card_deck.Deck(52).cards
+    deals = []
+    for i in range(num_rounds):
+        dealt = rng.sample(cards, 8)
+        hands = [dealt[:4], dealt[4:]]
+        players = [PlaySequencePlayer(), PlaySequencePlayer()]
+        for p, h in zip(players, hands):
+            p.hand = copy_hand(h)
+        crib.Round(2, players, i % 2, NullInterface()).play()
+        deals.append((hands, [p.sequence for p in players], i % 2))
+    return deals
+
+
+# Each benchmark function returns (run, ops): run() does the timed work once,
+# covering ops operations.
+
+def bench_count_hand():
+    hands = make_hands(5000)
+
+    def run():
+        for hand, turn_up in hands:
+            count_hand(hand, turn_up)
+    return run, len(hands)
+
+
+def bench_choose_crib_cards(strategy_class, num_hands):
+    hands = crib_hands(num_hands)
+
+    def run():
+        random.seed(0)
+        strategy = strategy_class()
+        for i, cards in enumerate(hands):
+            strategy.choose_crib_cards(copy_hand(cards), 2, i % 2 == 0)
+    return run, len(hands)
+
+
+def bench_choose_play_card(strategy_class, num_decisions):
+    decisions = play_decisions(num_decisions)
+
+    def run():
+        random.seed(0)
+        strategy = strategy_class()
+        for cards, count, context in decisions:
+            strategy.choose_play_card(copy_hand(cards), count, context)
+    return run, len(decisions)
+
+
+def bench_round_play():
+    deals = round_deals(500)
+
+    def run():
+        interf = NullInterface()
+        for hands, sequences, crib_player in deals:
+            players = []
+            for cards, sequence in zip(hands, sequences):
+                p = crib.Test_Player(list(sequence))
+                p.hand = copy_hand(cards)
+                players.append(p)
+            crib.Round(2, players, crib_player, interf).play()
+    return run, len(deals)
+
+
+def bench_headless_game():
+    def run():
+        interf = NullInterface()
+        for seed in range(20):
+            play_game([OptimizedStrategy(), BasicStrategy()], seed, interf, db_path=None)
+    return run, 20
+
+
+def bench_logged_game():
+    def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.db')
+            interf = NullInterface()
+            for seed in range(20):
+                play_game([OptimizedStrategy(), BasicStrategy()], seed, interf, db_path=path)
+    return run, 20
+
+
+def bench_write_game():
+    collector = RecordCollector()
+    for seed in range(20):
+        play_game([BasicStrategy(), BasicStrategy()], seed, NullInterface(), log_writer=collector)
+    records = collector.records * 10
+
+    def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+            logger._init_db(conn)
+            for i, record in enumerate(records, 1):
+                logger.write_game(conn, record)
+                if i % 64 == 0:
+                    conn.commit()
+            conn.commit()
+            conn.close()
+    return run, len(records)
+
+
+def _benchmarks():
+    """Benchmark names, in run order, with their setup functions."""
+    benches = [('scoring.count_hand', bench_count_hand)]
+    for s in STRATEGIES:
+        hands = 100 if s is ExpectimaxStrategy else 400
+        benches.append(('strategy.%s.choose_crib_cards' % s.name,
+                        lambda s=s, n=hands: bench_choose_crib_cards(s, n)))
+    for s in STRATEGIES:
+        decisions = 100 if s is ExpectimaxStrategy else 1000
+        benches.append(('strategy.%s.choose_play_card' % s.name,
+                        lambda s=s, n=decisions: bench_choose_play_card(s, n)))
+    benches += [
+        ('round.play', bench_round_play),
+        ('game.headless', bench_headless_game),
+        ('game.logged_full', bench_logged_game),
+        ('logger.write_game', bench_write_game),
+    ]
+    return benches
+
+
+BENCHMARKS = _benchmarks()
+
+
+def run_benchmarks(names=None, repeats=5, out=None):
+    """Run the named benchmarks (all by default) and return
+    {name: {'seconds_per_op', 'ops', 'repeats'}}."""
+    results = {}
+    for name, setup in BENCHMARKS:
+        if names is not None and name not in names:
+            continue
+        run, ops = setup()
+        run()  # warm up lazily built tables and caches
+        best = float('inf')
+        for _ in range(repeats):
+            # like timeit, keep garbage collection out of the timings
+            gc.collect()
+            gc.disable()
+            try:
+                start = time.perf_counter()
+                run()
+                best = min(best, time.perf_counter() - start)
+            finally:
+                gc.enable()
+        results[name] = {'seconds_per_op': best / ops, 'ops': ops, 'repeats': repeats}
+        if out:
+            out.write('%-44s %12s/op\n' % (name, format_time(best / ops)))
+            out.flush()
+    return results
+
+
+def compare(baseline, results, threshold=10.0):
+    """Compare results with a baseline. Returns rows of (name, baseline
+    seconds/op, current seconds/op, change %, regressed) for benchmarks in
+    both, where regressed means more than threshold percent slower."""
+    rows = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        before, after = base['seconds_per_op'], current['seconds_per_op']
+        change = 100.0 * (after - before) / before
+        rows.append((name, before, after, change, change > threshold))
+    return rows
+
+
+def format_time(seconds):
+    if seconds >= 1:
+        return '%.2f s' % seconds
+    if seconds >= 1e-3:
+        return '%.2f ms' % (seconds * 1e3)
+    return '%.2f us' % (seconds * 1e6)
+
+
+def save(path, results):
+    with open(path, 'w') as f:
+        json.dump({
+            'created': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.platform(),
+            'results': results,
+        }, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks.run', description=__doc__)
+    parser.add_argument('-k', dest='match', help='only run benchmarks whose name contains this')
+    parser.add_argument('--repeats', type=int, default=5, help='timed runs per benchmark, best is kept')
+    parser.add_argument('--save', metavar='FILE', help='write the results to a JSON baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare with a JSON baseline')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='percent slowdown flagged as a regression (default 10)')
+    parser.add_argument('--list', action='store_true', help='list the benchmarks and exit')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, _ in BENCHMARKS:
+            print(name)
+        return 0
+
+    baseline = load(args.compare) if args.compare else None
+    names = None
+    if args.match:
+        names = {name for name, _ in BENCHMARKS if args.match in name}
+        if not names:
+            parser.error('no benchmark matches %r' % args.match)
+
+    results = run_benchmarks(names, args.repeats, out=sys.stdout)
+    if args.save:
+        save(args.save, results)
+        print('saved %d results to %s' % (len(results), args.save))
+
+    if baseline is None:
+        return 0
+    rows = compare(baseline, results, args.threshold)
+    print()
+    print('%-44s %12s %12s %8s' % ('benchmark', 'baseline', 'current', 'change'))
+    for name, before, after, change, regressed in rows:
+        print('%-44s %12s %12s %+7.1f%%%s' % (name, format_time(before), format_time(after), change,
+                                             '  SLOWER' if regressed else ''))
+    regressions = [row for row in rows if row[4]]
+    if regressions:
+        print('\n%d of %d benchmarks more than %g%% slower than %s' % (
+            len(regressions), len(rows), args.threshold, args.compare))
+        return 1
+    print('\nno benchmark more than %g%% slower than %s' % (args.threshold, args.compare))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
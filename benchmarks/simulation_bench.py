@@ -0,0 +1,43 @@
+# Benchmark: simulation throughput for increasing worker counts
+#
+#   python3 -m benchmarks.simulation_bench [num_games] [max_workers]
+#
+# Games are logged to a temporary database.
+
+import os
+import sys
+import time
+import tempfile
+from crib import simulation
+from crib.ai_strategy import OptimizedStrategy
+
+
+def games_per_sec(num_games, workers, master_seed=1):
+    results = {'p1_wins': 0, 'p2_wins': 0}
+    start = time.perf_counter()
+    simulation.run_simulation(OptimizedStrategy(), OptimizedStrategy(), num_games, 121, None,
+                              results, master_seed, workers=workers)
+    return num_games / (time.perf_counter() - start)
+
+
+def main(num_games=100, max_workers=None):
+    max_workers = max_workers or os.cpu_count() or 1
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            base = None
+            print('cpus: %d' % (os.cpu_count() or 1))
+            workers = 1
+            while workers <= max_workers:
+                rate = games_per_sec(num_games, workers)
+                base = base or rate
+                print('workers %2d: %7.1f games/sec  (%.2fx)' % (workers, rate, rate / base))
+                workers *= 2
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+         int(sys.argv[2]) if len(sys.argv) > 2 else None)
@@ -0,0 +1,66 @@
+# Benchmark: time from launch until the strategy menu can be shown
+#
+#   python3 -m benchmarks.startup_bench [repeats]
+#
+# Each case runs in a fresh interpreter (best of repeats) and imports
+# main.py's modules, then gets the LLM strategies:
+#   no LLM             no API key: only the built in strategies
+#   fetch every launch get_llm_strategies(): import anthropic and list the
+#                      models before the menu (the old startup)
+#   cached list        ModelList with a fresh llm_models.json: no import,
+#                      no request
+#   stale cached list  ModelList with an old llm_models.json: the cached
+#                      list is used while a refresh runs in the background
+# The fetching cases need ANTHROPIC_API_KEY and network access; any key
+# will do, since a rejected request takes as long as a listing.
+
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+SETUP = "import time; start = time.perf_counter(); import main\n"
+
+CASES = [
+    ('no LLM', False, "from crib.ai_strategy import get_llm_strategies; get_llm_strategies()"),
+    ('fetch every launch', True, "from crib.ai_strategy import get_llm_strategies; get_llm_strategies()"),
+    ('cached list', True,
+     "from crib.ai_strategy import ModelList; m = ModelList(PATH); m.start_refresh(); m.strategies()"),
+    ('stale cached list', True,
+     "from crib.ai_strategy import ModelList; m = ModelList(PATH, max_age=0); m.start_refresh(); m.strategies()"),
+]
+
+
+def time_case(code, path, env, repeats):
+    script = SETUP + code.replace('PATH', repr(path)) + "\nprint(time.perf_counter() - start)\n"
+    best = float('inf')
+    for _ in range(repeats):
+        # os._exit skips joining a background refresh, as quitting the game would
+        out = subprocess.run([sys.executable, '-c', script + "import os; os._exit(0)"],
+                             env=env, capture_output=True, text=True, check=True).stdout
+        best = min(best, float(out))
+    return best
+
+
+def main(repeats=5):
+    key = os.environ.get('ANTHROPIC_API_KEY')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'llm_models.json')
+        with open(path, 'w') as f:
+            json.dump({'fetched': time.time(), 'models': [['model-%d' % i, 'Model %d' % i] for i in range(8)]}, f)
+        print('%-20s %10s' % ('startup', 'seconds'))
+        for name, needs_key, code in CASES:
+            env = dict(os.environ)
+            env.pop('ANTHROPIC_API_KEY', None)
+            if needs_key:
+                if not key:
+                    print('%-20s %10s' % (name, 'no key'))
+                    continue
+                env['ANTHROPIC_API_KEY'] = key
+            print('%-20s %10.3f' % (name, time_case(code, path, env, repeats)))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,52 @@
+# Benchmark: where simulation time goes, and the cost of tracing it
+#
+#   python3 -m benchmarks.trace_bench [num_games]
+#
+# AI-Opt plays AI-Basic with games logged at full detail to a temporary
+# database. Prints the traced timings, then the per-game time with tracing
+# off, with aggregate timings only and with every span kept and written
+# as a Chrome trace (best of repeats interleaved runs).
+
+import os
+import sys
+import time
+import tempfile
+from crib import simulation
+from crib.ai_strategy import OptimizedStrategy, BasicStrategy
+
+
+def run(num_games, db_path, trace=False, trace_path=None):
+    results = {'p1_wins': 0, 'p2_wins': 0}
+    start = time.perf_counter()
+    simulation.run_simulation(OptimizedStrategy(), BasicStrategy(), num_games, 121, None, results, 1,
+                              db_path=db_path, trace=trace, trace_path=trace_path)
+    return (time.perf_counter() - start) / num_games, results
+
+
+def main(num_games=200, repeats=3):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'log.db')
+        trace_path = os.path.join(tmp, 'trace.json')
+        run(10, db_path)  # warm up the lazily built scoring tables
+        # best of several interleaved runs
+        plain = traced = events = float('inf')
+        for _ in range(repeats):
+            plain = min(plain, run(num_games, db_path)[0])
+            t, results = run(num_games, db_path, trace=True)
+            traced = min(traced, t)
+            events = min(events, run(num_games, db_path, trace_path=trace_path)[0])
+        trace_size = os.path.getsize(trace_path)
+
+    print('%-10s %-32s %8s %10s %10s' % ('category', 'name', 'calls', 'us/game', 'mean us'))
+    for category, name, calls, total, _ in results['tracer'].summary():
+        print('%-10s %-32s %8d %10.1f %10.2f' % (category, name, calls, total / num_games * 1e6,
+                                                total / calls * 1e6))
+    print()
+    print('untraced          %8.1f us/game' % (plain * 1e6))
+    print('timings only      %8.1f us/game (%+.1f%%)' % (traced * 1e6, 100 * (traced - plain) / plain))
+    print('all spans kept    %8.1f us/game (%+.1f%%), Chrome trace %.0f KB/game' % (
+        events * 1e6, 100 * (events - plain) / plain, trace_size / 1024 / num_games))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -1,17 +1,55 @@
 # card and deck module
 
 import random
+from itertools import combinations
 
 class Card:
+    """ Immutable playing card. There is exactly one instance per suit/number,
+    so Card('H', 5) always returns the same object and cards compare and hash
+    by their integer id (0..51, in Deck order). """
+
+    __slots__ = ('suit', 'number', 'value', 'id')
 
     VALUES = ['A','2','3','4','5','6','7','8','9','10','J','Q','K']
     SUITS = ['H','S','D','C']
     SUIT_MAPPING = {'H':'\u2665', 'D':'\u2666', 'C':'\u2663', 'S':'\u2660'}
 
-    def __init__(self, suit = 'H', number = 1):
-        self.suit = suit # one of [S,H,C,D]
-        self.number = number # ace = 1 through K = 13
-        self.value = min(10,number)
+    _interned = {}
+
+    def __new__(cls, suit = 'H', number = 1):
+        try:
+            return cls._interned[(suit, number)]
+        except KeyError:
+            raise ValueError('invalid card: suit {!r}, number {!r}'.format(suit, number)) from None
+
+    @classmethod
+    def _intern(cls, suit, number):
+        card = object.__new__(cls)
+        object.__setattr__(card, 'suit', suit) # one of [S,H,C,D]
+        object.__setattr__(card, 'number', number) # ace = 1 through K = 13
+        object.__setattr__(card, 'value', min(10, number))
+        object.__setattr__(card, 'id', Card.SUITS.index(suit) * 13 + number - 1)
+        cls._interned[(suit, number)] = card
+        return card
+
+    @staticmethod
+    def from_id(card_id):
+        return CARDS[card_id]
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Card is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('Card is immutable')
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (Card, (self.suit, self.number))
 
     def __str__(self):
 
@@ -20,77 +58,226 @@ class Card:
             Card.VALUES[self.number-1],
             Card.SUIT_MAPPING[self.suit])
 
+    def __repr__(self):
+        return 'Card({!r}, {!r})'.format(self.suit, self.number)
+
     def __eq__(self, other):
         if not isinstance(other, Card):
             return NotImplemented
-        return self.suit == other.suit and self.number == other.number
+        return self.id == other.id
 
     def __hash__(self):
-        return hash((self.suit, self.number))
+        return self.id
+
+
+# the 52 interned cards, indexed by Card.id
+CARDS = tuple(Card._intern(suit, number) for suit in Card.SUITS for number in range(1, 14))
+
+
+# Sets of cards as 52-bit masks, bit Card.id set for each card in the set.
+# Union, intersection and difference are |, & and & ~.
+
+FULL_MASK = (1 << len(CARDS)) - 1
+
+# RANK_MASKS[number] holds the four cards of that number (index 0 is empty)
+RANK_MASKS = (0,) + tuple(sum(1 << c.id for c in CARDS if c.number == n) for n in range(1, 14))
+SUIT_MASKS = {suit: sum(1 << c.id for c in CARDS if c.suit == suit) for suit in Card.SUITS}
+# VALUE_MASKS[v] holds the cards worth at most v in the count (v = 0..31)
+VALUE_MASKS = tuple(sum(1 << c.id for c in CARDS if c.value <= v) for v in range(32))
+
+
+def mask_of(cards):
+    """ mask of an iterable of Cards """
+    mask = 0
+    for c in cards:
+        mask |= 1 << c.id
+    return mask
+
+
+def iter_ids(mask):
+    """ yields the card ids in mask, lowest first """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def cards_of(mask):
+    """ list of the Cards in mask, in id order """
+    return [CARDS[i] for i in iter_ids(mask)]
+
+
+if hasattr(int, 'bit_count'): # Python 3.10+
+    popcount = int.bit_count
+else:
+    def popcount(mask):
+        return bin(mask).count('1')
+
+
+def rank_counts(mask):
+    """ number of cards of each number in mask, indexed 1..13 (index 0 is 0) """
+    return [popcount(mask & m) for m in RANK_MASKS]
+
+
+def suit_counts(mask):
+    """ number of cards of each suit in mask """
+    return {suit: popcount(mask & m) for suit, m in SUIT_MASKS.items()}
+
+
+def combination_masks(mask, k):
+    """ yields the mask of every k-card subset of mask, in
+    itertools.combinations order over the ids """
+    bits = [1 << i for i in iter_ids(mask)]
+    for combo in combinations(bits, k):
+        yield sum(combo)
 
 
 class Deck:
+    """ Deck of cards stored as a list of card ids plus a 52-bit membership
+    mask. The top of the deck is kept at the end of the id list so dealing
+    is a pop from the end. Shuffles and cuts draw from rng, a random.Random
+    (the random module by default). """
 
-    def __init__(self, num_cards=52):
-        self.cards = []
+    def __init__(self, num_cards=52, rng=None):
         self.max_cards = num_cards
+        self.rng = rng if rng is not None else random
+        self.reset()
 
-        for suit in Card.SUITS:
-            for number in range(1, 14):
-                if len(self.cards) < self.max_cards:
-                    self.cards.append(Card(suit, number))
+    def reset(self):
+        """ restores the deck to its first max_cards cards in suit order """
+        n = min(self.max_cards, len(CARDS))
+        self._ids = list(range(n - 1, -1, -1))
+        self._mask = (1 << n) - 1
+
+    @property
+    def cards(self):
+        """ list of the Cards in the deck, top card first """
+        return [CARDS[i] for i in reversed(self._ids)]
+
+    @cards.setter
+    def cards(self, cards):
+        self._ids = [c.id for c in reversed(cards)]
+        self._mask = mask_of(cards)
+
+    @property
+    def mask(self):
+        """ 52-bit mask with bit Card.id set for each card in the deck """
+        return self._mask
 
     @property
     def num_cards(self):
-        return len(self.cards)
+        return len(self._ids)
+
+    def __contains__(self, card):
+        return bool(self._mask >> card.id & 1)
 
     def __str__(self):
-        return ' '.join(str(c) for c in self.cards) + (' ' if self.cards else '')
+        return ' '.join(str(c) for c in self.cards) + (' ' if self._ids else '')
 
     def shuffle(self):
-        random.shuffle(self.cards)
+        self.rng.shuffle(self._ids)
 
     def deal_card(self):
-        return self.cards.pop(0)
+        i = self._ids.pop()
+        self._mask ^= 1 << i
+        return CARDS[i]
 
     def cut_deck(self, return_card=False):
         """ cuts card from random spot in deck.
         returns card.
         if return_card True, then also keeps card in deck """
 
-        i = random.randint(0, self.num_cards - 1)
+        i = self.num_cards - 1 - self.rng.randint(0, self.num_cards - 1)
 
         if return_card:
-            return self.cards[i]
+            return CARDS[self._ids[i]]
         else:
-            return self.cards.pop(i)
+            card_id = self._ids.pop(i)
+            self._mask ^= 1 << card_id
+            return CARDS[card_id]
 
     def remove_cards(self, cards_to_remove):
         """ removes list of cards from deck """
-        self.cards = [c for c in self.cards if c not in cards_to_remove]
+        remove_mask = mask_of(cards_to_remove)
+        if self._mask & remove_mask:
+            self._ids = [i for i in self._ids if not remove_mask >> i & 1]
+            self._mask &= ~remove_mask
         return self
 
     def remove_cards_inverse(self, cards_to_keep):
         """ removes cards not in list to keep
         returns list of cards removed """
-        cards_removed = [c for c in self.cards if c not in cards_to_keep]
-        self.cards = [c for c in self.cards if c in cards_to_keep]
+        keep_mask = mask_of(cards_to_keep)
+        if not self._mask & ~keep_mask:
+            return []
+        cards_removed = [CARDS[i] for i in reversed(self._ids) if not keep_mask >> i & 1]
+        self._ids = [i for i in self._ids if keep_mask >> i & 1]
+        self._mask &= keep_mask
         return cards_removed
 
 
 class Hand(Deck):
+    """ Ordered cards held by a player. Hands are small and are indexed and
+    reordered by position, so they keep a plain list of the interned Cards
+    (no per-card allocation) and expose that list directly as cards. """
+
+    def __init__(self, rng=None):
+        self._cards = []
+        self.rng = rng if rng is not None else random
+
+    @property
+    def cards(self):
+        return self._cards
+
+    @cards.setter
+    def cards(self, cards):
+        self._cards = list(cards)
+
+    @property
+    def mask(self):
+        return mask_of(self._cards)
+
+    @property
+    def num_cards(self):
+        return len(self._cards)
+
+    def __contains__(self, card):
+        return card in self._cards
 
-    def __init__(self):
-        self.cards = []
+    def __str__(self):
+        return ' '.join(str(c) for c in self._cards) + (' ' if self._cards else '')
 
     def receive_card(self, card):
-        self.cards.append(card)
+        self._cards.append(card)
 
     def play_card(self, i):
-        return self.cards.pop(i)
+        return self._cards.pop(i)
+
+    def shuffle(self):
+        self.rng.shuffle(self._cards)
+
+    def deal_card(self):
+        return self._cards.pop(0)
+
+    def cut_deck(self, return_card=False):
+        i = self.rng.randint(0, self.num_cards - 1)
+
+        if return_card:
+            return self._cards[i]
+        else:
+            return self._cards.pop(i)
+
+    def remove_cards(self, cards_to_remove):
+        self._cards = [c for c in self._cards if c not in cards_to_remove]
+        return self
+
+    def remove_cards_inverse(self, cards_to_keep):
+        cards_removed = [c for c in self._cards if c not in cards_to_keep]
+        self._cards = [c for c in self._cards if c in cards_to_keep]
+        return cards_removed
 
     def sort(self):
-        self.cards.sort(key=lambda c: (Card.SUITS.index(c.suit), c.number))
+        self._cards.sort(key=lambda c: c.id)
 
     def reset(self):
-        self.cards = []
+        self._cards = []
@@ -2,11 +2,20 @@
 
 import os
 import re
+import json
+import math
+import time
 import random
-import copy
+import asyncio
+import hashlib
 import logging
+import threading
+from collections import Counter
 from itertools import combinations
 from card_deck import card_deck
+from crib.pegging import PeggingState
+from crib.progress import LatencyHistogram
+from logger.logger import record_llm_call
 
 llm_logger = logging.getLogger('cribbage.llm')
 
@@ -20,8 +29,9 @@ class AIStrategy:
         """Return list of card indices to discard to crib."""
         raise NotImplementedError
 
-    def choose_play_card(self, hand, current_count):
-        """Return index of card to play, or None for Go."""
+    def choose_play_card(self, hand, current_count, context=None):
+        """Return index of card to play, or None for Go.
+        context is an optional crib.PlayContext describing the play so far."""
         raise NotImplementedError
 
 
@@ -34,7 +44,7 @@ class RandomStrategy(AIStrategy):
         indices = list(range(hand.num_cards))
         return random.sample(indices, num_crib_cards)
 
-    def choose_play_card(self, hand, current_count):
+    def choose_play_card(self, hand, current_count, context=None):
         valid = [i for i in range(hand.num_cards)
                  if current_count + hand.cards[i].value <= 31]
         if valid:
@@ -52,7 +62,7 @@ class BasicStrategy(AIStrategy):
         indexed = sorted(range(hand.num_cards), key=lambda i: hand.cards[i].value)
         return indexed[:num_crib_cards]
 
-    def choose_play_card(self, hand, current_count):
+    def choose_play_card(self, hand, current_count, context=None):
         # Play highest card that fits under 31
         best_idx = None
         best_val = -1
@@ -64,36 +74,125 @@ class BasicStrategy(AIStrategy):
         return best_idx
 
 
-class OptimizedStrategy(AIStrategy):
-    """Exhaustive evaluation of hand potential for crib discards,
-    plays highest fitting card during play phase."""
-    name = "AI-Opt"
-    description = "Optimized exhaustive evaluation strategy"
+class KeepOption:
+    """One way of splitting a hand into kept and discarded cards, with the
+    total hand points over every possible starter and the expected value
+    the discards add to (or give away in) the crib."""
 
-    def choose_crib_cards(self, hand, num_crib_cards, is_my_crib=False):
-        from crib.crib import count_hand
+    def __init__(self, keep_indices, discard_indices, hand_points, num_starters, crib_ev=0.0):
+        self.keep_indices = keep_indices
+        self.discard_indices = discard_indices
+        self.hand_points = hand_points
+        self.num_starters = num_starters
+        self.crib_ev = crib_ev # signed: negative when the crib is the opponent's
 
-        # Create temp deck with all cards not in hand
-        temp_deck = card_deck.Deck(52).remove_cards(hand.cards)
+    @property
+    def hand_ev(self):
+        """Expected hand score over a uniformly random starter."""
+        return self.hand_points / self.num_starters
 
-        best_combo = None
-        best_points = -1
+    @property
+    def ev(self):
+        """Expected hand score plus the signed crib contribution."""
+        return self.hand_points / self.num_starters + self.crib_ev
 
-        # Find combo that has the highest potential score
-        for combo in combinations(hand.cards, hand.num_cards - num_crib_cards):
-            points = 0
-            for card in temp_deck.cards:
-                points += count_hand(combo, card)
-            if points > best_points:
-                best_combo = copy.deepcopy(combo)
-                best_points = points
+    def __repr__(self):
+        return 'KeepOption(keep={}, discard={}, hand_ev={:.3f}, crib_ev={:.3f})'.format(
+            self.keep_indices, self.discard_indices, self.hand_ev, self.crib_ev)
 
-        # Return indices of cards NOT in best_combo (the ones to discard)
-        best_numbers = [(c.suit, c.number) for c in best_combo]
-        return [i for i in range(hand.num_cards)
-                if (hand.cards[i].suit, hand.cards[i].number) not in best_numbers]
 
-    def choose_play_card(self, hand, current_count):
+class DiscardEvaluation:
+    """Result of OptimizedStrategy.evaluate_discards: every KeepOption in
+    combinations order, and the best one (first of any tie)."""
+
+    def __init__(self, hand, options):
+        self.hand = hand
+        self.options = options
+        self.best = None
+        for option in options:
+            if self.best is None or option.ev > self.best.ev:
+                self.best = option
+
+
+class OptimizedStrategy(AIStrategy):
+    """Exhaustive evaluation of hand potential for crib discards, adjusted by
+    the expected crib value of the discards, plays highest fitting card
+    during play phase."""
+    name = "AI-Opt"
+    description = "Optimized exhaustive evaluation strategy"
+
+    def __init__(self, batch=False, crib_aware=True, cache=None):
+        # batch=True scores every keep/starter pair in one numpy call
+        self.batch = batch
+        # crib_aware=True adds (own crib) or subtracts (opponent's crib) the
+        # precomputed expected crib value of each two-card discard
+        self.crib_aware = crib_aware
+        # optional crib.cache.LRUCache of discard choices keyed on the
+        # suit-canonical hand
+        self.cache = cache
+
+    def choose_crib_cards(self, hand, num_crib_cards, is_my_crib=False):
+        if self.cache is None:
+            return self.evaluate_discards(hand, num_crib_cards, is_my_crib).best.discard_indices
+
+        from crib.cache import discard_key, encode_discards, decode_discards
+        key, suit_map = discard_key(hand, num_crib_cards, is_my_crib)
+        discards = self.cache.get(key)
+        if discards is not None:
+            indices = decode_discards(hand, discards, suit_map)
+            if indices is not None:
+                return indices
+
+        indices = self.evaluate_discards(hand, num_crib_cards, is_my_crib).best.discard_indices
+        self.cache.put(key, encode_discards(hand, indices, suit_map))
+        return indices
+
+    def evaluate_discards(self, hand, num_crib_cards, is_my_crib=False):
+        """Score every keep against every card not in the hand.
+        Returns a DiscardEvaluation."""
+        num_keep = hand.num_cards - num_crib_cards
+        all_indices = range(hand.num_cards)
+
+        if self.batch:
+            from crib.batch_scoring import keep_starter_scores
+            keeps, starters, points = keep_starter_scores(hand, num_crib_cards)
+            totals = points.sum(axis=1).tolist()
+            options = [KeepOption(keep, [i for i in all_indices if i not in keep], totals[k], len(starters))
+                       for k, keep in enumerate(keeps)]
+            return DiscardEvaluation(hand, self._add_crib_ev(hand, options, is_my_crib))
+
+        from crib.scoring import starter_points_total
+
+        # Count the unseen cards by number and by suit; starters of the same
+        # number only differ through flush and nobs
+        unseen = card_deck.FULL_MASK & ~hand.mask
+        rank_counts = card_deck.rank_counts(unseen)
+        suit_counts = card_deck.suit_counts(unseen)
+        num_starters = card_deck.popcount(unseen)
+
+        options = []
+        for keep in combinations(all_indices, num_keep):
+            kept = [hand.cards[i] for i in keep]
+            points = starter_points_total(kept, rank_counts, suit_counts)
+            options.append(KeepOption(keep, [i for i in all_indices if i not in keep],
+                                      points, num_starters))
+        return DiscardEvaluation(hand, self._add_crib_ev(hand, options, is_my_crib))
+
+    def _add_crib_ev(self, hand, options, is_my_crib):
+        """Set the signed crib EV on each option (two-card discards only)."""
+        if not self.crib_aware or not options or len(options[0].discard_indices) != 2:
+            return options
+        from crib.crib_ev import crib_ev
+        sign = 1 if is_my_crib else -1
+        for option in options:
+            i, j = option.discard_indices
+            ev = crib_ev(hand.cards[i], hand.cards[j], is_my_crib)
+            if ev is None:
+                return options
+            option.crib_ev = sign * ev
+        return options
+
+    def choose_play_card(self, hand, current_count, context=None):
         # Play highest card that fits (same as current AI logic)
         for i in range(hand.num_cards, 0, -1):
             if current_count + hand.cards[i-1].value <= 31:
@@ -101,20 +200,150 @@ class OptimizedStrategy(AIStrategy):
         return None
 
 
+def _numbers(mask):
+    """The sorted card numbers of the cards in mask."""
+    return tuple(sorted(card_deck.CARDS[i].number for i in card_deck.iter_ids(mask)))
+
+
+class ExpectimaxStrategy(OptimizedStrategy):
+    """Optimized discards; during the play, searches the rest of the play.
+
+    The opponent's unseen cards are sampled (or enumerated when there are
+    few enough possibilities), each sample is solved exactly with both
+    players maximising their own pegging, and the card with the best
+    average point difference is played. Positions are memoized in a
+    transposition table shared by all samples of one decision."""
+    name = "AI-Expectimax"
+    description = "Optimized discards, lookahead search during play"
+
+    def __init__(self, samples=24, time_limit=None, batch=False, crib_aware=True, cache=None):
+        super().__init__(batch=batch, crib_aware=crib_aware, cache=cache)
+        # opponent hands to average over per decision
+        self.samples = samples
+        # optional per-decision budget in seconds; at least one sample is searched
+        self.time_limit = time_limit
+
+    def choose_play_card(self, hand, current_count, context=None):
+        valid = [i for i in range(hand.num_cards) if current_count + hand.cards[i].value <= 31]
+        if len(valid) <= 1 or context is None or context.num_players != 2:
+            return super().choose_play_card(hand, current_count)
+
+        me = context.player_index
+        opponent = 1 - me
+        mine = tuple(sorted(c.number for c in hand.cards))
+        gos = (context.gos[me], context.gos[opponent])
+        last = context.who_played_last
+        if last is not None:
+            last = 0 if last == me else 1
+
+        # highest value first so ties go the same way as the greedy play
+        moves = sorted({hand.cards[i].number for i in valid}, key=lambda n: -min(n, 10))
+        totals = dict.fromkeys(moves, 0.0)
+        state = context.pegging.copy()
+        table = {}
+        start = time.perf_counter()
+        for opp_hand, weight in self._opponent_hands(context, opponent):
+            for n in moves:
+                i = mine.index(n)
+                points = state.play(n)
+                totals[n] += weight * (points + self._advance(
+                    state, (mine[:i] + mine[i + 1:], opp_hand), 0, gos, 0, table))
+                state.undo()
+            if self.time_limit is not None and time.perf_counter() - start > self.time_limit:
+                break
+
+        best = max(moves, key=lambda n: totals[n])
+        return next(i for i in valid if hand.cards[i].number == best)
+
+    def _opponent_hands(self, context, opponent):
+        """Yield (sorted numbers, weight) for the opponent hands to search."""
+        unseen = context.unseen_mask()
+        num_unseen = card_deck.popcount(unseen)
+        num_cards = min(context.cards_left(opponent), num_unseen)
+        if math.comb(num_unseen, num_cards) <= self.samples:
+            hands = Counter(_numbers(m) for m in card_deck.combination_masks(unseen, num_cards))
+        else:
+            ids = list(card_deck.iter_ids(unseen))
+            hands = Counter(_numbers(sum(1 << i for i in random.sample(ids, num_cards)))
+                            for _ in range(self.samples))
+        # most likely hands first, in case the time limit cuts the search short
+        return hands.most_common()
+
+    def _search(self, state, hands, turn, gos, last, table):
+        """Points for player 0 minus points for player 1 from the start of
+        turn's go until the end of the play, both playing optimally."""
+        key = (tuple(state.numbers), hands, turn, gos, last)
+        value = table.get(key)
+        if value is not None:
+            return value
+
+        if gos[turn]:
+            value = self._advance(state, hands, turn, gos, last, table)
+        else:
+            hand = hands[turn]
+            sign = 1 if turn == 0 else -1
+            previous = None
+            for i, n in enumerate(hand):
+                if state.count + min(n, 10) > 31:
+                    break
+                if n == previous:
+                    continue
+                previous = n
+                rest = hand[:i] + hand[i + 1:]
+                points = state.play(n)
+                result = sign * points + self._advance(
+                    state, (rest, hands[1]) if turn == 0 else (hands[0], rest), turn, gos, turn, table)
+                state.undo()
+                if value is None or (result > value if turn == 0 else result < value):
+                    value = result
+            if value is None:
+                said_go = (True, gos[1]) if turn == 0 else (gos[0], True)
+                value = self._advance(state, hands, turn, said_go, last, table)
+
+        table[key] = value
+        return value
+
+    def _advance(self, state, hands, turn, gos, last, table):
+        """Finish turn's go the way Round.play does: reset at 31 or when
+        both players have said go, score the last card, then pass the turn."""
+        value = 0
+        if state.count == 31 or all(gos):
+            if all(gos) and last is not None:
+                value += 1 if last == 0 else -1
+            # a fresh state keeps the caller's undo history intact
+            state = PeggingState()
+            gos = (False, False)
+        if not hands[0] and not hands[1]:
+            if state.count > 0 and last is not None:
+                value += 1 if last == 0 else -1
+            return value
+        return value + self._search(state, hands, 1 - turn, gos, last, table)
+
+
+def _token_count(value):
+    return value if isinstance(value, int) else None
+
+
+NO_API_KEY = "ANTHROPIC_API_KEY environment variable not set. LLM opponents disabled."
+
+
+def fetch_models(client):
+    """(id, display name) of each model the API offers."""
+    return [(model.id, model.display_name) for model in client.models.list(limit=100).data]
+
+
 def get_llm_strategies():
     """Fetch available models from Anthropic API and return LLMStrategy instances.
     Returns (strategies, error_message) tuple. On failure, strategies is empty
     and error_message describes the problem."""
     api_key = os.environ.get('ANTHROPIC_API_KEY')
     if not api_key:
-        return [], "ANTHROPIC_API_KEY environment variable not set. LLM opponents disabled."
+        return [], NO_API_KEY
     try:
         import anthropic
         client = anthropic.Anthropic(api_key=api_key)
-        response = client.models.list(limit=100)
-        strategies = []
-        for model in response.data:
-            strategies.append(LLMStrategy(model.id, model.display_name, client))
+        strategies = [LLMStrategy(model_id, display_name, client)
+                      for model_id, display_name in fetch_models(client)]
         if not strategies:
             return [], "No models available from Anthropic API."
         return strategies, None
@@ -122,10 +351,92 @@ def get_llm_strategies():
         return [], f"Could not initialize Anthropic API: {e}"
 
 
+class ModelList:
+    """The models LLM strategies can use, kept in a JSON file so startup
+    does not wait on the API (or on importing anthropic).
+
+    The file is read on creation; start_refresh() fetches a new list on a
+    daemon thread if the file is missing or older than max_age seconds,
+    and saves it for the next launch. models is a list of (id, display
+    name), or None while no list is known; error describes the last
+    failure to get one."""
+
+    def __init__(self, path='llm_models.json', max_age=24 * 3600, clock=time.time):
+        self.path = path
+        self.max_age = max_age
+        self.clock = clock
+        self.models = None
+        self.fetched = None
+        self.error = None
+        self._thread = None
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.models = [(model_id, display_name) for model_id, display_name in data['models']]
+            self.fetched = float(data['fetched'])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return self.models
+
+    @property
+    def stale(self):
+        return self.fetched is None or self.clock() - self.fetched > self.max_age
+
+    def refresh(self):
+        """Fetch the list from the API and save it. On failure any
+        cached list is kept."""
+        api_key = os.environ.get('ANTHROPIC_API_KEY')
+        if not api_key:
+            self.error = NO_API_KEY
+            return
+        try:
+            import anthropic
+            models = fetch_models(anthropic.Anthropic(api_key=api_key))
+        except Exception as e:
+            self.error = f"Could not initialize Anthropic API: {e}"
+            return
+        self.error = None if models else "No models available from Anthropic API."
+        self.models, self.fetched = models, self.clock()
+        try:
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump({'fetched': self.fetched, 'models': models}, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            llm_logger.info("could not save model list to %s: %s", self.path, e)
+
+    def start_refresh(self):
+        """Refresh on a background thread if the list is stale and there
+        is an API key to fetch it with."""
+        if not os.environ.get('ANTHROPIC_API_KEY'):
+            self.error = NO_API_KEY
+        elif self.stale and self._thread is None:
+            self._thread = threading.Thread(target=self.refresh, name='llm-models', daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout=None):
+        """Wait for a refresh in progress, up to timeout seconds."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def strategies(self):
+        """An LLMStrategy for each known model. Each makes its API client
+        when first used."""
+        if not os.environ.get('ANTHROPIC_API_KEY'):
+            return []
+        return [LLMStrategy(model_id, display_name) for model_id, display_name in self.models or []]
+
+
 class LLMStrategy(AIStrategy):
     """LLM-powered strategy using Anthropic API.
     Model is configurable via constructor parameter.
-    Falls back to BasicStrategy on any API or parsing error."""
+    Falls back to another strategy (BasicStrategy by default) on any API or
+    parsing error, or when the model has not answered within deadline
+    seconds (if set). decision_stats() reports the fallback rate and
+    decision time percentiles."""
 
     SYSTEM_PROMPT = (
         "You are an expert Cribbage player. Your goal is to outscore your opponent "
@@ -148,21 +459,44 @@ class LLMStrategy(AIStrategy):
         "to avoid being stuck on a Go.\n\n"
         "Respond ONLY with the requested card number(s), nothing else."
     )
+    # part of every cache key, so replies to an older prompt are not reused
+    SYSTEM_PROMPT_HASH = hashlib.blake2b(SYSTEM_PROMPT.encode(), digest_size=8).hexdigest()
 
-    def __init__(self, model_id, display_name=None, client=None):
+    # what a missed deadline raises, sync or async
+    TIMEOUTS = (TimeoutError, asyncio.TimeoutError)
+
+    def __init__(self, model_id, display_name=None, client=None, deadline=None, fallback=None):
         self.model = model_id
         self.explain = False
-        self._fallback = BasicStrategy()
-        if client is not None:
-            self.client = client
-        else:
-            import anthropic
-            api_key = os.environ.get('ANTHROPIC_API_KEY')
-            if not api_key:
-                raise ValueError("ANTHROPIC_API_KEY environment variable not set")
-            self.client = anthropic.Anthropic(api_key=api_key)
+        self.deadline = deadline
+        self.fallback = fallback if fallback is not None else BasicStrategy()
+        self.decision_latency = LatencyHistogram()
+        self.timeouts = 0
+        self.fallbacks = 0
+        if client is None and not os.environ.get('ANTHROPIC_API_KEY'):
+            raise ValueError("ANTHROPIC_API_KEY environment variable not set")
+        # made on first use, so anthropic is only imported once needed
+        self._client = client
         self.name = f"AI-LLM ({display_name or model_id})"
         self.description = model_id
+        # optional crib.cache.DiskCache of replies; with one, hands are
+        # put in a suit-canonical form before asking so that hands equal
+        # up to suits and order share replies
+        self.cache = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self._new_client()
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    def _new_client(self):
+        import anthropic
+        return anthropic.Anthropic(api_key=os.environ['ANTHROPIC_API_KEY'])
 
     @staticmethod
     def _format_cards(hand):
@@ -172,64 +506,361 @@ class LLMStrategy(AIStrategy):
             for i, c in enumerate(hand.cards)
         )
 
-    def _ask(self, user_prompt):
-        """Send a prompt to the LLM and return the response text."""
+    def _request(self, user_prompt):
+        """Keyword arguments for messages.create asking user_prompt."""
         max_tokens = 50
         if self.explain:
             user_prompt += "\nAfter your answer, briefly explain your reasoning on a new line starting with 'Reason:'."
             max_tokens = 300
         llm_logger.info("REQUEST [%s]: %s", self.model, user_prompt)
-        response = self.client.messages.create(
+        return dict(
             model=self.model,
             max_tokens=max_tokens,
             system=self.SYSTEM_PROMPT,
             messages=[{"role": "user", "content": user_prompt}],
         )
+
+    def _response_text(self, response, call=None):
         text = response.content[0].text.strip()
         llm_logger.info("RESPONSE [%s]: %s", self.model, text)
+        if call is not None:
+            usage = getattr(response, 'usage', None)
+            call['input_tokens'] = _token_count(getattr(usage, 'input_tokens', None))
+            call['output_tokens'] = _token_count(getattr(usage, 'output_tokens', None))
+        return text
+
+    def _ask(self, user_prompt, call=None):
+        """Send a prompt to the LLM and return the response text. call,
+        if given, is a decision's telemetry (see _new_call) to fill in."""
+        request = self._request(user_prompt)
+        text = self._cached_reply(request, call)
+        if text is None:
+            start = time.perf_counter()
+            response = self._create(request)
+            if call is not None:
+                call['request_seconds'] = time.perf_counter() - start
+            text = self._response_text(response, call)
+            self._cache_reply(request, text)
         return text
 
+    @staticmethod
+    def _new_call(decision):
+        """Telemetry for one decision, reported by _crib_move or
+        _play_move through logger.record_llm_call."""
+        return {'decision': decision, 'started_at': time.time(), 'start': time.perf_counter(),
+                'retries': 0, 'cache_hit': 0, 'timed_out': 0}
+
+    def _report(self, call, replied, parsed):
+        call['parsed'] = int(parsed) if replied else None
+        call['fallback'] = int(not parsed)
+        call['decision_seconds'] = time.perf_counter() - call['start']
+        self.decision_latency.add(call['decision_seconds'])
+        record_llm_call(model=self.model, **call)
+
+    def _create(self, request):
+        """messages.create, raising TimeoutError after deadline seconds.
+        The request is then left to finish on a daemon thread, which
+        does not hold up exiting."""
+        if self.deadline is None:
+            return self.client.messages.create(**request)
+        outcome = {}
+
+        def create():
+            try:
+                outcome['response'] = self.client.messages.create(**request)
+            except Exception as e:
+                outcome['error'] = e
+        thread = threading.Thread(target=create, name='llm-request', daemon=True)
+        thread.start()
+        thread.join(self.deadline)
+        if thread.is_alive():
+            raise TimeoutError('no reply from %s in %ss' % (self.model, self.deadline))
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['response']
+
+    def _failed(self, error, call):
+        """Note a request that raised error. Returns None, for no reply."""
+        if isinstance(error, self.TIMEOUTS):
+            self.timeouts += 1
+            call['timed_out'] = 1
+            llm_logger.info("TIMEOUT [%s] after %ss", self.model, self.deadline)
+        return None
+
+    def _crib_move(self, call, hand, asked, order, text, num_crib_cards, is_my_crib):
+        """The discards for a reply (None if there was none), from the
+        fallback strategy if it is not valid."""
+        indices = None if text is None else self._parse_crib(text, asked, num_crib_cards)
+        if indices is None:
+            self.fallbacks += 1
+            move = self.fallback.choose_crib_cards(hand, num_crib_cards, is_my_crib)
+        else:
+            move = [order[i] for i in indices]
+        self._report(call, text is not None, indices is not None)
+        return move
+
+    def _play_move(self, call, hand, order, text, valid, current_count, context):
+        idx = None if text is None else self._parse_play(text, valid)
+        if idx is None:
+            self.fallbacks += 1
+            move = self.fallback.choose_play_card(hand, current_count, context)
+        else:
+            move = order[idx]
+        self._report(call, text is not None, idx is not None)
+        return move
+
+    def decision_stats(self):
+        """Decisions made, how many timed out and fell back (for any
+        reason) and decision time percentiles in seconds."""
+        latency = self.decision_latency
+        return {
+            'decisions': latency.count,
+            'timeouts': self.timeouts,
+            'fallbacks': self.fallbacks,
+            'fallback_rate': self.fallbacks / latency.count if latency.count else 0.0,
+            'mean': latency.mean,
+            'p50': latency.percentile(50),
+            'p90': latency.percentile(90),
+            'p99': latency.percentile(99),
+            'max': latency.max,
+        }
+
+    def _cache_key(self, request):
+        # the user prompt already carries the explain instruction
+        return json.dumps([self.model, self.explain, self.SYSTEM_PROMPT_HASH,
+                           request["messages"][0]["content"]])
+
+    def _cached_reply(self, request, call=None):
+        """The cached reply to request, or None to ask the API. Raises
+        crib.cache.ReplayMiss for a miss on a replay-only cache."""
+        if self.cache is None:
+            return None
+        text = self.cache.get(self._cache_key(request))
+        if text is not None:
+            llm_logger.info("CACHED [%s]: %s", self.model, text)
+            if call is not None:
+                call['cache_hit'] = 1
+        elif self.cache.replay:
+            from crib.cache import ReplayMiss
+            raise ReplayMiss(self.model)
+        return text
+
+    def _cache_reply(self, request, text):
+        if self.cache is not None:
+            self.cache.put(self._cache_key(request), text)
+
+    def _prompt_hand(self, hand):
+        """The hand to describe in a prompt, and the index in hand of each
+        of its cards. With a cache the hand is relabelled to canonical
+        suits (see crib.cache.canonical_suits) and sorted."""
+        if self.cache is None:
+            return hand, range(hand.num_cards)
+        from crib.cache import canonical_suits
+        _, suit_map = canonical_suits(hand.cards)
+        cards = hand.cards
+        order = sorted(range(hand.num_cards), key=lambda i: (suit_map[cards[i].suit], cards[i].number))
+        canonical = card_deck.Hand()
+        for i in order:
+            canonical.receive_card(card_deck.Card(card_deck.Card.SUITS[suit_map[cards[i].suit]], cards[i].number))
+        return canonical, order
+
+    def _crib_prompt(self, hand, num_crib_cards, is_my_crib):
+        cards_str = self._format_cards(hand)
+        crib_ownership = "This is your crib." if is_my_crib else "This is your opponent's crib."
+        return (
+            f"Your hand: [{cards_str}]\n"
+            f"{crib_ownership}\n"
+            f"Choose {num_crib_cards} card(s) to discard to the crib.\n"
+            f"Reply with ONLY the card indices (0-{hand.num_cards - 1}) "
+            f"separated by commas. Example: 0,3"
+        )
+
+    @staticmethod
+    def _parse_crib(text, hand, num_crib_cards):
+        """The discard indices in text, or None if they are not valid."""
+        indices = [int(x.strip()) for x in re.findall(r'\d+', text)]
+        if (len(indices) == num_crib_cards
+                and all(0 <= i < hand.num_cards for i in indices)
+                and len(set(indices)) == num_crib_cards):
+            return indices
+        return None
+
+    @staticmethod
+    def _valid_plays(hand, current_count):
+        return [i for i in range(hand.num_cards)
+                if current_count + hand.cards[i].value <= 31]
+
+    def _play_prompt(self, hand, current_count, valid):
+        cards_str = self._format_cards(hand)
+        return (
+            f"Your hand: [{cards_str}]\n"
+            f"Current count: {current_count}\n"
+            f"Valid card indices (count won't exceed 31): {valid}\n"
+            f"Choose ONE card index to play. Reply with ONLY the index number."
+        )
+
+    @staticmethod
+    def _parse_play(text, valid):
+        """The card index in text, or None if it is not a valid play."""
+        numbers = re.findall(r'\d+', text)
+        if numbers and int(numbers[0]) in valid:
+            return int(numbers[0])
+        return None
+
     def choose_crib_cards(self, hand, num_crib_cards, is_my_crib=False):
+        call = self._new_call('crib')
+        asked, order = self._prompt_hand(hand)
         try:
-            cards_str = self._format_cards(hand)
-            crib_ownership = "This is your crib." if is_my_crib else "This is your opponent's crib."
-            prompt = (
-                f"Your hand: [{cards_str}]\n"
-                f"{crib_ownership}\n"
-                f"Choose {num_crib_cards} card(s) to discard to the crib.\n"
-                f"Reply with ONLY the card indices (0-{hand.num_cards - 1}) "
-                f"separated by commas. Example: 0,3"
-            )
-            text = self._ask(prompt)
-            indices = [int(x.strip()) for x in re.findall(r'\d+', text)]
-            # Validate indices
-            if (len(indices) == num_crib_cards
-                    and all(0 <= i < hand.num_cards for i in indices)
-                    and len(set(indices)) == num_crib_cards):
-                return indices
-        except Exception:
-            pass
-        return self._fallback.choose_crib_cards(hand, num_crib_cards)
-
-    def choose_play_card(self, hand, current_count):
+            text = self._ask(self._crib_prompt(asked, num_crib_cards, is_my_crib), call)
+        except Exception as e:
+            text = self._failed(e, call)
+        return self._crib_move(call, hand, asked, order, text, num_crib_cards, is_my_crib)
+
+    def choose_play_card(self, hand, current_count, context=None):
+        call = self._new_call('play')
+        asked, order = self._prompt_hand(hand)
+        valid = self._valid_plays(asked, current_count)
+        if not valid:
+            return None
         try:
-            cards_str = self._format_cards(hand)
-            valid = [i for i in range(hand.num_cards)
-                     if current_count + hand.cards[i].value <= 31]
-            if not valid:
+            text = self._ask(self._play_prompt(asked, current_count, valid), call)
+        except Exception as e:
+            text = self._failed(e, call)
+        return self._play_move(call, hand, order, text, valid, current_count, context)
+
+
+class AsyncLLMStrategy(LLMStrategy):
+    """LLMStrategy for async games (see crib.async_games): its decisions
+    are awaited, so many games can wait on the API at once.
+    At most max_concurrency requests are in flight per event loop.
+    Rate limit and overload errors are retried up to max_retries times
+    with jittered exponential backoff from base_delay, capped at max_delay,
+    waiting at least as long as the API's retry-after header asks.
+    stats counts requests, retries and failures (requests that gave up).
+    The sync choose methods still work, outside an event loop."""
+
+    # status codes worth retrying: timeouts, conflicts, rate limits and
+    # server errors (529 is the API's overloaded error)
+    RETRY_STATUS = {408, 409, 429}
+
+    def __init__(self, model_id, display_name=None, client=None, max_concurrency=8,
+                 max_retries=5, base_delay=0.5, max_delay=30.0, deadline=None, fallback=None):
+        super().__init__(model_id, display_name, client, deadline, fallback)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0}
+        self._rng = random.Random() # jitter must not disturb seeded games
+        self._loop = None
+        self._semaphore = None
+
+    def _new_client(self):
+        import anthropic
+        # retries are done here, outside the concurrency limit
+        return anthropic.AsyncAnthropic(api_key=os.environ['ANTHROPIC_API_KEY'], max_retries=0)
+
+    @classmethod
+    def from_strategy(cls, strategy, **kwargs):
+        """An AsyncLLMStrategy asking the same model as an LLMStrategy,
+        under the same name, with its own async client."""
+        s = cls(strategy.model, client=kwargs.pop('client', None), **kwargs)
+        s.name = strategy.name
+        s.explain = strategy.explain
+        s.cache = strategy.cache
+        s.deadline = strategy.deadline
+        s.fallback = strategy.fallback
+        return s
+
+    def _limit(self):
+        """The concurrency semaphore for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def retry_delay(self, error, attempt):
+        """Seconds to wait before retrying a request that raised error on
+        its attempt'th retry (0 first), or None to give up."""
+        if attempt >= self.max_retries:
+            return None
+        status = getattr(error, 'status_code', None)
+        if status is None:
+            # connection errors and timeouts have no status
+            if not (isinstance(error, (asyncio.TimeoutError, ConnectionError))
+                    or any(c.__name__ == 'APIConnectionError' for c in type(error).__mro__)):
                 return None
-            prompt = (
-                f"Your hand: [{cards_str}]\n"
-                f"Current count: {current_count}\n"
-                f"Valid card indices (count won't exceed 31): {valid}\n"
-                f"Choose ONE card index to play. Reply with ONLY the index number."
-            )
-            text = self._ask(prompt)
-            numbers = re.findall(r'\d+', text)
-            if numbers:
-                idx = int(numbers[0])
-                if idx in valid:
-                    return idx
-        except Exception:
-            pass
-        return self._fallback.choose_play_card(hand, current_count)
+        elif status not in self.RETRY_STATUS and status < 500:
+            return None
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        delay = self._rng.uniform(delay / 2, delay)
+        retry_after = self._retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    @staticmethod
+    def _retry_after(error):
+        try:
+            return float(error.response.headers['retry-after'])
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return None
+
+    async def _ask_async(self, user_prompt, call=None):
+        request = self._request(user_prompt)
+        text = self._cached_reply(request, call)
+        if text is None:
+            text = await self._fetch(request, call if call is not None else {})
+            self._cache_reply(request, text)
+        return text
+
+    async def _fetch(self, request, call):
+        """The reply to request, retrying as the class describes. The
+        request time in call includes waiting for a slot and backing off."""
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            async with self._limit():
+                self.stats['requests'] += 1
+                try:
+                    response = await self.client.messages.create(**request)
+                except Exception as e:
+                    delay = self.retry_delay(e, attempt)
+                    if delay is None:
+                        self.stats['failures'] += 1
+                        raise
+                else:
+                    call['request_seconds'] = time.perf_counter() - start
+                    return self._response_text(response, call)
+            # back off without holding a slot other games could use
+            self.stats['retries'] += 1
+            attempt += 1
+            call['retries'] = attempt
+            await asyncio.sleep(delay)
+
+    def _ask(self, user_prompt, call=None):
+        return asyncio.run(asyncio.wait_for(self._ask_async(user_prompt, call), self.deadline))
+
+    async def choose_crib_cards_async(self, hand, num_crib_cards, is_my_crib=False):
+        call = self._new_call('crib')
+        asked, order = self._prompt_hand(hand)
+        try:
+            text = await asyncio.wait_for(self._ask_async(self._crib_prompt(asked, num_crib_cards, is_my_crib), call),
+                                          self.deadline)
+        except Exception as e:
+            text = self._failed(e, call)
+        return self._crib_move(call, hand, asked, order, text, num_crib_cards, is_my_crib)
+
+    async def choose_play_card_async(self, hand, current_count, context=None):
+        call = self._new_call('play')
+        asked, order = self._prompt_hand(hand)
+        valid = self._valid_plays(asked, current_count)
+        if not valid:
+            return None
+        try:
+            text = await asyncio.wait_for(self._ask_async(self._play_prompt(asked, current_count, valid), call),
+                                          self.deadline)
+        except Exception as e:
+            text = self._failed(e, call)
+        return self._play_move(call, hand, order, text, valid, current_count, context)
@@ -0,0 +1,101 @@
+# Async games module - many simulation games in flight on one event loop
+#
+# A game against a network-backed strategy (ai_strategy.AsyncLLMStrategy)
+# spends nearly all its time waiting for replies. Here each game is a
+# coroutine that awaits its players' decisions, so while one game waits the
+# others play on, and a run is limited by the API's throughput rather than
+# its latency. Strategies without async decisions are called synchronously.
+
+import asyncio
+import collections
+from crib import simulation, scoring
+from logger.logger import LOG_FULL
+
+
+async def play_game_async(game):
+    """Play a crib.Game, awaiting each player decision (see
+    crib.Game.play_steps). Returns what game.play() would."""
+    steps = game.play_steps()
+    try:
+        decision = next(steps)
+        while True:
+            try:
+                answer = await decision.decide_async()
+            except Exception as e:
+                decision = steps.throw(e)
+            else:
+                decision = steps.send(answer)
+    except StopIteration as done:
+        return done.value
+
+
+async def _play_task(task, setup):
+    game, latency = simulation.start_game(task, setup)
+    await play_game_async(game)
+    return simulation.finish_game(task, game, latency, setup)
+
+
+async def run_simulation_async(p1_strategy, p2_strategy, num_games, target_score, simulation_id,
+                               results, master_seed, concurrency=8, progress=None, db_path='cribbage_log.db',
+                               log_level=LOG_FULL, record_path=None, duplicate=False, stop=None,
+                               track_latency=False, trace=False, trace_path=None, hand_cache_size=0):
+    """simulation.run_simulation, but with up to concurrency games played
+    at once on the running event loop instead of across processes.
+
+    Results, progress calls and stop checks still follow game order. Games
+    are started as earlier ones finish, with at most 2 * concurrency
+    started but not yet tallied, so a game that finishes early can wait
+    for a slower one before it. As with worker processes, game records are
+    kept until their game is tallied, so games past a stop are not logged.
+    Each game is dealt from its own seed as before, but the games share the
+    global random module, so decisions that use it are only reproducible
+    with concurrency 1. Latency includes time spent waiting for a free
+    request slot, and traced phases include time other games ran."""
+    tasks = simulation.make_tasks(master_seed, num_games, duplicate)
+    tally = simulation.Tally(results, len(tasks), duplicate, progress, stop, track_latency,
+                             trace or trace_path is not None, trace_path is not None)
+    writer = simulation.open_writer(db_path, record_path)
+    collector = simulation.RecordCollector() if writer is not None else None
+    setup = simulation.game_setup(p1_strategy, p2_strategy, target_score, simulation_id, collector, log_level,
+                                  track_latency, tally.trace, tally.trace_events, hand_cache_size)
+    hand_cache = scoring.set_hand_cache(setup['hand_cache'])
+
+    concurrency = max(1, concurrency)
+    tasks = iter(tasks)
+    games = collections.deque() # started and not yet tallied, in game order
+
+    def start_games():
+        playing = sum(not game.done() for game in games)
+        while playing < concurrency and len(games) < 2 * concurrency:
+            task = next(tasks, None)
+            if task is None:
+                return
+            games.append(asyncio.ensure_future(_play_task(task, setup)))
+            playing += 1
+
+    try:
+        start_games()
+        while games:
+            if games[0].done():
+                if tally.add(games.popleft().result(), writer):
+                    break
+            else:
+                await asyncio.wait([game for game in games if not game.done()],
+                                   return_when=asyncio.FIRST_COMPLETED)
+            start_games()
+    finally:
+        for game in games:
+            game.cancel()
+        # let cancelled games unwind before the writer closes
+        await asyncio.gather(*games, return_exceptions=True)
+        scoring.set_hand_cache(hand_cache)
+        if writer:
+            writer.close()
+
+    tally.finish(db_path, simulation_id, trace_path)
+    return results
+
+
+def run_simulation_concurrent(*args, **kwargs):
+    """Run run_simulation_async to completion on a new event loop."""
+    return asyncio.run(run_simulation_async(*args, **kwargs))
@@ -0,0 +1,102 @@
+# Batch scoring module - vectorized count_hand over integer-encoded cards
+#
+# Requires numpy (optional dependency). Cards are encoded as their
+# card_deck.Card.id (0..51): number = id % 13 + 1, suit index = id // 13.
+
+from itertools import combinations
+import numpy as np
+from card_deck import card_deck
+from crib.scoring import RANK_WEIGHTS, rank_breakdown_table
+
+CATEGORIES = ('fifteens', 'pairs', 'runs', 'flush', 'nobs')
+
+_keys = None
+_parts = None
+
+
+def _tables():
+    """Return (sorted multiset keys, (N, 3) fifteens/pairs/runs array)."""
+    global _keys, _parts
+    if _keys is None:
+        breakdown = rank_breakdown_table()
+        keys = sorted(breakdown)
+        _parts = np.array([breakdown[k] for k in keys], dtype=np.int16)
+        _keys = np.array(keys, dtype=np.int64)
+    return _keys, _parts
+
+
+# indexed by 0-based rank (id % 13)
+_WEIGHTS = np.array(RANK_WEIGHTS[1:], dtype=np.int64)
+
+
+def cards_to_ids(cards):
+    """Encode a list of Cards (or a Hand) as an int array of card ids."""
+    try:
+        cards = cards.cards
+    except AttributeError:
+        pass
+    return np.array([c.id for c in cards], dtype=np.int64)
+
+
+def count_hands_batch(hands, starters, breakdown=False):
+    """Score N four-card hands against N starters in one call.
+
+    hands is an (N, 4) array of card ids and starters an (N,) array of card
+    ids. Returns an (N,) int array of points identical to count_hand. With
+    breakdown=True returns (points, {category: (N,) array}) where the
+    categories are fifteens, pairs, runs, flush and nobs."""
+    hands = np.asarray(hands, dtype=np.int64)
+    starters = np.asarray(starters, dtype=np.int64)
+    if hands.ndim != 2 or hands.shape[1] != 4:
+        raise ValueError('hands must have shape (N, 4), got %s' % (hands.shape,))
+    if starters.shape != (hands.shape[0],):
+        raise ValueError('starters must have shape (%d,), got %s' % (hands.shape[0], starters.shape))
+
+    keys, parts = _tables()
+
+    ranks = hands % 13
+    suits = hands // 13
+    starter_ranks = starters % 13
+    starter_suits = starters // 13
+
+    rank_keys = _WEIGHTS[ranks].sum(axis=1) + _WEIGHTS[starter_ranks]
+    rank_parts = parts[np.searchsorted(keys, rank_keys)].astype(np.int64)
+
+    is_flush = (suits == suits[:, :1]).all(axis=1)
+    flush = np.where(is_flush, 4 + (suits[:, 0] == starter_suits), 0)
+    nobs = ((ranks == 10) & (suits == starter_suits[:, None])).sum(axis=1)
+
+    points = rank_parts.sum(axis=1) + flush + nobs
+    if not breakdown:
+        return points
+    return points, {
+        'fifteens': rank_parts[:, 0],
+        'pairs': rank_parts[:, 1],
+        'runs': rank_parts[:, 2],
+        'flush': flush,
+        'nobs': nobs,
+    }
+
+
+def keep_starter_scores(hand, num_crib_cards, breakdown=False):
+    """Score every possible keep of hand against every unseen starter.
+
+    Returns (keeps, starters, points) where keeps is a list of kept-index
+    tuples in combinations order, starters an (S,) array of the card ids not
+    in the hand and points a (len(keeps), S) array. With breakdown=True the
+    per-category arrays are returned as a fourth item, each (len(keeps), S)."""
+    hand_ids = cards_to_ids(hand)
+    keeps = list(combinations(range(len(hand_ids)), len(hand_ids) - num_crib_cards))
+    hand_mask = np.zeros(len(card_deck.CARDS), dtype=bool)
+    hand_mask[hand_ids] = True
+    starters = np.flatnonzero(~hand_mask)
+
+    keep_ids = hand_ids[np.array(keeps, dtype=np.int64)]
+    hands = np.repeat(keep_ids, len(starters), axis=0)
+    tiled = np.tile(starters, len(keeps))
+    shape = (len(keeps), len(starters))
+
+    if breakdown:
+        points, parts = count_hands_batch(hands, tiled, breakdown=True)
+        return keeps, starters, points.reshape(shape), {k: v.reshape(shape) for k, v in parts.items()}
+    return keeps, starters, count_hands_batch(hands, tiled).reshape(shape)
@@ -0,0 +1,260 @@
+# Cache module - bounded LRU caches keyed on suit-canonical hands, and a
+# persistent SQLite cache for slow decisions (LLM replies)
+
+import os
+import time
+import sqlite3
+from urllib.request import pathname2url
+from collections import OrderedDict
+from card_deck.card_deck import Card
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry, with
+    hit/miss/eviction counters."""
+
+    def __init__(self, maxsize=100000):
+        if maxsize <= 0:
+            raise ValueError('maxsize must be positive')
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        data = self._data
+        if key in data:
+            data.move_to_end(key)
+        elif len(data) >= self.maxsize:
+            data.popitem(last=False)
+            self.evictions += 1
+        data[key] = value
+
+    def clear(self):
+        self._data.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hit_rate': self.hit_rate,
+        }
+
+
+def combine_stats(caches):
+    """Add up LRUCache.stats() by name across {name: stats} dicts, e.g.
+    from several processes. Caches that were never used are left out."""
+    total = {}
+    for stats in caches:
+        for name, st in stats.items():
+            if not st['hits'] + st['misses']:
+                continue
+            t = total.setdefault(name, dict.fromkeys(('hits', 'misses', 'evictions', 'size', 'maxsize'), 0))
+            for field in t:
+                t[field] += st[field]
+    for t in total.values():
+        t['hit_rate'] = t['hits'] / (t['hits'] + t['misses'])
+    return total
+
+
+class ReplayMiss(LookupError):
+    """A replay-only DiskCache has no entry for a key."""
+
+
+class DiskCache:
+    """String-to-string cache in an SQLite table that persists between runs,
+    with the LRUCache counters.
+
+    Entries older than ttl seconds (if set) are treated as missing and
+    deleted, and past maxsize entries the least recently used are evicted.
+    With replay the file is opened read-only and must already exist, and
+    callers should not fetch missing values (see ReplayMiss). Reads are recorded lazily: last-used
+    times are committed with the next write, every touch_batch hits, or on
+    close."""
+
+    def __init__(self, path='llm_cache.db', ttl=None, maxsize=100000, replay=False,
+                 table='llm_cache', touch_batch=100, clock=time.time):
+        if maxsize <= 0:
+            raise ValueError('maxsize must be positive')
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.replay = replay
+        self.table = table
+        self.touch_batch = touch_batch
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._touched = 0
+        if replay:
+            if not os.path.isfile(path):
+                raise FileNotFoundError('no LLM reply cache to replay at %s' % path)
+            self._conn = sqlite3.connect('file:%s?mode=ro' % pathname2url(os.path.abspath(path)), uri=True,
+                                         timeout=30)
+        else:
+            self._conn = sqlite3.connect(path, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS %s (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created REAL NOT NULL, last_used REAL NOT NULL)" % table)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_%s_last_used ON %s (last_used)" % (table, table))
+            self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM %s" % table).fetchone()[0]
+
+    def __len__(self):
+        return self._size
+
+    def get(self, key, default=None):
+        now = self.clock()
+        row = self._conn.execute("SELECT value, created FROM %s WHERE key = ?" % self.table, (key,)).fetchone()
+        if row is not None and self.ttl is not None and row[1] < now - self.ttl:
+            self.expired += 1
+            if not self.replay:
+                self._conn.execute("DELETE FROM %s WHERE key = ?" % self.table, (key,))
+                self._conn.commit()
+                self._size -= 1
+            row = None
+        if row is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        if not self.replay:
+            self._conn.execute("UPDATE %s SET last_used = ? WHERE key = ?" % self.table, (now, key))
+            self._touched += 1
+            if self._touched >= self.touch_batch:
+                self._commit()
+        return row[0]
+
+    def put(self, key, value):
+        if self.replay:
+            return
+        now = self.clock()
+        exists = self._conn.execute("SELECT 1 FROM %s WHERE key = ?" % self.table, (key,)).fetchone()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO %s (key, value, created, last_used) VALUES (?, ?, ?, ?)" % self.table,
+            (key, value, now, now))
+        if not exists:
+            self._size += 1
+        if self._size > self.maxsize:
+            self._evict(self._size - self.maxsize)
+        self._commit()
+
+    def prune(self):
+        """Delete every expired entry; returns how many were deleted."""
+        if self.ttl is None or self.replay:
+            return 0
+        cursor = self._conn.execute("DELETE FROM %s WHERE created < ?" % self.table, (self.clock() - self.ttl,))
+        self._commit()
+        self._size -= cursor.rowcount
+        self.expired += cursor.rowcount
+        return cursor.rowcount
+
+    def _evict(self, count):
+        self._conn.execute(
+            "DELETE FROM %s WHERE key IN (SELECT key FROM %s ORDER BY last_used LIMIT ?)" % (self.table, self.table),
+            (count,))
+        self._size -= count
+        self.evictions += count
+
+    def _commit(self):
+        self._conn.commit()
+        self._touched = 0
+
+    def close(self):
+        if self._conn is not None:
+            self._commit()
+            self._conn.close()
+            self._conn = None
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'evictions': self.evictions,
+            'size': self._size,
+            'maxsize': self.maxsize,
+            'hit_rate': self.hit_rate,
+        }
+
+
+def canonical_suits(cards):
+    """Relabel suits so that hands equal up to a suit permutation get the
+    same form.
+
+    Returns (key, suit_map): key is a tuple with one sorted tuple of numbers
+    per suit, in canonical suit order, and suit_map maps each of the four
+    suits to its canonical index. Suits holding the same numbers are
+    interchangeable, so their relative order does not matter."""
+    by_suit = {suit: [] for suit in Card.SUITS}
+    for c in cards:
+        by_suit[c.suit].append(c.number)
+    groups = sorted(((tuple(sorted(numbers)), suit) for suit, numbers in by_suit.items()),
+                    reverse=True)
+    key = tuple(numbers for numbers, _ in groups)
+    suit_map = {suit: i for i, (_, suit) in enumerate(groups)}
+    return key, suit_map
+
+
+def hand_score_key(cards, turn_up):
+    """Suit-canonical key for count_hand(cards, turn_up)."""
+    key, suit_map = canonical_suits(cards)
+    # a turn up in any of several identical suits (e.g. two suits absent
+    # from the hand) scores the same, so use the first of them
+    turn_up_suit = key.index(key[suit_map[turn_up.suit]])
+    return key, turn_up.number, turn_up_suit
+
+
+def discard_key(hand, num_crib_cards, is_my_crib):
+    """Suit-canonical key for a discard decision. Returns (key, suit_map)."""
+    key, suit_map = canonical_suits(hand.cards)
+    return (key, num_crib_cards, bool(is_my_crib)), suit_map
+
+
+def encode_discards(hand, discard_indices, suit_map):
+    """Store a discard choice as canonical (suit index, number) pairs."""
+    return tuple(sorted((suit_map[hand.cards[i].suit], hand.cards[i].number)
+                        for i in discard_indices))
+
+
+def decode_discards(hand, discards, suit_map):
+    """Map canonical discards back to indices into hand, or None if the hand
+    does not contain them exactly once each."""
+    wanted = list(discards)
+    indices = []
+    for i, c in enumerate(hand.cards):
+        canonical = (suit_map[c.suit], c.number)
+        if canonical in wanted:
+            wanted.remove(canonical)
+            indices.append(i)
+    return indices if not wanted else None
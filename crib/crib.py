@@ -1,17 +1,22 @@
 # Crib module
 
-import random, time
+import random, time, asyncio
 from card_deck import card_deck
 from logger import logger
 from interface import interface
 from interface.interface import GameQuitException
-from itertools import combinations
+from crib.scoring import count_hand
+from crib.pegging import PeggingState
+from crib import trace
 
 
 class Player:
     def __init__(self, name='Player'):
         self.hand = card_deck.Hand() #current hand before playing
         self.played_cards = card_deck.Hand()
+        self.discards = [] #cards this player put in the crib this round
+        self.game_round = None #round currently being played, set by Round.play
+        self.tracer = None #crib.trace.Tracer timing decisions, set by Game
         self.name = name
 
     def select_crib_cards(self, num_crib_cards, card_indices):
@@ -20,6 +25,7 @@ class Player:
         crib_cards = []
         for i in card_indices:
             crib_cards.append(self.hand.play_card(i))
+        self.discards = list(crib_cards)
         return crib_cards
 
 
@@ -77,27 +83,188 @@ class AI_Player(Player):
             strategy = OptimizedStrategy()
         self.strategy = strategy
         self.simulate = simulate
+        # a crib.progress.LatencyHistogram to time decisions into, if any
+        self.latency = None
         super().__init__(strategy.name)
 
     def select_crib_cards(self, num_crib_cards, is_my_crib=False):
         if not self.simulate:
             time.sleep(random.uniform(0.5, 1.0))
-        card_indices = self.strategy.choose_crib_cards(self.hand, num_crib_cards, is_my_crib)
+        if self.latency is None and self.tracer is None:
+            card_indices = self.strategy.choose_crib_cards(self.hand, num_crib_cards, is_my_crib)
+        else:
+            card_indices = self._timed(self.strategy.choose_crib_cards, self.hand, num_crib_cards, is_my_crib)
         return super().select_crib_cards(num_crib_cards, card_indices)
 
     def play_card(self, current_count):
         if not self.simulate:
             time.sleep(random.uniform(0.3, 0.7))
-        idx = self.strategy.choose_play_card(self.hand, current_count)
+        context = None
+        if self.game_round is not None:
+            context = PlayContext(self.game_round, self.game_round.players.index(self))
+        if self.latency is None and self.tracer is None:
+            idx = self.strategy.choose_play_card(self.hand, current_count, context)
+        else:
+            idx = self._timed(self.strategy.choose_play_card, self.hand, current_count, context)
+        if idx is not None:
+            return self.hand.play_card(idx)
+        return None
+
+    async def select_crib_cards_async(self, num_crib_cards, is_my_crib=False):
+        """ select_crib_cards for async games: awaits the strategy's
+        choose_crib_cards_async if it has one """
+        choose = getattr(self.strategy, 'choose_crib_cards_async', None)
+        if choose is None:
+            return self.select_crib_cards(num_crib_cards, is_my_crib)
+        if not self.simulate:
+            await asyncio.sleep(random.uniform(0.5, 1.0))
+        start = time.perf_counter()
+        card_indices = await choose(self.hand, num_crib_cards, is_my_crib)
+        self._record_time('choose_crib_cards', start)
+        return super().select_crib_cards(num_crib_cards, card_indices)
+
+    async def play_card_async(self, current_count):
+        """ play_card for async games: awaits the strategy's
+        choose_play_card_async if it has one """
+        choose = getattr(self.strategy, 'choose_play_card_async', None)
+        if choose is None:
+            return self.play_card(current_count)
+        if not self.simulate:
+            await asyncio.sleep(random.uniform(0.3, 0.7))
+        context = None
+        if self.game_round is not None:
+            context = PlayContext(self.game_round, self.game_round.players.index(self))
+        start = time.perf_counter()
+        idx = await choose(self.hand, current_count, context)
+        self._record_time('choose_play_card', start)
         if idx is not None:
             return self.hand.play_card(idx)
         return None
 
+    def _timed(self, choose, *args):
+        """ call a strategy method, timing it into latency and tracer """
+        start = time.perf_counter()
+        result = choose(*args)
+        self._record_time(choose.__name__, start)
+        return result
+
+    def _record_time(self, name, start):
+        end = time.perf_counter()
+        if self.latency is not None:
+            self.latency.add(end - start)
+        if self.tracer is not None:
+            self.tracer.add(trace.STRATEGY, '%s.%s' % (self.strategy.name, name), start, end)
+
+
+class CribDecision:
+    """ A player choosing cards for the crib. The round's decision steps
+    yield one and are sent back the cards discarded. """
+    __slots__ = ('player', 'num_crib_cards', 'is_my_crib')
+
+    def __init__(self, player, num_crib_cards, is_my_crib):
+        self.player = player
+        self.num_crib_cards = num_crib_cards
+        self.is_my_crib = is_my_crib
+
+    def decide(self):
+        return self.player.select_crib_cards(self.num_crib_cards, is_my_crib=self.is_my_crib)
+
+    async def decide_async(self):
+        choose = getattr(self.player, 'select_crib_cards_async', None)
+        if choose is None:
+            return self.decide()
+        return await choose(self.num_crib_cards, self.is_my_crib)
+
+
+class PlayDecision:
+    """ A player choosing a card to play at a count. The round's decision
+    steps yield one and are sent back the card played, or None for a go. """
+    __slots__ = ('player', 'count')
+
+    def __init__(self, player, count):
+        self.player = player
+        self.count = count
+
+    def decide(self):
+        return self.player.play_card(self.count)
+
+    async def decide_async(self):
+        choose = getattr(self.player, 'play_card_async', None)
+        if choose is None:
+            return self.decide()
+        return await choose(self.count)
+
+
+def run_steps(steps):
+    """ Run a generator of decision steps (e.g. Game.play_steps), making
+    each decision it yields synchronously, and return its result. An
+    exception from a decision (such as a player quitting) is raised inside
+    the steps at the point the decision was asked for. """
+    try:
+        decision = next(steps)
+        while True:
+            try:
+                answer = decision.decide()
+            except Exception as e:
+                decision = steps.throw(e)
+            else:
+                decision = steps.send(answer)
+    except StopIteration as done:
+        return done.value
+
+
+class PlayContext:
+    """ What a player can see when choosing a card during the play.
+    Properties read the live round, so building one costs nothing for
+    strategies that ignore it. """
+
+    def __init__(self, game_round, player_index):
+        self.game_round = game_round
+        self.player_index = player_index
+
+    @property
+    def num_players(self):
+        return self.game_round.num_players
+
+    @property
+    def pegging(self):
+        """ the round's PeggingState; copy it before playing cards into it """
+        return self.game_round.pegging
+
+    @property
+    def gos(self):
+        """ which players have said go in the current count """
+        return list(self.game_round.gos)
+
+    @property
+    def who_played_last(self):
+        return self.game_round.who_played_last
+
+    def cards_left(self, player_index):
+        return self.game_round.players[player_index].hand.num_cards
+
+    def unseen_mask(self):
+        """ card_deck mask of the cards this player has not seen: not in
+        their hand or discards, not the turn up and not played by anyone """
+        r = self.game_round
+        me = r.players[self.player_index]
+        seen = me.hand.mask | card_deck.mask_of(me.discards)
+        if r.turn_up is not None:
+            seen |= 1 << r.turn_up.id
+        for p in r.players:
+            seen |= p.played_cards.mask
+        return card_deck.FULL_MASK & ~seen
+
+    def unseen_cards(self):
+        """ the unseen cards (see unseen_mask) in Card.id order """
+        return card_deck.cards_of(self.unseen_mask())
+
 
 class Game:
     CARDS_PER_HAND = {2:6,3:5,4:5} # keys are number of players
 
-    def __init__(self, num_players, players, interf, crib_player=None, target_score=121, simulation_id=None):
+    def __init__(self, num_players, players, interf, crib_player=None, target_score=121, simulation_id=None,
+                 db_path='cribbage_log.db', log_writer=None, log_level=logger.LOG_FULL, rng=None, tracer=None):
 
         if num_players < 2 or num_players > 4:
             raise ValueError
@@ -110,30 +277,61 @@ class Game:
         self.target_score = target_score
         self.score = [0 for _ in range(num_players)]
         self.interf = interf
+        # random.Random for the first dealer and every round's shuffle and
+        # cut, so a seeded deal sequence can be replayed with other players
+        self.rng = rng if rng is not None else random
+        # crib.trace.Tracer timing each phase, decision, logger and
+        # interface call, if any
+        self.tracer = tracer
+        if tracer is not None:
+            self.interf = trace.Traced(interf, tracer, trace.INTERFACE)
+            for p in players:
+                p.tracer = tracer
 
         if not crib_player:
-            self.crib_player = random.randint(0,num_players-1)
+            self.crib_player = self.rng.randint(0,num_players-1)
         elif crib_player < 0 or crib_player >= num_players:
             raise ValueError
         else:
             self.crib_player = crib_player
 
-        self.logger = logger.Logger(self, simulation_id=simulation_id)
+        # log_writer (e.g. a shared logger.LogWriter) takes the whole game as
+        # one record when it ends; otherwise the game is logged to db_path,
+        # or not at all if db_path is None
+        if log_writer is not None:
+            self.logger = logger.RecordLogger(self, log_writer, simulation_id=simulation_id, level=log_level)
+        elif db_path is None:
+            self.logger = logger.NullLogger(self)
+        else:
+            self.logger = logger.Logger(self, db_path=db_path, simulation_id=simulation_id, level=log_level)
+        if tracer is not None:
+            self.logger = trace.Traced(self.logger, tracer, trace.LOG)
 
 
     def play(self):
+        return run_steps(self.play_steps())
+
+    def play_steps(self):
+        """ The game as a generator of player decisions (CribDecision and
+        PlayDecision); run it with run_steps, or crib.async_games to make
+        the decisions concurrently with other games. """
         self.interf.start_game()
+        # LLM strategies log their calls to this game while it plays
+        log_token = logger.current_log.set(self.logger)
 
         try:
             while max(self.score) < self.target_score:
                 self.round_number += 1
-                self.game_round = Round(self.num_players, self.players, self.crib_player, self.interf)
-                self.game_round.logger = self.logger
-                self.logger.new_round(self.round_number, self.game_round.deal_cards())
-                self.logger.crib(self.game_round.establish_crib())
-                self.logger.turn_up(self.game_round.establish_turn_up())
-                self.logger.the_play(self.game_round.play())
-                self.logger.score_hands(self.game_round.score_hands())
+                self.game_round = Round(self.num_players, self.players, self.crib_player, self.interf, rng=self.rng)
+                # plays are only logged at full detail; otherwise the round
+                # skips its per-play logging calls altogether
+                if self.logger.level == logger.LOG_FULL:
+                    self.game_round.logger = self.logger
+                self.logger.new_round(self.round_number, self._phase('deal', self.game_round.deal_cards))
+                self.logger.crib((yield from self._phase_steps('crib', self.game_round.establish_crib_steps())))
+                self.logger.turn_up(self._phase('turn_up', self.game_round.establish_turn_up))
+                self.logger.the_play((yield from self._phase_steps('play', self.game_round.play_steps())))
+                self.logger.score_hands(self._phase('score', self.game_round.score_hands))
                 self.game_round.reset()
 
                 self.score = [min(self.target_score, self.score[i] + self.game_round.score[i]) for i in range(self.num_players)]
@@ -147,11 +345,29 @@ class Game:
             print('\nGame ended. Thanks for playing!')
         finally:
             self.logger.close()
+            try:
+                logger.current_log.reset(log_token)
+            except ValueError:
+                pass # closed from another context, e.g. a cancelled async game
+
+    def _phase(self, name, method):
+        """ run one phase of a round, timed if the game is traced """
+        if self.tracer is None:
+            return method()
+        with self.tracer.span(trace.PHASE, name):
+            return method()
+
+    def _phase_steps(self, name, steps):
+        """ _phase for a phase made of decision steps """
+        if self.tracer is None:
+            return (yield from steps)
+        with self.tracer.span(trace.PHASE, name):
+            return (yield from steps)
 
 
 class Round:
-    def __init__(self, num_players, players, crib_player, interf=None):
-        self.deck = card_deck.Deck(52)
+    def __init__(self, num_players, players, crib_player, interf=None, rng=None):
+        self.deck = card_deck.Deck(52, rng=rng)
         self.num_players = num_players
         self.players = players
         self.score = [0 for _ in range(num_players)]
@@ -159,13 +375,16 @@ class Round:
         self.crib = card_deck.Hand()
         self.turn_up = None
         self.count = 0
+        self.pegging = PeggingState()
+        self.gos = [False for _ in players]
+        self.who_played_last = None
 
         self.logger = None
 
         if interf:
             self.interf = interf
         else:
-            self.interf = interface.Interface()
+            self.interf = interface.NullInterface()
 
 
     def deal_cards(self):
@@ -189,13 +408,16 @@ class Round:
 
 
     def establish_crib(self):
+        return run_steps(self.establish_crib_steps())
+
+    def establish_crib_steps(self):
         if self.num_players == 2:
             num_crib_cards = 2
         else:
             num_crib_cards = 1
 
         for i, p in enumerate(self.players):
-            crib_cards = p.select_crib_cards(num_crib_cards, is_my_crib=(i == self.crib_player))
+            crib_cards = yield CribDecision(p, num_crib_cards, i == self.crib_player)
             for c in crib_cards:
                 self.crib.receive_card(c)
 
@@ -218,10 +440,8 @@ class Round:
         """ check if the card_played is valid"""
 
         if not card_played:
-            valid_play = True
-            for c in self.players[current_player].hand.cards:
-                if self.count + c.value <= 31:
-                    valid_play = False
+            # a go is only valid with no card that fits under 31
+            valid_play = not self.players[current_player].hand.mask & card_deck.VALUE_MASKS[31 - self.count]
 
         elif self.count + card_played.value > 31:
             valid_play = False
@@ -233,7 +453,8 @@ class Round:
 
 
     def score_played(self, card_played, played_cards):
-        """ calculates the score the for the current played card given the cards already played"""
+        """ calculates the score the for the current played card given the cards already played.
+        play() scores incrementally with PeggingState; this is the reference it is checked against """
 
         score = 0
         if self.count == 15 or self.count == 31:
@@ -259,61 +480,74 @@ class Round:
 
 
     def play(self):
+        return run_steps(self.play_steps())
+
+    def play_steps(self):
         self.count = 0
-        played_cards = card_deck.Hand()
-        gos = [False for _ in self.players]
+        self.pegging.reset()
+        self.gos = [False for _ in self.players]
         current_player = (self.crib_player + 1) % self.num_players
-        who_played_last = None
-        self.interf.create_play_display()
+        self.who_played_last = None
+        for p in self.players:
+            p.game_round = self
+        # headless interfaces display nothing, so skip the per-play calls
+        interf = None if self.interf.headless else self.interf
+        if interf:
+            interf.create_play_display()
 
         playing = True
         while playing:
 
-            if not gos[current_player]:
-                card_played = self.players[current_player].play_card(self.count) # play None for a "Go"
+            if not self.gos[current_player]:
+                player = self.players[current_player]
+                card_played = yield PlayDecision(player, self.count) # play None for a "Go"
                 while not self.check_played(card_played, current_player):
-                    self.players[current_player].hand.receive_card(card_played) # return card
-                    card_played = self.players[current_player].play_card(self.count) # play None for a "Go"
+                    player.hand.receive_card(card_played) # return card
+                    card_played = yield PlayDecision(player, self.count) # play None for a "Go"
 
                 if card_played:
-                    self.count += card_played.value
-                    played_cards.receive_card(card_played)
+                    temp_score = self.pegging.play(card_played.number)
+                    self.count = self.pegging.count
                     self.players[current_player].played_cards.receive_card(card_played)
-                    who_played_last = current_player
-                    temp_score = self.score_played(card_played, played_cards)
-                    self.score[who_played_last] += temp_score
-                    self.interf.show_play(current_player, card_played, self.count, temp_score)
+                    self.who_played_last = current_player
+                    self.score[self.who_played_last] += temp_score
+                    if interf:
+                        interf.show_play(current_player, card_played, self.count, temp_score)
                     if self.logger:
                         self.logger.log_play(current_player, card_played, self.count, temp_score)
 
                 else:
-                    gos[current_player] = True
-                    self.interf.show_play(current_player, None, self.count, 0)
+                    self.gos[current_player] = True
+                    if interf:
+                        interf.show_play(current_player, None, self.count, 0)
                     if self.logger:
                         self.logger.log_play(current_player, None, self.count, 0)
 
-            if self.count == 31 or all(gos):
-                if all(gos):
-                    self.score[who_played_last] += 1
-                    self.interf.show_play(who_played_last, None, 0, 1)
+            if self.count == 31 or all(self.gos):
+                if all(self.gos):
+                    self.score[self.who_played_last] += 1
+                    if interf:
+                        interf.show_play(self.who_played_last, None, 0, 1)
                     if self.logger:
-                        self.logger.log_play(who_played_last, None, 0, 1)
+                        self.logger.log_play(self.who_played_last, None, 0, 1)
 
                 self.count = 0
-                gos = [False for _ in self.players]
-                played_cards.reset()
+                self.gos = [False for _ in self.players]
+                self.pegging.reset()
                 if self.logger:
                     self.logger.new_sub_round()
 
             # check for end condition
             if all([p.hand.num_cards == 0 for p in self.players]):
-                if self.count > 0 and not all(gos):
+                if self.count > 0 and not all(self.gos):
                     #the count will be zero if the last play was to 31
-                    self.score[who_played_last] += 1
-                    self.interf.show_play(who_played_last, None, 0, 1)
+                    self.score[self.who_played_last] += 1
+                    if interf:
+                        interf.show_play(self.who_played_last, None, 0, 1)
                     if self.logger:
-                        self.logger.log_play(who_played_last, None, 0, 1)
-                self.interf.end_play()
+                        self.logger.log_play(self.who_played_last, None, 0, 1)
+                if interf:
+                    interf.end_play()
                 playing = False
             else:
                 current_player = (current_player + 1) % self.num_players
@@ -336,59 +570,3 @@ class Round:
         for p in self.players:
             p.hand.reset()
             p.played_cards.reset()
-
-
-def count_hand(hand, turn_up):
-
-    try:
-        cards = list(hand.cards)
-    except AttributeError:
-        cards = list(hand)
-
-    all_cards = list(cards) + [turn_up]
-
-    score = 0
-
-    # count the fifteens and pairs
-    for i in range(2,len(all_cards)+1):
-        for combo in combinations(all_cards,i):
-            # count the fifteens
-            x = 0
-            for card in combo:
-                x += card.value
-
-            if x == 15:
-                score += 2
-
-            #if a 2 combo check for pair
-            if i == 2:
-                if combo[0].number == combo[1].number:
-                    score += 2
-
-    # count runs: find longest run length, then count all combos of that length
-    for run_len in range(len(all_cards), 2, -1):
-        run_score = 0
-        for combo in combinations(all_cards, run_len):
-            numbers = sorted([c.number for c in combo])
-            if numbers == list(range(min(numbers), max(numbers)+1)):
-                run_score += run_len
-        if run_score > 0:
-            score += run_score
-            break
-
-
-
-    # check for flush
-    suits = [c.suit for c in cards]
-
-    if len(set(suits)) == 1:
-        score += 4
-        if suits[0] == turn_up.suit:
-            score +=1
-
-    # check for turn_up jack
-    for c in cards:
-        if c.number == 11 and c.suit == turn_up.suit:
-            score += 1
-
-    return score
@@ -0,0 +1,170 @@
+# Crib expected value tables
+#
+# Expected crib score for every two-card discard, keyed by the two ranks and
+# whether the cards are suited, split by whether the discarding player is
+# the dealer (the crib is theirs) or the pone (the crib is the opponent's).
+#
+# The table is generated offline and stored in crib_ev.bin next to this
+# module; it is loaded once at import. To regenerate it:
+#
+#   python3 -m crib.crib_ev [samples_per_entry] [workers]
+#
+# Generation runs in two passes:
+#   1. exhaustive: the opponent's two discards are uniformly random; every
+#      opponent pair and starter is enumerated.
+#   2. sampled: the discarder's other four cards and the opponent's six cards
+#      are dealt at random, and the opponent discards to maximise their own
+#      hand EV plus (as dealer) or minus (as pone) the pass 1 crib EV. The
+#      starter is averaged exactly over the remaining cards.
+
+import os
+import sys
+import time
+import random
+import struct
+from itertools import combinations
+from card_deck import card_deck
+from crib.scoring import starter_points_total
+
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'crib_ev.bin')
+
+MAGIC = b'CEV1'
+HEADER = struct.Struct('<4sI')  # magic, samples per entry
+NUM_ENTRIES = 13 * 13
+DEALER = 0
+PONE = 1
+
+
+def pair_index(card1, card2):
+    """Index of a discard pair in a 13x13 rank grid: pairs on the diagonal,
+    suited cards above it and offsuit cards below it."""
+    a = card1.number - 1
+    b = card2.number - 1
+    lo, hi = (a, b) if a <= b else (b, a)
+    if lo == hi or card1.suit == card2.suit:
+        return lo * 13 + hi
+    return hi * 13 + lo
+
+
+def representative_pair(index):
+    """Return two Cards belonging to the given pair index."""
+    row, col = divmod(index, 13)
+    if row <= col:
+        # pair, or suited (row < col)
+        return card_deck.Card('H', row + 1), card_deck.Card('H' if row < col else 'S', col + 1)
+    return card_deck.Card('S', row + 1), card_deck.Card('H', col + 1)
+
+
+def load_table(path=TABLE_PATH):
+    """Load the crib EV table, returning a tuple of 2 * 169 floats indexed by
+    role * 169 + pair_index, or None if the file is missing."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    magic, _ = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('%s is not a crib EV table' % path)
+    return struct.unpack_from('<%df' % (2 * NUM_ENTRIES), data, HEADER.size)
+
+
+def save_table(table, samples, path=TABLE_PATH):
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, samples))
+        f.write(struct.pack('<%df' % (2 * NUM_ENTRIES), *table))
+
+
+TABLE = load_table()
+
+
+def crib_ev(card1, card2, is_my_crib):
+    """Expected score of the crib that card1 and card2 are discarded to.
+    Returns None if no table is available."""
+    if TABLE is None:
+        return None
+    return TABLE[(DEALER if is_my_crib else PONE) * NUM_ENTRIES + pair_index(card1, card2)]
+
+
+def _starter_counts(known):
+    """Per-rank and per-suit counts of the cards not in known."""
+    rank_counts = [0] + [4] * 13
+    suit_counts = {suit: 13 for suit in card_deck.Card.SUITS}
+    for c in known:
+        rank_counts[c.number] -= 1
+        suit_counts[c.suit] -= 1
+    return rank_counts, suit_counts
+
+
+def uniform_entry(index):
+    """Exact expected crib score when the opponent's discards are uniform."""
+    c1, c2 = representative_pair(index)
+    others = [c for c in card_deck.CARDS if c is not c1 and c is not c2]
+    total = 0.0
+    count = 0
+    for o1, o2 in combinations(others, 2):
+        crib_cards = [c1, c2, o1, o2]
+        rank_counts, suit_counts = _starter_counts(crib_cards)
+        total += starter_points_total(crib_cards, rank_counts, suit_counts) / 48
+        count += 1
+    return total / count
+
+
+def sampled_entry(task):
+    """Sampled expected crib score for one (pair index, role) entry, with the
+    opponent discarding against the uniform table."""
+    index, role, samples, seed, uniform = task
+    from crib.ai_strategy import OptimizedStrategy
+
+    rng = random.Random(seed)
+    opponent = OptimizedStrategy(crib_aware=False)
+    # the opponent owns the crib when the discarder is the pone
+    opponent_sign = 1 if role == PONE else -1
+    c1, c2 = representative_pair(index)
+    others = [c for c in card_deck.CARDS if c is not c1 and c is not c2]
+
+    total = 0.0
+    for _ in range(samples):
+        dealt = rng.sample(others, 10)
+        hand = card_deck.Hand()
+        for c in dealt[4:]:
+            hand.receive_card(c)
+
+        best = None
+        best_value = None
+        for option in opponent.evaluate_discards(hand, 2).options:
+            d1, d2 = (hand.cards[i] for i in option.discard_indices)
+            value = option.hand_ev + opponent_sign * uniform[pair_index(d1, d2)]
+            if best is None or value > best_value:
+                best, best_value = option, value
+
+        crib_cards = [c1, c2] + [hand.cards[i] for i in best.discard_indices]
+        rank_counts, suit_counts = _starter_counts([c1, c2] + dealt)
+        total += starter_points_total(crib_cards, rank_counts, suit_counts) / 40
+
+    return total / samples
+
+
+def build_table(samples=2000, workers=None, seed=0, progress=None):
+    """Generate the crib EV table. Returns a list of 2 * 169 floats."""
+    uniform = [uniform_entry(i) for i in range(NUM_ENTRIES)]
+    if progress:
+        progress('uniform pass done')
+
+    tasks = [(index, role, samples, seed * 1000003 + role * NUM_ENTRIES + index, uniform)
+             for role in (DEALER, PONE) for index in range(NUM_ENTRIES)]
+    if workers == 1:
+        return [sampled_entry(t) for t in tasks]
+
+    from multiprocessing import Pool
+    with Pool(workers) as pool:
+        return pool.map(sampled_entry, tasks)
+
+
+if __name__ == '__main__':
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    start = time.perf_counter()
+    table = build_table(samples, workers, progress=print)
+    save_table(table, samples)
+    print('wrote %s (%d samples per entry) in %.1fs' % (TABLE_PATH, samples, time.perf_counter() - start))
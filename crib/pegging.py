@@ -0,0 +1,88 @@
+# Pegging module - incremental scoring of the play
+
+PAIR_POINTS = (0, 0, 2, 6, 12) # indexed by number of cards of a kind in a row
+
+
+class PeggingState:
+    """ Running state of one count of the play (until 31 or a double go).
+
+    Each play is scored from state kept up to date card by card: the count,
+    the length of the current streak of equal ranks, and the start of the
+    longest trailing window of distinct ranks (a run can only be found inside
+    that window). Finding the longest run ending on the new card is a single
+    backwards pass over that window, which holds at most 13 ranks and never
+    sorts or allocates. undo() reverts the last play so lookahead searches
+    can share one state object. """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """ starts a new count """
+        self.count = 0
+        self.numbers = [] # card numbers played since the count was reset
+        self.pair_streak = 0 # cards of the last played rank at the end of the sequence
+        self.distinct_start = 0 # index in numbers where the distinct-rank window starts
+        self._last_seen = [-1] * 14 # index in numbers of the latest card of each rank
+        self._history = []
+
+    def copy(self):
+        state = PeggingState.__new__(PeggingState)
+        state.count = self.count
+        state.numbers = list(self.numbers)
+        state.pair_streak = self.pair_streak
+        state.distinct_start = self.distinct_start
+        state._last_seen = list(self._last_seen)
+        state._history = list(self._history)
+        return state
+
+    def play(self, number):
+        """ plays a card of the given number (1-13) and returns the points scored """
+        numbers = self.numbers
+        pos = len(numbers)
+        last_seen = self._last_seen[number]
+        self._history.append((self.pair_streak, self.distinct_start, last_seen))
+
+        numbers.append(number)
+        self.count += number if number < 10 else 10
+
+        points = 2 if self.count == 15 or self.count == 31 else 0
+
+        if pos and numbers[pos - 1] == number:
+            self.pair_streak += 1
+            points += PAIR_POINTS[self.pair_streak]
+        else:
+            self.pair_streak = 1
+
+        if last_seen >= self.distinct_start:
+            self.distinct_start = last_seen + 1
+        self._last_seen[number] = pos
+
+        # longest run ending on this card: within the distinct window, the
+        # last k cards form a run exactly when max - min == k - 1
+        if pos - self.distinct_start >= 2:
+            lo = hi = number
+            run = 0
+            k = 1
+            for i in range(pos - 1, self.distinct_start - 1, -1):
+                n = numbers[i]
+                if n < lo:
+                    lo = n
+                elif n > hi:
+                    hi = n
+                k += 1
+                if hi - lo == k - 1 and k >= 3:
+                    run = k
+            points += run
+
+        return points
+
+    def play_card(self, card):
+        return self.play(card.number)
+
+    def undo(self):
+        """ reverts the last play """
+        number = self.numbers.pop()
+        self.count -= number if number < 10 else 10
+        self.pair_streak, self.distinct_start, last_seen = self._history.pop()
+        self._last_seen[number] = last_seen
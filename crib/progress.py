@@ -0,0 +1,128 @@
+# Progress module - throttled simulation progress and decision latency
+
+import sys
+import math
+import time
+from crib import stats
+
+# latency histogram buckets: BUCKETS_PER_OCTAVE per doubling from MIN_LATENCY,
+# so a percentile is within about 9% of the true value
+MIN_LATENCY = 1e-6
+BUCKETS_PER_OCTAVE = 8
+_BUCKET_OFFSET = 1 - math.log2(MIN_LATENCY) * BUCKETS_PER_OCTAVE
+
+
+class LatencyHistogram:
+    """Log-bucketed histogram of decision times in seconds. Histograms from
+    different games or worker processes can be merged exactly."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        if seconds > MIN_LATENCY:
+            bucket = int(math.log2(seconds) * BUCKETS_PER_OCTAVE + _BUCKET_OFFSET)
+        else:
+            bucket = 0
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        for bucket, n in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + n
+        self.count += other.count
+        self.total += other.total
+        if other.max > self.max:
+            self.max = other.max
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """Upper edge of the bucket holding the q-th percentile (0-100),
+        capped at the largest time seen."""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * q / 100.0)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.max, MIN_LATENCY * 2 ** (bucket / BUCKETS_PER_OCTAVE))
+        return self.max
+
+
+class ProgressReporter:
+    """Progress callback for simulation.run_simulation that redraws one
+    status line at most every interval seconds (and on the last game), so
+    fast simulations are not slowed down by printing. Shows games/sec, the
+    ETA, player 1's win rate with its 95% interval and, if the run tracks
+    it, each strategy's mean and p99 decision time."""
+
+    def __init__(self, interval=0.5, out=None, clock=time.monotonic):
+        self.interval = interval
+        self.out = out if out is not None else sys.stdout
+        self.clock = clock
+        self.start = None
+        self.start_game = 0
+        self.next_draw = 0.0
+        self.draws = 0
+        self.width = 0
+
+    def __call__(self, game_num, total, results):
+        now = self.clock()
+        if self.start is None:
+            # rates are measured from the first game reported
+            self.start = now
+            self.start_game = game_num
+            self.next_draw = now + self.interval
+        if now < self.next_draw and game_num < total:
+            return
+        self.next_draw = now + self.interval
+        line = self.status(game_num, total, results, now - self.start)
+        # pad over the rest of a longer previous line
+        padded = line.ljust(self.width)
+        self.width = 0 if game_num >= total else len(line)
+        self.out.write('\r' + padded + ('\n' if game_num >= total else ''))
+        self.out.flush()
+        self.draws += 1
+
+    def status(self, game_num, total, results, elapsed):
+        rate = (game_num - self.start_game) / elapsed if elapsed > 0 else 0.0
+        eta = (total - game_num) / rate if rate else 0.0
+        win_rate, half = stats.win_rate_interval(results)
+        parts = ['Game %d/%d' % (game_num, total),
+                 '%.1f games/s' % rate,
+                 'ETA %s' % format_duration(eta),
+                 '%s %.1f%% +/- %.1f%%' % (results.get('p1_name', 'P1'), win_rate * 100, half * 100)]
+        latency = results.get('latency')
+        if latency:
+            names = (results.get('p1_name', 'P1'), results.get('p2_name', 'P2'))
+            for name, hist in zip(names, latency):
+                if hist.count:
+                    parts.append('%s %s mean / %s p99' % (
+                        name, format_latency(hist.mean), format_latency(hist.percentile(99))))
+        return '  ' + ' | '.join(parts)
+
+
+def format_duration(seconds):
+    seconds = int(seconds + 0.5)
+    if seconds >= 3600:
+        return '%d:%02d:%02d' % (seconds // 3600, seconds // 60 % 60, seconds % 60)
+    return '%d:%02d' % (seconds // 60, seconds % 60)
+
+
+def format_latency(seconds):
+    if seconds >= 1:
+        return '%.2fs' % seconds
+    if seconds >= 1e-3:
+        return '%.1fms' % (seconds * 1e3)
+    return '%.0fus' % (seconds * 1e6)
@@ -0,0 +1,230 @@
+# Hand scoring module - table-driven count_hand
+
+from itertools import combinations, combinations_with_replacement
+from crib.cache import hand_score_key
+
+# Each rank contributes 5**(rank-1) to a multiset key. A rank appears at most
+# four times, so the base-5 digits never carry and the key is unique per
+# multiset without having to sort the ranks first.
+RANK_WEIGHTS = tuple(5 ** (n - 1) for n in range(14))  # index 0 unused
+
+_rank_table = None
+_rank_breakdown = None
+_hand_cache = None
+
+
+def rank_key(numbers):
+    """Return the multiset key for an iterable of card numbers (1-13)."""
+    key = 0
+    for n in numbers:
+        key += RANK_WEIGHTS[n]
+    return key
+
+
+def score_ranks(numbers):
+    """Score fifteens, pairs and runs for a list of card numbers by enumeration.
+    Returns (fifteens, pairs, runs) points."""
+    values = [min(10, n) for n in numbers]
+    fifteens = 0
+    pairs = 0
+
+    # count the fifteens and pairs
+    for i in range(2, len(numbers) + 1):
+        for combo in combinations(values, i):
+            if sum(combo) == 15:
+                fifteens += 2
+    for a, b in combinations(numbers, 2):
+        if a == b:
+            pairs += 2
+
+    # count runs: find longest run length, then count all combos of that length
+    runs = 0
+    for run_len in range(len(numbers), 2, -1):
+        for combo in combinations(numbers, run_len):
+            ordered = sorted(combo)
+            if ordered == list(range(ordered[0], ordered[-1] + 1)):
+                runs += run_len
+        if runs > 0:
+            break
+
+    return fifteens, pairs, runs
+
+
+def _build_rank_tables():
+    """Build the fifteens/pairs/runs tables for every 5-card rank multiset."""
+    global _rank_table, _rank_breakdown
+    table = {}
+    breakdown = {}
+    for numbers in combinations_with_replacement(range(1, 14), 5):
+        if any(numbers.count(n) > 4 for n in set(numbers)):
+            continue
+        parts = score_ranks(numbers)
+        key = rank_key(numbers)
+        table[key] = sum(parts)
+        breakdown[key] = parts
+    _rank_table = table
+    _rank_breakdown = breakdown
+
+
+def rank_table():
+    """Return the {rank_key: points} table for 5-card rank multisets,
+    building it on first use."""
+    if _rank_table is None:
+        _build_rank_tables()
+    return _rank_table
+
+
+def rank_breakdown_table():
+    """Return the {rank_key: (fifteens, pairs, runs)} table for 5-card rank
+    multisets, building it on first use."""
+    if _rank_breakdown is None:
+        _build_rank_tables()
+    return _rank_breakdown
+
+
+def suit_points(cards, turn_up):
+    """Points for flush and his nobs given the kept cards and the turn up."""
+    score = 0
+
+    # check for flush
+    suit = cards[0].suit if cards else None
+    if cards and all(c.suit == suit for c in cards):
+        score += 4
+        if suit == turn_up.suit:
+            score += 1
+
+    # check for turn_up jack
+    for c in cards:
+        if c.number == 11 and c.suit == turn_up.suit:
+            score += 1
+
+    return score
+
+
+def set_hand_cache(cache):
+    """Put an LRUCache (crib.cache) in front of count_hand, keyed on the
+    suit-canonical hand and turn up. Pass None to remove it. Returns the
+    cache it replaces."""
+    global _hand_cache
+    previous, _hand_cache = _hand_cache, cache
+    return previous
+
+
+def count_hand(hand, turn_up):
+
+    try:
+        cards = hand.cards
+    except AttributeError:
+        cards = hand
+
+    if _hand_cache is not None:
+        key = hand_score_key(cards, turn_up)
+        score = _hand_cache.get(key)
+        if score is None:
+            score = _count_cards(cards, turn_up)
+            _hand_cache.put(key, score)
+        return score
+
+    return _count_cards(cards, turn_up)
+
+
+def _count_cards(cards, turn_up):
+    if len(cards) == 4:
+        table = _rank_table if _rank_table is not None else rank_table()
+        c0, c1, c2, c3 = cards
+        score = table.get(RANK_WEIGHTS[c0.number] + RANK_WEIGHTS[c1.number] + RANK_WEIGHTS[c2.number]
+                          + RANK_WEIGHTS[c3.number] + RANK_WEIGHTS[turn_up.number])
+        if score is None:
+            # more than four of a rank (duplicate cards), not in the table
+            score = sum(score_ranks([c.number for c in cards] + [turn_up.number]))
+    else:
+        score = sum(score_ranks([c.number for c in cards] + [turn_up.number]))
+
+    return score + suit_points(cards, turn_up)
+
+
+def count_hand_reference(hand, turn_up):
+    """Original combination-enumerating scorer, kept as the reference that the
+    table-driven count_hand is checked and benchmarked against."""
+
+    try:
+        cards = list(hand.cards)
+    except AttributeError:
+        cards = list(hand)
+
+    all_cards = list(cards) + [turn_up]
+
+    score = 0
+
+    # count the fifteens and pairs
+    for i in range(2,len(all_cards)+1):
+        for combo in combinations(all_cards,i):
+            # count the fifteens
+            x = 0
+            for card in combo:
+                x += card.value
+
+            if x == 15:
+                score += 2
+
+            #if a 2 combo check for pair
+            if i == 2:
+                if combo[0].number == combo[1].number:
+                    score += 2
+
+    # count runs: find longest run length, then count all combos of that length
+    for run_len in range(len(all_cards), 2, -1):
+        run_score = 0
+        for combo in combinations(all_cards, run_len):
+            numbers = sorted([c.number for c in combo])
+            if numbers == list(range(min(numbers), max(numbers)+1)):
+                run_score += run_len
+        if run_score > 0:
+            score += run_score
+            break
+
+    # check for flush
+    suits = [c.suit for c in cards]
+
+    if len(set(suits)) == 1:
+        score += 4
+        if suits[0] == turn_up.suit:
+            score +=1
+
+    # check for turn_up jack
+    for c in cards:
+        if c.number == 11 and c.suit == turn_up.suit:
+            score += 1
+
+    return score
+
+
+def starter_points_total(kept, rank_counts, suit_counts):
+    """Return the sum of count_hand(kept, s) over a set of possible starters s.
+
+    The starters are described only by how many there are of each number
+    (rank_counts, indexed 1-13) and of each suit (suit_counts, keyed by suit).
+    Starters of the same rank score the same fifteens, pairs and runs, so
+    each rank is looked up once and weighted by its count; flush and nobs
+    are added from the suit counts."""
+    table = _rank_table if _rank_table is not None else rank_table()
+    numbers = [c.number for c in kept]
+    base = rank_key(numbers)
+    total = 0
+    for n in range(1, 14):
+        m = rank_counts[n]
+        if m:
+            points = table.get(base + RANK_WEIGHTS[n]) if len(kept) == 4 else None
+            if points is None:
+                points = sum(score_ranks(numbers + [n]))
+            total += m * points
+
+    if kept:
+        suit = kept[0].suit
+        if all(c.suit == suit for c in kept):
+            total += 4 * sum(rank_counts) + suit_counts[suit]
+    for c in kept:
+        if c.number == 11:
+            total += suit_counts[c.suit]
+
+    return total
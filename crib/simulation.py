@@ -0,0 +1,309 @@
+# Simulation module - runs AI vs AI games, optionally across a process pool
+
+import os
+import random
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from crib import crib, scoring
+from crib.cache import LRUCache, combine_stats
+from crib.progress import LatencyHistogram
+from crib.trace import Tracer
+from interface import interface
+from logger.logger import LogWriter, LOG_FULL, write_timings
+from logger.binary_log import BinaryLogWriter
+
+
+def new_master_seed():
+    """Return a random 32-bit master seed."""
+    return int.from_bytes(os.urandom(4), 'big')
+
+
+def game_seed(master_seed, game_index):
+    """Deterministic per-game seed derived from the master seed, independent
+    of which worker plays the game."""
+    digest = hashlib.blake2b(('%d:%d' % (master_seed, game_index)).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class RecordCollector:
+    """Stands in for a LogWriter in worker processes, keeping game records
+    so they can be sent back to the parent's writer."""
+
+    def __init__(self):
+        self.records = []
+
+    def submit(self, record):
+        self.records.append(record)
+
+
+# the name the count_hand cache is reported under (see cache_stats)
+HAND_CACHE = 'Hand score'
+
+
+def game_setup(p1_strategy, p2_strategy, target_score, simulation_id, log_writer=None, log_level=LOG_FULL,
+               track_latency=False, trace=False, trace_events=False, hand_cache_size=0):
+    """What start_game needs to build each game of a run. The count_hand
+    cache it makes is installed by whoever plays the games."""
+    return {
+        'p1_strategy': p1_strategy,
+        'p2_strategy': p2_strategy,
+        'target_score': target_score,
+        'simulation_id': simulation_id,
+        'log_writer': log_writer,
+        'log_level': log_level,
+        'track_latency': track_latency,
+        'trace': trace,
+        'trace_events': trace_events,
+        'interf': interface.NullInterface(),
+        'hand_cache': LRUCache(hand_cache_size) if hand_cache_size else None,
+    }
+
+
+# per-process game setup, filled in by _init_worker (or run_simulation when serial)
+_worker = {}
+
+
+def _init_worker(p1_strategy, p2_strategy, target_score, simulation_id, log_writer=None, log_level=LOG_FULL,
+                 track_latency=False, trace=False, trace_events=False, hand_cache_size=0):
+    """Fill in _worker and install its count_hand cache. Returns the
+    cache that replaces."""
+    _worker.update(game_setup(p1_strategy, p2_strategy, target_score, simulation_id, log_writer, log_level,
+                              track_latency, trace, trace_events, hand_cache_size))
+    return scoring.set_hand_cache(_worker['hand_cache'])
+
+
+def cache_stats(setup):
+    """LRUCache.stats() of the caches games in this process use: the
+    strategies' discard caches by strategy name, and the count_hand cache
+    as HAND_CACHE."""
+    caches = {s.name: s.cache for s in (setup['p1_strategy'], setup['p2_strategy'])
+              if isinstance(getattr(s, 'cache', None), LRUCache)}
+    if setup['hand_cache'] is not None:
+        caches[HAND_CACHE] = setup['hand_cache']
+    return {name: cache.stats() for name, cache in caches.items()}
+
+
+def start_game(task, setup):
+    """Seed and build the crib.Game for task from a game_setup.
+    Returns the game and its players' LatencyHistograms (or None)."""
+    game_index, seed, swapped = task
+    random.seed(seed)
+
+    strategies = [setup['p1_strategy'], setup['p2_strategy']]
+    if swapped:
+        strategies.reverse()
+    players = [crib.AI_Player(s, simulate=True) for s in strategies]
+    latency = None
+    if setup['track_latency']:
+        latency = [LatencyHistogram(), LatencyHistogram()]
+        for player, hist in zip(players, latency):
+            player.latency = hist
+    tracer = Tracer(keep_events=setup['trace_events']) if setup['trace'] else None
+    g = crib.Game(2, players, setup['interf'], target_score=setup['target_score'],
+                  simulation_id=setup['simulation_id'], db_path=None, log_writer=setup['log_writer'],
+                  log_level=setup['log_level'], rng=random.Random(seed), tracer=tracer)
+    return g, latency
+
+
+def finish_game(task, game, latency, setup):
+    """The outcome tuple of a played game (see play_game)."""
+    game_index, seed, swapped = task
+    record = None
+    if isinstance(setup['log_writer'], RecordCollector):
+        record = setup['log_writer'].records.pop()
+    scores = list(game.score)
+    winner = scores.index(max(scores))
+    if swapped:
+        scores.reverse()
+        winner = 1 - winner
+        if latency:
+            latency.reverse()
+    return game_index, winner, scores, record, latency, game.tracer, (os.getpid(), cache_stats(setup))
+
+
+def play_game(task):
+    """Play one seeded game. task is (game_index, seed, swapped); swapped
+    games seat player 2's strategy first.
+
+    The deals come from their own random.Random(seed), so the same seed
+    deals the same cards to the same seats whatever the strategies do with
+    the global random module (also seeded with seed).
+    Returns (game_index, winner, final scores, game record or None,
+    decision latencies or None, crib.trace.Tracer or None, (process id,
+    cache_stats so far)), with the winner, scores and the two strategies'
+    LatencyHistograms in player 1, player 2 order."""
+    game, latency = start_game(task, _worker)
+    game.play()
+    return finish_game(task, game, latency, _worker)
+
+
+def record_result(results, winner):
+    if winner == 0:
+        results['p1_wins'] += 1
+    else:
+        results['p2_wins'] += 1
+
+
+def record_pair(results, p1_wins):
+    """Record a duplicate pair in which player 1 won p1_wins of the two
+    games (see crib.stats.paired_ci)."""
+    results['pairs'] = results.get('pairs', 0) + 1
+    results['pair_wins'] = results.get('pair_wins', 0) + p1_wins
+    results['pair_wins_sq'] = results.get('pair_wins_sq', 0) + p1_wins * p1_wins
+    if p1_wins != 1:
+        key = 'p1_sweeps' if p1_wins == 2 else 'p2_sweeps'
+        results[key] = results.get(key, 0) + 1
+
+
+def make_tasks(master_seed, num_games, duplicate=False):
+    """(game_index, seed, swapped) for each game. In duplicate mode games
+    come in pairs sharing a seed, the second with the seats swapped, so each
+    strategy plays the other's cards; an odd num_games is rounded up."""
+    if not duplicate:
+        return [(i, game_seed(master_seed, i), False) for i in range(1, num_games + 1)]
+    tasks = []
+    for pair in range(1, (num_games + 1) // 2 + 1):
+        seed = game_seed(master_seed, pair)
+        tasks.append((2 * pair - 1, seed, False))
+        tasks.append((2 * pair, seed, True))
+    return tasks
+
+
+def run_simulation(p1_strategy, p2_strategy, num_games, target_score, simulation_id,
+                   results, master_seed, workers=1, progress=None, db_path='cribbage_log.db',
+                   log_level=LOG_FULL, record_path=None, duplicate=False, stop=None,
+                   track_latency=False, trace=False, trace_path=None, hand_cache_size=0):
+    """Play num_games games, merging wins into results and calling
+    progress(game_num, num_games, results) after each game.
+
+    Game i is always seeded with game_seed(master_seed, i), so a run is
+    reproducible for any worker count. With workers > 1 games are spread
+    over a process pool; strategies must then be picklable. With duplicate
+    each deal is played twice with the seats swapped (see make_tasks) and
+    each pair is also recorded with record_pair.
+
+    stop is an optional crib.stats stopping rule, checked after every game
+    (every pair in duplicate mode); once it returns a decision the rest of
+    the games are cancelled and results['decision'] is set.
+
+    With track_latency every strategy decision is timed and
+    results['latency'] holds player 1's and player 2's merged
+    crib.progress.LatencyHistograms, updated before each progress call.
+
+    With trace every game is run with a crib.trace.Tracer and the merged
+    tracer is left in results['tracer']; its aggregate timings are stored
+    in the timings table of db_path, if set. With trace_path the spans
+    are also kept and written there as a Chrome trace.
+
+    With hand_cache_size each process puts an LRUCache of that size in
+    front of crib.scoring.count_hand for the run. results['cache_stats']
+    holds the combined stats of every process's caches (see cache_stats).
+
+    Games are logged to db_path, or not at all if it is None, through one
+    LogWriter for the whole run, at the given detail level; worker processes
+    send their game records back to it. With record_path they are appended
+    to that binary game log (see logger.binary_log) instead."""
+    tasks = make_tasks(master_seed, num_games, duplicate)
+    tally = Tally(results, len(tasks), duplicate, progress, stop, track_latency,
+                  trace or trace_path is not None, trace_path is not None)
+    writer = open_writer(db_path, record_path)
+
+    if workers <= 1:
+        hand_cache = _init_worker(p1_strategy, p2_strategy, target_score, simulation_id, writer, log_level,
+                                  track_latency, tally.trace, tally.trace_events, hand_cache_size)
+        outcomes = map(play_game, tasks)
+        pool = None
+    else:
+        collector = RecordCollector() if writer is not None else None
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(p1_strategy, p2_strategy, target_score, simulation_id, collector,
+                                             log_level, track_latency, tally.trace, tally.trace_events,
+                                             hand_cache_size))
+        chunksize = max(1, len(tasks) // (workers * 16))
+        outcomes = pool.map(play_game, tasks, chunksize=chunksize)
+
+    try:
+        for outcome in outcomes:
+            if tally.add(outcome, writer):
+                break
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+        else:
+            scoring.set_hand_cache(hand_cache)
+        if writer:
+            writer.close()
+
+    tally.finish(db_path, simulation_id, trace_path)
+    return results
+
+
+def open_writer(db_path, record_path=None):
+    """The writer a run logs its games through (see run_simulation)."""
+    if record_path is not None:
+        return BinaryLogWriter(record_path)
+    if db_path is not None:
+        return LogWriter(db_path)
+    return None
+
+
+class Tally:
+    """Merges the outcomes of a run's games (see play_game), in game
+    order, into its results dict, calling progress and checking the stop
+    rule as run_simulation describes."""
+
+    def __init__(self, results, num_games, duplicate=False, progress=None, stop=None,
+                 track_latency=False, trace=False, trace_events=False):
+        self.results = results
+        self.num_games = num_games
+        self.duplicate = duplicate
+        self.progress = progress
+        self.stop = stop
+        self.trace = trace
+        self.trace_events = trace_events
+        if track_latency:
+            results['latency'] = [LatencyHistogram(), LatencyHistogram()]
+        self.tracer = results['tracer'] = Tracer(keep_events=trace_events) if trace else None
+        self.game_num = 0
+        self._pair_p1_wins = 0
+        self._cache_stats = {} # the latest from each process
+        results['cache_stats'] = {}
+
+    def add(self, outcome, writer=None):
+        """Record the next game's outcome, sending its record (if any) to
+        writer. Returns True once the stop rule has made a decision."""
+        _, winner, _, record, latency, game_tracer, (pid, caches) = outcome
+        results = self.results
+        self.game_num += 1
+        if record is not None:
+            writer.submit(record)
+        if latency:
+            for total, hist in zip(results['latency'], latency):
+                total.merge(hist)
+        if game_tracer:
+            self.tracer.merge(game_tracer)
+        if caches:
+            self._cache_stats[pid] = caches
+            results['cache_stats'] = combine_stats(self._cache_stats.values())
+        record_result(results, winner)
+        if self.duplicate:
+            self._pair_p1_wins += winner == 0
+            if self.game_num % 2 == 0:
+                record_pair(results, self._pair_p1_wins)
+                self._pair_p1_wins = 0
+        if self.progress:
+            self.progress(self.game_num, self.num_games, results)
+        if self.stop and not (self.duplicate and self.game_num % 2):
+            decision = self.stop.check(results)
+            if decision:
+                results['decision'] = decision
+                return True
+        return False
+
+    def finish(self, db_path, simulation_id, trace_path=None):
+        """Store the run's timings once its writer is closed."""
+        if self.tracer:
+            if db_path is not None:
+                write_timings(db_path, self.tracer, simulation_id)
+            if trace_path is not None:
+                self.tracer.write_chrome_trace(trace_path)
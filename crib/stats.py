@@ -0,0 +1,99 @@
+# Statistics helpers for comparing strategies over simulated games
+
+import math
+
+Z_95 = 1.959963984540054 # two-sided 95% normal quantile
+
+
+def proportion_ci(successes, n, z=Z_95):
+    """Normal-approximation interval for a proportion.
+    Returns (estimate, half width)."""
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    return p, z * math.sqrt(p * (1 - p) / n)
+
+
+def paired_ci(pair_wins, pair_wins_sq, num_pairs, z=Z_95):
+    """Player 1 win rate from duplicate pairs, where each pair contributes
+    the number of its two games player 1 won (0, 1 or 2).
+
+    pair_wins and pair_wins_sq are the sum and sum of squares of those
+    counts. Returns (win rate, half width)."""
+    if num_pairs < 2:
+        return (pair_wins / (2 * num_pairs) if num_pairs else 0.0), 1.0
+    mean = pair_wins / num_pairs
+    variance = max(0.0, (pair_wins_sq - pair_wins * mean) / (num_pairs - 1))
+    return mean / 2, z * math.sqrt(variance / num_pairs) / 2
+
+
+def equivalent_games(rate, half_width, z=Z_95):
+    """Independent games needed to estimate rate to the same half width."""
+    if half_width <= 0:
+        return float('inf')
+    return z * z * rate * (1 - rate) / (half_width * half_width)
+
+
+def win_rate_interval(results, z=Z_95):
+    """Player 1's win rate and half width from simulation results, using
+    the paired interval when the run used duplicate deals."""
+    if results.get('pairs'):
+        return paired_ci(results['pair_wins'], results['pair_wins_sq'], results['pairs'], z)
+    return proportion_ci(results['p1_wins'], results['p1_wins'] + results['p2_wins'], z)
+
+
+class ConfidenceStop:
+    """Stop once player 1's win rate is known to within half_width either
+    side at 95% confidence."""
+    name = 'ci'
+
+    def __init__(self, half_width=0.02, min_games=100):
+        self.half_width = half_width
+        self.min_games = min_games
+
+    def describe(self):
+        return 'ci half_width=%g min_games=%d' % (self.half_width, self.min_games)
+
+    def check(self, results):
+        """Return a decision if the run can stop, else None."""
+        if results['p1_wins'] + results['p2_wins'] < self.min_games:
+            return None
+        _, half = win_rate_interval(results)
+        if half <= self.half_width:
+            return 'precision_reached'
+        return None
+
+
+class SPRTStop:
+    """Wald's sequential probability ratio test between "player 1 wins with
+    probability 0.5 + margin" and "... 0.5 - margin", i.e. which player is
+    better by at least margin. alpha and beta are the chances of picking
+    player 1 or player 2 wrongly. Every game counts as one observation,
+    including both games of a duplicate pair."""
+    name = 'sprt'
+
+    def __init__(self, margin=0.05, alpha=0.05, beta=None):
+        if not 0 < margin < 0.5:
+            raise ValueError('margin must be between 0 and 0.5')
+        self.margin = margin
+        self.alpha = alpha
+        self.beta = alpha if beta is None else beta
+        self.upper = math.log((1 - self.beta) / self.alpha)
+        self.lower = math.log(self.beta / (1 - self.alpha))
+        # log likelihood ratio contributed by one net player 1 win
+        self.step = math.log((0.5 + margin) / (0.5 - margin))
+
+    def describe(self):
+        return 'sprt margin=%g alpha=%g beta=%g' % (self.margin, self.alpha, self.beta)
+
+    def llr(self, results):
+        return (results['p1_wins'] - results['p2_wins']) * self.step
+
+    def check(self, results):
+        """Return a decision if the run can stop, else None."""
+        llr = self.llr(results)
+        if llr >= self.upper:
+            return 'p1_better'
+        if llr <= self.lower:
+            return 'p2_better'
+        return None
@@ -0,0 +1,136 @@
+# Trace module - opt-in timing spans for games and simulations
+#
+# A Tracer passed to crib.Game times each phase of every round (deal, crib,
+# turn up, play, score), every strategy decision, logger call and interface
+# call. It keeps aggregate counts and times per span, and optionally the
+# individual spans, which can be written as a Chrome trace (load it in
+# chrome://tracing or https://ui.perfetto.dev).
+
+import os
+import json
+import time
+
+PHASE = 'phase'
+STRATEGY = 'strategy'
+LOG = 'log'
+INTERFACE = 'interface'
+
+
+class Tracer:
+    """Collects timing spans. stats maps (category, name) to
+    [calls, total seconds, max seconds]; with keep_events the spans
+    themselves are kept too, up to max_events (later ones only count
+    towards stats)."""
+
+    def __init__(self, keep_events=False, max_events=100000):
+        self.stats = {}
+        self.events = [] if keep_events else None
+        self.max_events = max_events
+        self.dropped = 0
+        self.pid = os.getpid()
+
+    def add(self, category, name, start, end):
+        """Record a span from perf_counter times start to end."""
+        duration = end - start
+        entry = self.stats.get((category, name))
+        if entry is None:
+            self.stats[(category, name)] = [1, duration, duration]
+        else:
+            entry[0] += 1
+            entry[1] += duration
+            if duration > entry[2]:
+                entry[2] = duration
+        if self.events is not None:
+            if len(self.events) < self.max_events:
+                self.events.append((category, name, start, duration, self.pid))
+            else:
+                self.dropped += 1
+
+    def span(self, category, name):
+        """Context manager timing a block as one span."""
+        return _Span(self, category, name)
+
+    def merge(self, other):
+        """Add another tracer's spans (e.g. from a worker process)."""
+        for key, (calls, total, longest) in other.stats.items():
+            entry = self.stats.get(key)
+            if entry is None:
+                self.stats[key] = [calls, total, longest]
+            else:
+                entry[0] += calls
+                entry[1] += total
+                entry[2] = max(entry[2], longest)
+        if self.events is not None and other.events is not None:
+            room = self.max_events - len(self.events)
+            self.events.extend(other.events[:room])
+            self.dropped += other.dropped + max(0, len(other.events) - room)
+        return self
+
+    def summary(self):
+        """(category, name, calls, total seconds, max seconds) for every
+        span name, longest total first."""
+        rows = [(category, name, calls, total, longest)
+                for (category, name), (calls, total, longest) in self.stats.items()]
+        rows.sort(key=lambda row: -row[3])
+        return rows
+
+    def chrome_trace(self):
+        """The kept spans in Chrome trace event format, with times in
+        microseconds from the first span."""
+        events = self.events or []
+        origin = min((e[2] for e in events), default=0.0)
+        return {
+            'traceEvents': [
+                {'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': pid,
+                 'ts': round((start - origin) * 1e6, 3), 'dur': round(duration * 1e6, 3)}
+                for category, name, start, duration, pid in events
+            ],
+            'displayTimeUnit': 'ms',
+        }
+
+    def write_chrome_trace(self, path):
+        # json.dumps encodes in one pass in C; json.dump writes piecemeal
+        with open(path, 'w') as f:
+            f.write(json.dumps(self.chrome_trace()))
+
+
+class _Span:
+
+    def __init__(self, tracer, category, name):
+        self.tracer = tracer
+        self.category = category
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.add(self.category, self.name, self.start, time.perf_counter())
+
+
+class Traced:
+    """Wraps an object (a game's interface or logger) so that every method
+    call is recorded as a span in category; other attributes are passed
+    through. Each wrapped method is built once, on first use."""
+
+    def __init__(self, obj, tracer, category):
+        self._obj = obj
+        self._tracer = tracer
+        self._category = category
+
+    def __getattr__(self, name):
+        attr = getattr(self._obj, name)
+        if not callable(attr):
+            return attr
+        tracer = self._tracer
+        category = self._category
+
+        def traced(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                tracer.add(category, name, start, time.perf_counter())
+        self.__dict__[name] = traced
+        return traced
@@ -71,6 +71,8 @@ class Terminal:
 
 
 class Interface:
+    headless = False # True for interfaces that never display anything
+
     def __init__(self):
         self.terminal = Terminal()
         self.terminal.clear_screen()
@@ -162,12 +164,40 @@ class Interface:
     def show_simulation_results(self, results):
         pass
 
+
+class NullInterface(Interface):
+    """ Interface for headless games (simulations, tests). Builds no
+    Terminal and no method has side effects. """
+    headless = True
+
+    def __init__(self):
+        self.terminal = None
+        self.current_display = OrderedDict()
+        self.score = None
+
+    def print_line(self, text, centre=False):
+        pass
+
+    def get_input(self, msg):
+        raise RuntimeError('a headless game cannot ask for input')
+
+    def reset_display(self):
+        pass
+
+    def update_display(self, *args, **kwargs):
+        pass
+
+    def set_game(self, g):
+        pass
+
+
 class CribInterface(Interface):
     COL_WIDTH = 15
 
     def __init__(self):
 
         super().__init__()
+        self.progress = None # simulation ProgressReporter
 
 
     def colorize_card(self, card):
@@ -556,6 +586,74 @@ class CribInterface(Interface):
         except ValueError:
             target_score = 121
 
+        # Decision cache
+        cs = self.get_input('Discard cache size (default 0 = off): ').strip()
+        try:
+            cache_size = max(0, int(cs))
+        except ValueError:
+            cache_size = 0
+        hs = self.get_input('Hand score cache size (default 0 = off): ').strip()
+        try:
+            hand_cache_size = max(0, int(hs))
+        except ValueError:
+            hand_cache_size = 0
+
+        # Parallel workers
+        w = self.get_input('Worker processes (default 1): ').strip()
+        try:
+            workers = max(1, int(w))
+        except ValueError:
+            workers = 1
+
+        # Master seed
+        ms = self.get_input('Master seed (blank = random): ').strip()
+        try:
+            master_seed = int(ms)
+        except ValueError:
+            master_seed = None
+
+        # Log detail
+        log_level = self.get_input('Log detail - summary, rounds or full (default full): ').strip().lower()
+        if log_level not in ('summary', 'rounds', 'full'):
+            log_level = 'full'
+
+        # Duplicate deals
+        duplicate = self.get_input('Duplicate deals - play each deal twice with seats swapped? (y/n, default n): ').strip().lower() == 'y'
+
+        # Early stopping
+        stop_rule = self.get_input('Stop early - none, ci (confidence interval) or sprt (default none): ').strip().lower()
+        if stop_rule not in ('ci', 'sprt'):
+            stop_rule = None
+        ci_half_width = 0.02
+        sprt_margin = 0.05
+        sprt_alpha = 0.05
+        if stop_rule == 'ci':
+            v = self.get_input('Target win rate accuracy, +/- % at 95% confidence (default 2): ').strip()
+            try:
+                ci_half_width = float(v) / 100 if float(v) > 0 else ci_half_width
+            except ValueError:
+                pass
+        elif stop_rule == 'sprt':
+            v = self.get_input('Win rate margin to detect, % (default 5): ').strip()
+            try:
+                sprt_margin = float(v) / 100 if 0 < float(v) < 50 else sprt_margin
+            except ValueError:
+                pass
+            v = self.get_input('Significance level (default 0.05): ').strip()
+            try:
+                sprt_alpha = float(v) if 0 < float(v) < 0.5 else sprt_alpha
+            except ValueError:
+                pass
+
+        # Binary game log
+        record_path = self.get_input('Binary game log file (blank = log to the database): ').strip() or None
+
+        # Phase timings
+        trace = self.get_input('Time game phases and decisions? (y/n, default n): ').strip().lower() == 'y'
+        trace_path = None
+        if trace:
+            trace_path = self.get_input('Chrome trace file (blank = none): ').strip() or None
+
         return {
             'p1_strategy': p1_strategy,
             'p2_strategy': p2_strategy,
@@ -563,14 +661,27 @@ class CribInterface(Interface):
             'name': name,
             'description': description,
             'target_score': target_score,
+            'cache_size': cache_size,
+            'hand_cache_size': hand_cache_size,
+            'workers': workers,
+            'master_seed': master_seed,
+            'log_level': log_level,
+            'record_path': record_path,
+            'duplicate': duplicate,
+            'stop_rule': stop_rule,
+            'ci_half_width': ci_half_width,
+            'sprt_margin': sprt_margin,
+            'sprt_alpha': sprt_alpha,
+            'trace': trace,
+            'trace_path': trace_path,
         }
 
     def show_simulation_progress(self, game_num, total, results):
-        p1_wins = results.get('p1_wins', 0)
-        p2_wins = results.get('p2_wins', 0)
-        p1_name = results.get('p1_name', 'P1')
-        p2_name = results.get('p2_name', 'P2')
-        print('  Game %d/%d: %s %d - %s %d' % (game_num, total, p1_name, p1_wins, p2_name, p2_wins))
+        # redraws a single line at most twice a second rather than printing every game
+        from crib.progress import ProgressReporter
+        if game_num == 1 or self.progress is None:
+            self.progress = ProgressReporter()
+        self.progress(game_num, total, results)
 
     def show_simulation_results(self, results):
         p1_name = results.get('p1_name', 'P1')
@@ -592,3 +703,55 @@ class CribInterface(Interface):
         self.print_line('')
         self.print_line('  Total games: %d' % total)
         self.print_line('')
+
+        decision = results.get('decision')
+        if decision:
+            text = {'p1_better': '%s is better' % p1_name,
+                    'p2_better': '%s is better' % p2_name,
+                    'precision_reached': 'target accuracy reached'}.get(decision, decision)
+            self.print_line('  Stopped early: %s' % text)
+            self.print_line('')
+
+        if results.get('pairs'):
+            from crib.stats import paired_ci, equivalent_games
+            pairs = results['pairs']
+            rate, half = paired_ci(results['pair_wins'], results['pair_wins_sq'], pairs)
+            p1_sweeps = results.get('p1_sweeps', 0)
+            p2_sweeps = results.get('p2_sweeps', 0)
+            self.print_line('  Duplicate pairs: %d (%s won both: %d, %s won both: %d, split: %d)' % (
+                pairs, p1_name, p1_sweeps, p2_name, p2_sweeps, pairs - p1_sweeps - p2_sweeps))
+            self.print_line('  %s win rate: %.1f%% +/- %.1f%% (95%%)' % (p1_name, rate * 100, half * 100))
+            equivalent = equivalent_games(rate, half)
+            if equivalent != float('inf'):
+                self.print_line('  Independent games for the same precision: about %d' % equivalent)
+            self.print_line('')
+
+        if results.get('latency'):
+            from crib.progress import format_latency
+            for name, hist in zip((p1_name, p2_name), results['latency']):
+                if hist.count:
+                    self.print_line('  %s decisions: %d, mean %s, p99 %s, max %s' % (
+                        name, hist.count, format_latency(hist.mean),
+                        format_latency(hist.percentile(99)), format_latency(hist.max)))
+            self.print_line('')
+
+        if results.get('tracer'):
+            from crib.progress import format_latency
+            self.print_line('  Timings (phases include the strategy, log and interface calls made during them):')
+            for category, name, calls, total, longest in results['tracer'].summary()[:12]:
+                self.print_line('    %-10s %-32s %8d calls  %8.2fs  mean %s  max %s' % (
+                    category, name, calls, total, format_latency(total / calls), format_latency(longest)))
+            self.print_line('')
+
+        for strategy_name, stats in results.get('llm_stats', {}).items():
+            from crib.progress import format_latency
+            self.print_line('  %s: %d decisions, %d timed out, %.1f%% fell back, p50 %s, p99 %s' % (
+                strategy_name, stats['decisions'], stats['timeouts'], stats['fallback_rate'] * 100,
+                format_latency(stats['p50']), format_latency(stats['p99'])))
+            self.print_line('')
+
+        for strategy_name, stats in results.get('cache_stats', {}).items():
+            self.print_line('  %s cache: %d hits, %d misses, %d evictions (%.1f%% hit rate)' % (
+                strategy_name, stats['hits'], stats['misses'], stats['evictions'],
+                stats['hit_rate'] * 100))
+            self.print_line('')
@@ -0,0 +1,333 @@
+# Binary game log - compact append-only game records
+#
+# An alternative to logging games straight into SQLite for high-volume
+# simulations. Each game record built by logger.RecordLogger is packed into
+# a fixed-layout binary record and appended to a file; the file can be
+# streamed, indexed for random access, or imported into the SQLite schema
+# later:
+#
+#   python3 -m logger.binary_log import games.crbl [cribbage_log.db]
+#
+# File layout: a header (magic, version) followed by records, each a
+# little-endian u32 payload length and the payload. A payload is:
+#
+#   game     num_players u8, target_score u16, completion u8,
+#            simulation_id i32 (-1 = none),
+#            start_time, end_time i64 microseconds since 1970 (-1 = none)
+#   players  count u8, then per player: player_index u8, name, type,
+#            strategy (u8-length strings, 255 = none), final_score i16
+#            (-1 = none), is_winner u8
+#   rounds   count u16, then per round: round_number u16, dealer_index u8,
+#            turn_up card, jack_bonus_points u8, crib_score i8 (-1 = none),
+#            hands count u8, then per hand: player_index u8, dealt, kept
+#            and crib cards (u8 count, 255 = none, then one card byte each),
+#            hand_score i8, play_score i16, cumulative_score i16
+#            (-1 = none); plays count u16, then per play: player_index u8,
+#            sub_round u8, card, running_count u8, points u8
+#
+# Cards are one byte each: the Card id, or 255 for none. Play sequence
+# numbers are implicit (1, 2, ...).
+
+import os
+import sys
+import mmap
+import struct
+import sqlite3
+from datetime import datetime, timedelta
+from card_deck.card_deck import CARDS
+from logger.logger import card_to_str, write_game, _init_db
+
+MAGIC = b'CRBL'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sH')
+LENGTH = struct.Struct('<I')
+COUNT = struct.Struct('<H')
+
+GAME = struct.Struct('<BHBiqq')
+PLAYER_SCORE = struct.Struct('<hB')
+ROUND = struct.Struct('<HBBBbB')
+HAND_SCORES = struct.Struct('<bhh')
+PLAY = struct.Struct('<BBBBB')
+
+NONE = 255
+COMPLETIONS = ('in_progress', 'completed', 'quit')
+CARD_CODES = {card_to_str(c): c.id for c in CARDS}
+CARD_STRS = [card_to_str(c) for c in CARDS]
+EPOCH = datetime(1970, 1, 1)
+
+
+def _encode_time(iso):
+    if iso is None:
+        return -1
+    return (datetime.fromisoformat(iso) - EPOCH) // timedelta(microseconds=1)
+
+
+def _decode_time(micros):
+    if micros < 0:
+        return None
+    return (EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+def _opt(value):
+    return -1 if value is None else value
+
+
+def _unopt(value):
+    return None if value == -1 else value
+
+
+def _card_byte(card):
+    return NONE if card is None else CARD_CODES[card]
+
+
+def _card_str(code):
+    return None if code == NONE else CARD_STRS[code]
+
+
+def _pack_str(out, s):
+    if s is None:
+        out.append(NONE)
+        return
+    data = s.encode('utf-8')
+    if len(data) >= NONE:
+        raise ValueError('string too long for a binary game record: %r' % s)
+    out.append(len(data))
+    out += data
+
+
+def _pack_cards(out, cards):
+    if cards is None:
+        out.append(NONE)
+        return
+    out.append(len(cards))
+    out += bytes(CARD_CODES[c] for c in cards)
+
+
+def encode_game(record):
+    """Pack a game record (see logger.RecordLogger) into bytes."""
+    out = bytearray(GAME.pack(
+        record['num_players'], record['target_score'], COMPLETIONS.index(record['completion']),
+        _opt(record['simulation_id']), _encode_time(record['start_time']),
+        _encode_time(record['end_time'])))
+
+    out.append(len(record['players']))
+    for index, name, player_type, strategy, final_score, is_winner in record['players']:
+        out.append(index)
+        _pack_str(out, name)
+        _pack_str(out, player_type)
+        _pack_str(out, strategy)
+        out += PLAYER_SCORE.pack(_opt(final_score), is_winner)
+
+    out += COUNT.pack(len(record['rounds']))
+    for r in record['rounds']:
+        out += ROUND.pack(r['round_number'], r['dealer_index'], _card_byte(r['turn_up_card']),
+                          r['jack_bonus_points'], _opt(r['crib_score']), len(r['hands']))
+        for index, dealt, kept, crib_cards, hand_score, play_score, cumulative in r['hands']:
+            out.append(index)
+            _pack_cards(out, dealt)
+            _pack_cards(out, kept)
+            _pack_cards(out, crib_cards)
+            out += HAND_SCORES.pack(_opt(hand_score), _opt(play_score), _opt(cumulative))
+        plays = r['plays']
+        out += COUNT.pack(len(plays))
+        for index, _, sub_round, card, running_count, points in plays:
+            out += PLAY.pack(index, sub_round, _card_byte(card), running_count, points)
+    return bytes(out)
+
+
+class _Reader:
+    """Cursor over one packed record."""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def unpack(self, fmt):
+        values = fmt.unpack_from(self.data, self.pos)
+        self.pos += fmt.size
+        return values
+
+    def byte(self):
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def string(self):
+        n = self.byte()
+        if n == NONE:
+            return None
+        s = bytes(self.data[self.pos:self.pos + n]).decode('utf-8')
+        self.pos += n
+        return s
+
+    def cards(self):
+        n = self.byte()
+        if n == NONE:
+            return None
+        cards = [CARD_STRS[c] for c in self.data[self.pos:self.pos + n]]
+        self.pos += n
+        return cards
+
+
+def decode_game(data):
+    """Unpack bytes from encode_game back into a game record."""
+    reader = _Reader(data)
+    num_players, target_score, completion, simulation_id, start, end = reader.unpack(GAME)
+    record = {
+        'start_time': _decode_time(start),
+        'end_time': _decode_time(end),
+        'num_players': num_players,
+        'target_score': target_score,
+        'completion': COMPLETIONS[completion],
+        'simulation_id': _unopt(simulation_id),
+        'players': [],
+        'rounds': [],
+    }
+
+    for _ in range(reader.byte()):
+        index = reader.byte()
+        name, player_type, strategy = reader.string(), reader.string(), reader.string()
+        final_score, is_winner = reader.unpack(PLAYER_SCORE)
+        record['players'].append([index, name, player_type, strategy, _unopt(final_score), is_winner])
+
+    num_rounds, = reader.unpack(COUNT)
+    for _ in range(num_rounds):
+        round_number, dealer, turn_up, jack_bonus, crib_score, num_hands = reader.unpack(ROUND)
+        hands = []
+        for _ in range(num_hands):
+            index = reader.byte()
+            dealt, kept, crib_cards = reader.cards(), reader.cards(), reader.cards()
+            hand_score, play_score, cumulative = reader.unpack(HAND_SCORES)
+            hands.append([index, dealt, kept, crib_cards,
+                          _unopt(hand_score), _unopt(play_score), _unopt(cumulative)])
+        num_plays, = reader.unpack(COUNT)
+        plays = []
+        for sequence in range(1, num_plays + 1):
+            index, sub_round, card, running_count, points = reader.unpack(PLAY)
+            plays.append((index, sequence, sub_round, _card_str(card), running_count, points))
+        record['rounds'].append({
+            'round_number': round_number,
+            'dealer_index': dealer,
+            'turn_up_card': _card_str(turn_up),
+            'jack_bonus_points': jack_bonus,
+            'crib_score': _unopt(crib_score),
+            'hands': hands,
+            'plays': plays,
+        })
+    return record
+
+
+class BinaryLogWriter:
+    """ Appends game records to a binary log file. Has the same submit()
+    and close() as logger.LogWriter, so games can log to either. """
+
+    def __init__(self, path):
+        self.path = path
+        self.games_written = 0
+        if os.path.exists(path) and os.path.getsize(path):
+            _check_header(path)
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(FILE_HEADER.pack(MAGIC, VERSION))
+
+    def submit(self, record):
+        data = encode_game(record)
+        self._file.write(LENGTH.pack(len(data)) + data)
+        self.games_written += 1
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def _check_header(path):
+    with open(path, 'rb') as f:
+        header = f.read(FILE_HEADER.size)
+    if len(header) < FILE_HEADER.size or FILE_HEADER.unpack(header) != (MAGIC, VERSION):
+        raise ValueError('%s is not a version %d binary game log' % (path, VERSION))
+
+
+def read_games(path):
+    """Yield the game records in a binary log one at a time. A record cut
+    short at the end of the file (e.g. by a crash) is ignored."""
+    _check_header(path)
+    with open(path, 'rb') as f:
+        f.seek(FILE_HEADER.size)
+        while True:
+            prefix = f.read(LENGTH.size)
+            if len(prefix) < LENGTH.size:
+                return
+            length, = LENGTH.unpack(prefix)
+            data = f.read(length)
+            if len(data) < length:
+                return
+            yield decode_game(data)
+
+
+class GameIndex:
+    """ Random access to the games in a binary log through a memory map.
+    Opening scans the record lengths once; records are only decoded when
+    indexed. """
+
+    def __init__(self, path):
+        _check_header(path)
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.offsets = []
+        pos = FILE_HEADER.size
+        while pos + LENGTH.size <= size:
+            length, = LENGTH.unpack_from(self._map, pos)
+            if pos + LENGTH.size + length > size:
+                break
+            self.offsets.append(pos)
+            pos += LENGTH.size + length
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        pos = self.offsets[i]
+        length, = LENGTH.unpack_from(self._map, pos)
+        start = pos + LENGTH.size
+        return decode_game(self._map[start:start + length])
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def import_games(path, db_path='cribbage_log.db', batch_size=1000):
+    """Insert every game in a binary log into the SQLite schema, committing
+    every batch_size games. Returns the number of games imported."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    _init_db(conn)
+    count = 0
+    try:
+        for record in read_games(path):
+            write_game(conn, record)
+            count += 1
+            if count % batch_size == 0:
+                conn.commit()
+        conn.commit()
+    finally:
+        conn.close()
+    return count
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] != 'import':
+        print('usage: python3 -m logger.binary_log import LOG_FILE [DB_PATH]')
+        sys.exit(1)
+    n = import_games(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else 'cribbage_log.db')
+    print('imported %d games' % n)
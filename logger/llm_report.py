@@ -0,0 +1,105 @@
+# LLM call report - what the LLM strategies cost and how they behaved
+#
+# Summarizes the llm_calls table (one row per LLM decision, see
+# logger.record_llm_call) by model and decision type:
+#
+#   python3 -m logger.llm_report [DB_PATH] [--simulation ID] [--price MODEL IN OUT]
+#
+# --price gives a model's dollars per million input and output tokens, and
+# may be repeated; the report then includes the cost per decision. Rates are
+# fractions of decisions: fallbacks (any decision the strategy's fallback
+# made), timeouts, parse failures (a reply that was not a valid move) and
+# cache hits. Throughput is decisions per second over the span from the
+# first request to the last reply.
+
+import sys
+import sqlite3
+
+COLUMNS = ('model', 'decision', 'calls', 'mean_s', 'p50_s', 'p95_s', 'request_s', 'tokens_in', 'tokens_out',
+           'fallback', 'timeout', 'parse_fail', 'cache_hit', 'calls_per_s', 'cost')
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def summarize(conn, simulation_id=None, prices=None):
+    """One dict (keys COLUMNS) per model and decision type, for the calls
+    of simulation_id or all calls. prices maps a model to its dollars per
+    million (input, output) tokens; cost is None for other models."""
+    sql = ('SELECT model, decision, started_at, request_seconds, decision_seconds, input_tokens, output_tokens, '
+           'parsed, fallback, timed_out, cache_hit FROM llm_calls')
+    params = ()
+    if simulation_id is not None:
+        sql += ' WHERE simulation_id = ?'
+        params = (simulation_id,)
+    groups = {}
+    for row in conn.execute(sql + ' ORDER BY model, decision', params):
+        groups.setdefault(row[:2], []).append(row[2:])
+
+    report = []
+    for (model, decision), rows in groups.items():
+        n = len(rows)
+        seconds = sorted(r[2] for r in rows)
+        tokens_in = _mean([r[3] for r in rows])
+        tokens_out = _mean([r[4] for r in rows])
+        span = max(r[0] + r[2] for r in rows) - min(r[0] for r in rows)
+        cost = None
+        if prices and model in prices and tokens_in is not None and tokens_out is not None:
+            price_in, price_out = prices[model]
+            cost = (tokens_in * price_in + tokens_out * price_out) / 1e6
+        report.append({
+            'model': model, 'decision': decision, 'calls': n,
+            'mean_s': sum(seconds) / n, 'p50_s': _percentile(seconds, 0.5), 'p95_s': _percentile(seconds, 0.95),
+            'request_s': _mean([r[1] for r in rows]),
+            'tokens_in': tokens_in, 'tokens_out': tokens_out,
+            'fallback': sum(r[6] for r in rows) / n,
+            'timeout': sum(r[7] or 0 for r in rows) / n,
+            'parse_fail': sum(1 for r in rows if r[5] == 0) / n,
+            'cache_hit': sum(r[8] or 0 for r in rows) / n,
+            'calls_per_s': n / span if span > 0 else None,
+            'cost': cost,
+        })
+    return report
+
+
+def format_report(report):
+    def cell(value):
+        if value is None:
+            return '-'
+        if isinstance(value, float):
+            return '%.4g' % value
+        return str(value)
+    lines = ['  '.join('%-12s' % c for c in COLUMNS)]
+    for row in report:
+        lines.append('  '.join('%-12s' % cell(row[c]) for c in COLUMNS))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    db_path = 'cribbage_log.db'
+    simulation_id = None
+    prices = {}
+    try:
+        while args:
+            arg = args.pop(0)
+            if arg == '--simulation':
+                simulation_id = int(args.pop(0))
+            elif arg == '--price':
+                model, price_in, price_out = args[:3]
+                del args[:3]
+                prices[model] = (float(price_in), float(price_out))
+            else:
+                db_path = arg
+    except (IndexError, ValueError):
+        print('usage: python3 -m logger.llm_report [DB_PATH] [--simulation ID] [--price MODEL IN OUT]')
+        sys.exit(1)
+    conn = sqlite3.connect(db_path)
+    print(format_report(summarize(conn, simulation_id, prices)))
+    conn.close()
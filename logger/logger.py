@@ -1,5 +1,8 @@
 import sqlite3
 import json
+import queue
+import threading
+import contextvars
 from datetime import datetime
 from card_deck.card_deck import Card
 
@@ -14,6 +17,33 @@ def cards_to_json(cards):
     return json.dumps([card_to_str(c) for c in cards])
 
 
+
+# How much of each game is logged: games and players only; plus rounds and
+# hands; plus every play
+LOG_SUMMARY = 'summary'
+LOG_ROUNDS = 'rounds'
+LOG_FULL = 'full'
+LOG_LEVELS = (LOG_SUMMARY, LOG_ROUNDS, LOG_FULL)
+
+# The logger of the game whose decision is being made, set by crib.Game
+# while it plays. Strategies report their LLM calls to it (see
+# record_llm_call); each asyncio task has its own, so concurrent games
+# keep their calls apart.
+current_log = contextvars.ContextVar('cribbage_current_log', default=None)
+
+# an LLM call as passed to record_llm_call and kept in game records,
+# after the round number. parsed is 1 for a reply that was a valid move, 0
+# for one that was not, and None if there was no reply.
+LLM_CALL_FIELDS = ('model', 'decision', 'started_at', 'request_seconds', 'decision_seconds', 'input_tokens',
+                   'output_tokens', 'retries', 'cache_hit', 'parsed', 'fallback', 'timed_out')
+
+
+def check_log_level(level):
+    if level not in LOG_LEVELS:
+        raise ValueError('log level must be one of %s, not %r' % (', '.join(LOG_LEVELS), level))
+    return level
+
+
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS simulations (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -24,7 +54,14 @@ CREATE TABLE IF NOT EXISTS simulations (
     player2_strategy TEXT NOT NULL,
     target_score INTEGER NOT NULL,
     start_time TEXT NOT NULL,
-    end_time TEXT
+    end_time TEXT,
+    master_seed INTEGER,
+    games_played INTEGER,
+    stop_rule TEXT,
+    decision TEXT,
+    p1_win_rate REAL,
+    ci_low REAL,
+    ci_high REAL
 );
 
 CREATE TABLE IF NOT EXISTS games (
@@ -81,12 +118,46 @@ CREATE TABLE IF NOT EXISTS plays (
     points INTEGER NOT NULL DEFAULT 0
 );
 
+CREATE TABLE IF NOT EXISTS timings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    simulation_id INTEGER REFERENCES simulations(id),
+    game_id INTEGER REFERENCES games(id),
+    category TEXT NOT NULL,
+    name TEXT NOT NULL,
+    calls INTEGER NOT NULL,
+    total_seconds REAL NOT NULL,
+    max_seconds REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS llm_calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    simulation_id INTEGER REFERENCES simulations(id),
+    game_id INTEGER REFERENCES games(id),
+    round_id INTEGER REFERENCES rounds(id),
+    round_number INTEGER,
+    model TEXT NOT NULL,
+    decision TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    request_seconds REAL,
+    decision_seconds REAL NOT NULL,
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    retries INTEGER NOT NULL DEFAULT 0,
+    cache_hit INTEGER NOT NULL DEFAULT 0,
+    parsed INTEGER,
+    fallback INTEGER NOT NULL,
+    timed_out INTEGER NOT NULL DEFAULT 0
+);
+
 CREATE INDEX IF NOT EXISTS idx_games_completion ON games(completion);
 CREATE INDEX IF NOT EXISTS idx_game_players_strategy ON game_players(strategy_name, is_winner);
 CREATE INDEX IF NOT EXISTS idx_rounds_game ON rounds(game_id);
 CREATE INDEX IF NOT EXISTS idx_round_hands_round ON round_hands(round_id);
 CREATE INDEX IF NOT EXISTS idx_plays_round ON plays(round_id);
 CREATE INDEX IF NOT EXISTS idx_games_simulation ON games(simulation_id);
+CREATE INDEX IF NOT EXISTS idx_timings_simulation ON timings(simulation_id);
+CREATE INDEX IF NOT EXISTS idx_llm_calls_simulation ON llm_calls(simulation_id, model);
+CREATE INDEX IF NOT EXISTS idx_llm_calls_game ON llm_calls(game_id);
 """
 
 
@@ -101,31 +172,64 @@ def _player_type(player):
     return type_map.get(cls, cls)
 
 
-def _migrate(conn):
-    """Add columns that may be missing from older databases."""
-    # Check if games table exists at all
+def _add_column(conn, table, column, definition):
+    """Add a column to an existing table if it is missing."""
+    # Check if the table exists at all
     exists = conn.execute(
-        "SELECT name FROM sqlite_master WHERE type='table' AND name='games'"
+        "SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,)
     ).fetchone()
     if not exists:
         return
     try:
-        conn.execute("SELECT simulation_id FROM games LIMIT 0")
+        conn.execute("SELECT %s FROM %s LIMIT 0" % (column, table))
     except sqlite3.OperationalError:
-        conn.execute("ALTER TABLE games ADD COLUMN simulation_id INTEGER REFERENCES simulations(id)")
+        conn.execute("ALTER TABLE %s ADD COLUMN %s %s" % (table, column, definition))
         conn.commit()
 
 
+def _migrate(conn):
+    """Add columns that may be missing from older databases."""
+    _add_column(conn, 'games', 'simulation_id', 'INTEGER REFERENCES simulations(id)')
+    _add_column(conn, 'simulations', 'master_seed', 'INTEGER')
+    for column, definition in [('games_played', 'INTEGER'), ('stop_rule', 'TEXT'), ('decision', 'TEXT'),
+                               ('p1_win_rate', 'REAL'), ('ci_low', 'REAL'), ('ci_high', 'REAL')]:
+        _add_column(conn, 'simulations', column, definition)
+
+
 def _init_db(conn):
     """Initialize schema and run migrations."""
     _migrate(conn)
     conn.executescript(SCHEMA)
 
 
+def record_llm_call(**call):
+    """Log an LLM call (keyword arguments LLM_CALL_FIELDS) against the
+    current round of the game in current_log, if any. Nothing is written
+    here: loggers keep calls with the round or game and write them with it."""
+    log = current_log.get()
+    if log is not None:
+        for counter in ('retries', 'cache_hit', 'timed_out'):
+            call.setdefault(counter, 0)
+        log.llm_call(tuple(call.get(field) for field in LLM_CALL_FIELDS))
+
+
+_LLM_CALL_INSERT = ("INSERT INTO llm_calls (simulation_id, game_id, round_id, round_number, %s) "
+                    "VALUES (?, ?, ?, ?, %s)" % (', '.join(LLM_CALL_FIELDS), ', '.join('?' * len(LLM_CALL_FIELDS))))
+
+
 class Logger:
-    def __init__(self, game, db_path='cribbage_log.db', simulation_id=None):
+    """ Logs one game to SQLite.
+
+    Round state is kept in memory and written in a few batched statements
+    per phase; each round is committed once, when its hands are scored, and
+    the game row once when it starts and once when it ends. Below LOG_FULL
+    plays are not logged, and at LOG_SUMMARY neither are rounds. """
+
+    def __init__(self, game, db_path='cribbage_log.db', simulation_id=None, level=LOG_FULL):
         self.game = game
-        self.conn = sqlite3.connect(db_path)
+        self.level = check_log_level(level)
+        # parallel simulations share the database, so wait for locks
+        self.conn = sqlite3.connect(db_path, timeout=30)
         self.conn.execute("PRAGMA journal_mode=WAL")
         _init_db(self.conn)
 
@@ -138,140 +242,176 @@ class Logger:
 
         # Insert game_players rows
         from crib.crib import AI_Player
+        rows = []
         for i, p in enumerate(game.players):
             strategy_name = None
             if isinstance(p, AI_Player):
                 strategy_name = p.strategy.name if hasattr(p, 'strategy') else None
-            self.conn.execute(
-                "INSERT INTO game_players (game_id, player_index, player_name, player_type, strategy_name) "
-                "VALUES (?, ?, ?, ?, ?)",
-                (self.game_id, i, p.name, _player_type(p), strategy_name)
-            )
+            rows.append((self.game_id, i, p.name, _player_type(p), strategy_name))
+        self.conn.executemany(
+            "INSERT INTO game_players (game_id, player_index, player_name, player_type, strategy_name) "
+            "VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
         self.conn.commit()
 
+        self.simulation_id = simulation_id
         self.current_round_id = None
+        self._round_number = None
+        self._dealer_index = None
+        self._dealt = []
+        self._plays = []
+        self._llm_calls = []
         self._play_sequence = 0
         self._sub_round = 1
 
     def new_round(self, round_number, dealt_result):
+        if self.level == LOG_SUMMARY:
+            return
         game = self.game
-        cur = self.conn.execute(
-            "INSERT INTO rounds (game_id, round_number, dealer_index) VALUES (?, ?, ?)",
-            (self.game_id, round_number, game.crib_player)
-        )
-        self.current_round_id = cur.lastrowid
-
-        # Snapshot each player's dealt hand
-        for i, p in enumerate(game.players):
-            self.conn.execute(
-                "INSERT INTO round_hands (round_id, player_index, dealt_cards) VALUES (?, ?, ?)",
-                (self.current_round_id, i, cards_to_json(p.hand.cards))
-            )
-        self.conn.commit()
+        # Snapshot each player's dealt hand; the round is written once the
+        # crib is known
+        self.current_round_id = None
+        self._round_number = round_number
+        self._dealer_index = game.crib_player
+        self._dealt = [[card_to_str(c) for c in p.hand.cards] for p in game.players]
 
         # Reset play tracking for new round
+        self._plays = []
         self._play_sequence = 0
         self._sub_round = 1
 
+    def _insert_round(self):
+        cur = self.conn.execute(
+            "INSERT INTO rounds (game_id, round_number, dealer_index) VALUES (?, ?, ?)",
+            (self.game_id, self._round_number, self._dealer_index)
+        )
+        self.current_round_id = cur.lastrowid
+
     def crib(self, crib_result):
+        if self.level == LOG_SUMMARY:
+            return
         game = self.game
-        round_obj = game.game_round
+        self._insert_round()
 
+        rows = []
         for i, p in enumerate(game.players):
-            kept_cards = cards_to_json(p.hand.cards)
             # Determine which cards went to crib by diffing dealt vs kept
-            cur = self.conn.execute(
-                "SELECT dealt_cards FROM round_hands WHERE round_id = ? AND player_index = ?",
-                (self.current_round_id, i)
-            )
-            dealt_json = cur.fetchone()[0]
-            dealt_list = json.loads(dealt_json)
             kept_list = [card_to_str(c) for c in p.hand.cards]
-            crib_cards = [c for c in dealt_list if c not in kept_list]
-
-            self.conn.execute(
-                "UPDATE round_hands SET kept_cards = ?, crib_cards = ? "
-                "WHERE round_id = ? AND player_index = ?",
-                (kept_cards, json.dumps(crib_cards), self.current_round_id, i)
-            )
-        self.conn.commit()
+            crib_cards = [c for c in self._dealt[i] if c not in kept_list]
+            rows.append((self.current_round_id, i, json.dumps(self._dealt[i]),
+                         json.dumps(kept_list), json.dumps(crib_cards)))
+        self.conn.executemany(
+            "INSERT INTO round_hands (round_id, player_index, dealt_cards, kept_cards, crib_cards) "
+            "VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
 
     def turn_up(self, turn_up_result):
+        if self.level == LOG_SUMMARY:
+            return
         round_obj = self.game.game_round
         jack_bonus = 2 if round_obj.turn_up.number == 11 else 0
         self.conn.execute(
             "UPDATE rounds SET turn_up_card = ?, jack_bonus_points = ? WHERE id = ?",
             (card_to_str(round_obj.turn_up), jack_bonus, self.current_round_id)
         )
-        self.conn.commit()
 
     def the_play(self, played_result):
-        pass
+        if not self._plays:
+            return
+        self.conn.executemany(
+            "INSERT INTO plays (round_id, player_index, sequence, sub_round, card, running_count, points) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            self._plays
+        )
+        self._plays = []
 
     def log_play(self, player_index, card, running_count, points):
-        """Log a single play (card or go) to the plays table."""
+        """Buffer a single play (card or go); written by the_play."""
         self._play_sequence += 1
         card_str = card_to_str(card) if card else None
-        self.conn.execute(
-            "INSERT INTO plays (round_id, player_index, sequence, sub_round, card, running_count, points) "
-            "VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (self.current_round_id, player_index, self._play_sequence,
-             self._sub_round, card_str, running_count, points)
-        )
-        self.conn.commit()
+        self._plays.append((self.current_round_id, player_index, self._play_sequence,
+                            self._sub_round, card_str, running_count, points))
 
     def new_sub_round(self):
         """Increment sub-round counter when count resets."""
         self._sub_round += 1
 
     def score_hands(self, score_result):
+        if self.level == LOG_SUMMARY:
+            return
         game = self.game
         round_obj = game.game_round
 
         from crib.crib import count_hand
-        for i, p in enumerate(game.players):
-            hand_score = count_hand(p.played_cards, round_obj.turn_up)
-            self.conn.execute(
-                "UPDATE round_hands SET hand_score = ?, play_score = ?, cumulative_score = ? "
-                "WHERE round_id = ? AND player_index = ?",
-                (hand_score, round_obj.score[i], game.score[i],
-                 self.current_round_id, i)
-            )
+        self.conn.executemany(
+            "UPDATE round_hands SET hand_score = ?, play_score = ?, cumulative_score = ? "
+            "WHERE round_id = ? AND player_index = ?",
+            [(count_hand(p.played_cards, round_obj.turn_up), round_obj.score[i], game.score[i],
+              self.current_round_id, i)
+             for i, p in enumerate(game.players)]
+        )
 
         crib_score = count_hand(round_obj.crib, round_obj.turn_up)
         self.conn.execute(
             "UPDATE rounds SET crib_score = ? WHERE id = ?",
             (crib_score, self.current_round_id)
         )
+        self._write_llm_calls()
         self.conn.commit()
 
+    def llm_call(self, call):
+        """Buffer an LLM call (see record_llm_call); written with the
+        round, or with the game's end at LOG_SUMMARY."""
+        self._llm_calls.append((self.game.round_number, *call))
+
+    def _write_llm_calls(self):
+        if self._llm_calls:
+            # a round not written (at LOG_SUMMARY, or quit before the crib) has no id
+            self.conn.executemany(
+                _LLM_CALL_INSERT,
+                [(self.simulation_id, self.game_id, self.current_round_id if number == self._round_number else None,
+                  number, *call) for number, *call in self._llm_calls])
+            self._llm_calls = []
+
     def record_winner(self, winner):
         game = self.game
         now = datetime.now().isoformat()
+        self._write_llm_calls()
         self.conn.execute(
             "UPDATE games SET end_time = ?, completion = 'completed' WHERE id = ?",
             (now, self.game_id)
         )
-        for i, p in enumerate(game.players):
-            self.conn.execute(
-                "UPDATE game_players SET final_score = ?, is_winner = ? "
-                "WHERE game_id = ? AND player_index = ?",
-                (game.score[i], 1 if i == winner else 0, self.game_id, i)
-            )
+        self.conn.executemany(
+            "UPDATE game_players SET final_score = ?, is_winner = ? "
+            "WHERE game_id = ? AND player_index = ?",
+            [(game.score[i], 1 if i == winner else 0, self.game_id, i)
+             for i in range(len(game.players))]
+        )
         self.conn.commit()
 
     def record_quit(self):
         game = self.game
         now = datetime.now().isoformat()
+        if self._plays and self.current_round_id is not None:
+            self.the_play(None)
+        if self._dealt and self.current_round_id is None:
+            # quit before the discards: still keep the round and its deal
+            self._insert_round()
+            self.conn.executemany(
+                "INSERT INTO round_hands (round_id, player_index, dealt_cards) VALUES (?, ?, ?)",
+                [(self.current_round_id, i, json.dumps(dealt)) for i, dealt in enumerate(self._dealt)]
+            )
+        self._write_llm_calls()
         self.conn.execute(
             "UPDATE games SET end_time = ?, completion = 'quit' WHERE id = ?",
             (now, self.game_id)
         )
-        for i, p in enumerate(game.players):
-            self.conn.execute(
-                "UPDATE game_players SET final_score = ? WHERE game_id = ? AND player_index = ?",
-                (game.score[i], self.game_id, i)
-            )
+        self.conn.executemany(
+            "UPDATE game_players SET final_score = ? WHERE game_id = ? AND player_index = ?",
+            [(game.score[i], self.game_id, i) for i in range(len(game.players))]
+        )
         self.conn.commit()
 
     def close(self):
@@ -280,25 +420,356 @@ class Logger:
             self.conn = None
 
 
-def create_simulation(db_path, name, description, num_games, p1_strategy, p2_strategy, target_score):
+class NullLogger:
+    """ Stands in for Logger when a game is not logged. """
+
+    game_id = None
+    level = None
+
+    def __init__(self, game=None, db_path=None, simulation_id=None, level=None):
+        self.game = game
+
+    def new_round(self, round_number, dealt_result):
+        pass
+
+    def crib(self, crib_result):
+        pass
+
+    def turn_up(self, turn_up_result):
+        pass
+
+    def the_play(self, played_result):
+        pass
+
+    def log_play(self, player_index, card, running_count, points):
+        pass
+
+    def new_sub_round(self):
+        pass
+
+    def score_hands(self, score_result):
+        pass
+
+    def record_winner(self, winner):
+        pass
+
+    def record_quit(self):
+        pass
+
+    def llm_call(self, call):
+        pass
+
+    def close(self):
+        pass
+
+
+class RecordLogger:
+    """ Builds a whole game as one record in memory instead of writing it.
+
+    On close() the record is handed to writer.submit(); a LogWriter inserts
+    it with write_game(). A record is a dict:
+
+        start_time, end_time, num_players, target_score, completion,
+        simulation_id,
+        players: [(player_index, player_name, player_type, strategy_name,
+                   final_score, is_winner)],
+        rounds: [{round_number, dealer_index, turn_up_card,
+                  jack_bonus_points, crib_score,
+                  hands: [(player_index, dealt_cards, kept_cards,
+                           crib_cards, hand_score, play_score,
+                           cumulative_score)],
+                  plays: [(player_index, sequence, sub_round, card,
+                           running_count, points)]}],
+        llm_calls: [(round_number, *LLM_CALL_FIELDS)], only if any were made
+
+    Cards are card_to_str strings, and dealt/kept/crib cards lists of them;
+    JSON encoding is left to write_game. Records are plain data, so they
+    can be pickled back from worker processes (the binary game log does
+    not keep llm_calls). At LOG_SUMMARY rounds is empty, and below LOG_FULL so is
+    every round's plays. """
+
+    game_id = None
+
+    def __init__(self, game, writer, simulation_id=None, level=LOG_FULL):
+        self.game = game
+        self.writer = writer
+        self.level = check_log_level(level)
+
+        from crib.crib import AI_Player
+        players = []
+        for i, p in enumerate(game.players):
+            strategy_name = None
+            if isinstance(p, AI_Player):
+                strategy_name = p.strategy.name if hasattr(p, 'strategy') else None
+            players.append([i, p.name, _player_type(p), strategy_name, None, 0])
+
+        self.record = {
+            'start_time': datetime.now().isoformat(),
+            'end_time': None,
+            'num_players': game.num_players,
+            'target_score': game.target_score,
+            'completion': 'in_progress',
+            'simulation_id': simulation_id,
+            'players': players,
+            'rounds': [],
+        }
+        self._round = None
+        self._dealt = []
+        self._play_sequence = 0
+        self._sub_round = 1
+
+    def new_round(self, round_number, dealt_result):
+        if self.level == LOG_SUMMARY:
+            return
+        game = self.game
+        self._round = {
+            'round_number': round_number,
+            'dealer_index': game.crib_player,
+            'turn_up_card': None,
+            'jack_bonus_points': 0,
+            'crib_score': None,
+            'hands': [],
+            'plays': [],
+        }
+        self.record['rounds'].append(self._round)
+        self._dealt = [[card_to_str(c) for c in p.hand.cards] for p in game.players]
+        self._play_sequence = 0
+        self._sub_round = 1
+
+    def crib(self, crib_result):
+        if self.level == LOG_SUMMARY:
+            return
+        for i, p in enumerate(self.game.players):
+            kept_list = [card_to_str(c) for c in p.hand.cards]
+            crib_cards = [c for c in self._dealt[i] if c not in kept_list]
+            self._round['hands'].append([i, self._dealt[i], kept_list, crib_cards, None, None, None])
+
+    def turn_up(self, turn_up_result):
+        if self.level == LOG_SUMMARY:
+            return
+        turn_up = self.game.game_round.turn_up
+        self._round['turn_up_card'] = card_to_str(turn_up)
+        self._round['jack_bonus_points'] = 2 if turn_up.number == 11 else 0
+
+    def the_play(self, played_result):
+        pass
+
+    def log_play(self, player_index, card, running_count, points):
+        self._play_sequence += 1
+        self._round['plays'].append((player_index, self._play_sequence, self._sub_round,
+                                     card_to_str(card) if card else None, running_count, points))
+
+    def new_sub_round(self):
+        self._sub_round += 1
+
+    def score_hands(self, score_result):
+        if self.level == LOG_SUMMARY:
+            return
+        game = self.game
+        round_obj = game.game_round
+
+        from crib.crib import count_hand
+        for hand in self._round['hands']:
+            i = hand[0]
+            hand[4:] = [count_hand(game.players[i].played_cards, round_obj.turn_up),
+                        round_obj.score[i], game.score[i]]
+        self._round['crib_score'] = count_hand(round_obj.crib, round_obj.turn_up)
+
+    def record_winner(self, winner):
+        self.record['end_time'] = datetime.now().isoformat()
+        self.record['completion'] = 'completed'
+        for player in self.record['players']:
+            i = player[0]
+            player[4:] = [self.game.score[i], 1 if i == winner else 0]
+
+    def record_quit(self):
+        if self._round is not None and not self._round['hands']:
+            # quit before the discards: keep the deal, with no kept or crib cards
+            self._round['hands'] = [[i, dealt, None, None, None, None, None] for i, dealt in enumerate(self._dealt)]
+        self.record['end_time'] = datetime.now().isoformat()
+        self.record['completion'] = 'quit'
+        for player in self.record['players']:
+            player[4] = self.game.score[player[0]]
+
+    def llm_call(self, call):
+        self.record.setdefault('llm_calls', []).append((self.game.round_number, *call))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.submit(self.record)
+            self.writer = None
+
+
+def _json_or_none(cards):
+    return None if cards is None else json.dumps(cards)
+
+
+def write_game(conn, record):
+    """Insert a game record (see RecordLogger) without committing.
+    Returns the new game id."""
+    cur = conn.execute(
+        "INSERT INTO games (start_time, end_time, num_players, target_score, completion, simulation_id) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (record['start_time'], record['end_time'], record['num_players'], record['target_score'],
+         record['completion'], record['simulation_id'])
+    )
+    game_id = cur.lastrowid
+    conn.executemany(
+        "INSERT INTO game_players (game_id, player_index, player_name, player_type, strategy_name, "
+        "final_score, is_winner) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(game_id, *player) for player in record['players']]
+    )
+    round_ids = {}
+    for r in record['rounds']:
+        cur = conn.execute(
+            "INSERT INTO rounds (game_id, round_number, dealer_index, turn_up_card, jack_bonus_points, "
+            "crib_score) VALUES (?, ?, ?, ?, ?, ?)",
+            (game_id, r['round_number'], r['dealer_index'], r['turn_up_card'], r['jack_bonus_points'],
+             r['crib_score'])
+        )
+        round_id = cur.lastrowid
+        conn.executemany(
+            "INSERT INTO round_hands (round_id, player_index, dealt_cards, kept_cards, crib_cards, "
+            "hand_score, play_score, cumulative_score) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(round_id, i, json.dumps(dealt), _json_or_none(kept), _json_or_none(crib_cards), *scores)
+             for i, dealt, kept, crib_cards, *scores in r['hands']]
+        )
+        conn.executemany(
+            "INSERT INTO plays (round_id, player_index, sequence, sub_round, card, running_count, points) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(round_id, *play) for play in r['plays']]
+        )
+        round_ids[r['round_number']] = round_id
+    llm_calls = record.get('llm_calls')
+    if llm_calls:
+        conn.executemany(
+            _LLM_CALL_INSERT,
+            [(record['simulation_id'], game_id, round_ids.get(number), number, *call)
+             for number, *call in llm_calls])
+    return game_id
+
+
+class LogWriter:
+    """ Writes game records to one database from a background thread.
+
+    The connection is opened and the schema set up once. Games submit
+    records through a bounded queue; the writer thread inserts whatever has
+    queued up, up to batch_size records, and commits them together. """
+
+    def __init__(self, db_path='cribbage_log.db', batch_size=64, max_queued=1024):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.games_written = 0
+        self._queue = queue.Queue(max_queued)
+        self._error = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='cribbage-log-writer', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        self._raise_error()
+
+    def submit(self, record):
+        """Queue a game record for writing; blocks if the queue is full."""
+        self._raise_error()
+        self._queue.put(record)
+
+    def close(self):
+        """Write everything still queued and stop the writer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._raise_error()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self):
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            _init_db(conn)
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+
+        try:
+            done = False
+            while not done:
+                batch = [self._queue.get()]
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                # the sentinel from close() may be anywhere in the batch
+                done = None in batch
+                for record in batch:
+                    if record is None:
+                        break
+                    write_game(conn, record)
+                    self.games_written += 1
+                conn.commit()
+        except Exception as e:
+            self._error = e
+            # keep draining until close() so submit() never blocks on a dead writer
+            if not done:
+                while self._queue.get() is not None:
+                    pass
+        finally:
+            conn.close()
+
+
+def create_simulation(db_path, name, description, num_games, p1_strategy, p2_strategy, target_score,
+                      master_seed=None):
     """Create a simulation record and return (conn, simulation_id)."""
     conn = sqlite3.connect(db_path)
     conn.execute("PRAGMA journal_mode=WAL")
     _init_db(conn)
     cur = conn.execute(
-        "INSERT INTO simulations (name, description, num_games, player1_strategy, player2_strategy, target_score, start_time) "
-        "VALUES (?, ?, ?, ?, ?, ?, ?)",
-        (name, description, num_games, p1_strategy, p2_strategy, target_score, datetime.now().isoformat())
+        "INSERT INTO simulations (name, description, num_games, player1_strategy, player2_strategy, target_score, "
+        "start_time, master_seed) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (name, description, num_games, p1_strategy, p2_strategy, target_score, datetime.now().isoformat(),
+         master_seed)
     )
     conn.commit()
     return conn, cur.lastrowid
 
 
-def complete_simulation(conn, simulation_id):
-    """Set end_time on a simulation and close the connection."""
+def write_timings(db_path, tracer, simulation_id=None, game_id=None):
+    """Store a crib.trace.Tracer's aggregate timings for a simulation or a
+    single game."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        _init_db(conn)
+        conn.executemany(
+            "INSERT INTO timings (simulation_id, game_id, category, name, calls, total_seconds, max_seconds) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(simulation_id, game_id) + row for row in tracer.summary()]
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def complete_simulation(conn, simulation_id, games_played=None, stop_rule=None, decision=None,
+                        p1_win_rate=None, ci_half_width=None):
+    """Set end_time and the outcome on a simulation and close the connection.
+    stop_rule and decision describe early stopping, if it was used; the
+    interval is stored as ci_low/ci_high around p1_win_rate."""
+    ci_low = ci_high = None
+    if p1_win_rate is not None and ci_half_width is not None:
+        ci_low = max(0.0, p1_win_rate - ci_half_width)
+        ci_high = min(1.0, p1_win_rate + ci_half_width)
     conn.execute(
-        "UPDATE simulations SET end_time = ? WHERE id = ?",
-        (datetime.now().isoformat(), simulation_id)
+        "UPDATE simulations SET end_time = ?, games_played = ?, stop_rule = ?, decision = ?, "
+        "p1_win_rate = ?, ci_low = ?, ci_high = ? WHERE id = ?",
+        (datetime.now().isoformat(), games_played, stop_rule, decision, p1_win_rate, ci_low, ci_high,
+         simulation_id)
     )
     conn.commit()
     conn.close()
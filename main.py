@@ -1,42 +1,66 @@
 import sys
+import queue
+import atexit
 import sqlite3
 import logging
+import logging.handlers
 from dotenv import load_dotenv
-from crib import crib
-from crib.ai_strategy import RandomStrategy, BasicStrategy, OptimizedStrategy, LLMStrategy, get_llm_strategies
+from crib import crib, simulation, stats, async_games
+from crib.ai_strategy import (RandomStrategy, BasicStrategy, OptimizedStrategy, ExpectimaxStrategy, LLMStrategy,
+                              AsyncLLMStrategy, ModelList)
+from crib.cache import LRUCache, DiskCache
 from interface import interface
 from logger.logger import create_simulation, complete_simulation
 
 if __name__ == '__main__':
     load_dotenv()
 
-    # Set up LLM call logging to file
+    # Set up LLM call logging to file, written by a listener thread so
+    # decisions never wait on the disk
     llm_logger = logging.getLogger('cribbage.llm')
     llm_logger.setLevel(logging.INFO)
     handler = logging.FileHandler('llm_calls.log')
     handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
-    llm_logger.addHandler(handler)
+    log_queue = queue.SimpleQueue()
+    llm_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    atexit.register(listener.stop)
     target_score = int(sys.argv[1]) if len(sys.argv) > 1 else 121
 
-    strategies = [RandomStrategy(), BasicStrategy(), OptimizedStrategy()]
+    strategies = [RandomStrategy(), BasicStrategy(), OptimizedStrategy(), ExpectimaxStrategy()]
 
-    llm_strategies, llm_error = get_llm_strategies()
-    strategies.extend(llm_strategies)
+    # the cached model list is used straight away and refreshed in the background
+    models = ModelList()
+    models.start_refresh()
 
     interf = interface.CribInterface()
+    llm_cache = None
     try:
         interf.welcome()
-        if llm_error:
-            interf.print_line(llm_error)
-
         mode = interf.choose_mode()
 
+        if models.models is None:
+            models.wait(30) # first launch: nothing cached yet
+        strategies.extend(models.strategies())
+        if not models.models and models.error:
+            interf.print_line(models.error)
+
         if mode == 'play':
             player_name = interf.get_input('Enter player name: ')
             strategy = interf.choose_ai(strategies)
             if isinstance(strategy, LLMStrategy):
                 if interf.get_input('Enable LLM explanations? (y/n): ').strip().lower() == 'y':
                     strategy.explain = True
+                d = interf.get_input('Seconds to wait for each LLM move (default 10, 0 = no limit): ').strip()
+                try:
+                    deadline = float(d)
+                except ValueError:
+                    deadline = 10.0
+                if deadline > 0:
+                    # past the deadline AI-Opt plays instead, so a slow reply can't stall the game
+                    strategy.deadline = deadline
+                    strategy.fallback = OptimizedStrategy()
 
             p1 = crib.HumanPlayer(player_name, interf)
             p2 = crib.AI_Player(strategy)
@@ -45,6 +69,8 @@ if __name__ == '__main__':
             interf.set_game(g)
 
             g.play()
+            if isinstance(strategy, LLMStrategy):
+                llm_logger.info("DECISIONS [%s]: %s", strategy.model, strategy.decision_stats())
 
         elif mode == 'simulate':
             config = interf.setup_simulation(strategies)
@@ -54,15 +80,56 @@ if __name__ == '__main__':
                 if interf.get_input('Enable LLM explanations? (y/n): ').strip().lower() == 'y':
                     for s in llm_strats:
                         s.explain = True
+                while True:
+                    cache_mode = interf.get_input('LLM reply cache - off, on or replay (default off): ').strip().lower()
+                    if cache_mode not in ('on', 'replay'):
+                        break
+                    # replay answers only from llm_cache.db, for repeatable runs with no API calls
+                    try:
+                        llm_cache = DiskCache('llm_cache.db', ttl=30 * 24 * 3600, replay=cache_mode == 'replay')
+                    except FileNotFoundError as e:
+                        interf.print_line(str(e))
+                        continue
+                    for s in llm_strats:
+                        s.cache = llm_cache
+                    break
+                # LLM games mostly wait on the API, so many are played at once
+                c = interf.get_input('Concurrent games (default 8): ').strip()
+                try:
+                    concurrency = max(1, int(c))
+                except ValueError:
+                    concurrency = 8
+                async_strats = {id(s): AsyncLLMStrategy.from_strategy(s) for s in llm_strats}
+                config['p1_strategy'] = async_strats.get(id(config['p1_strategy']), config['p1_strategy'])
+                config['p2_strategy'] = async_strats.get(id(config['p2_strategy']), config['p2_strategy'])
             num_games = config['num_games']
+            if config.get('duplicate') and num_games % 2:
+                num_games += 1 # duplicate deals are played in pairs
             sim_target = config['target_score']
             p1_strategy = config['p1_strategy']
             p2_strategy = config['p2_strategy']
 
+            cached_strats = [s for s in {id(s): s for s in [p1_strategy, p2_strategy]}.values()
+                             if isinstance(s, OptimizedStrategy)]
+            if config.get('cache_size'):
+                for s in cached_strats:
+                    s.cache = LRUCache(config['cache_size'])
+
+            master_seed = config.get('master_seed')
+            if master_seed is None:
+                master_seed = simulation.new_master_seed()
+
+            stop = None
+            if config.get('stop_rule') == 'ci':
+                stop = stats.ConfidenceStop(config['ci_half_width'])
+            elif config.get('stop_rule') == 'sprt':
+                stop = stats.SPRTStop(config['sprt_margin'], config['sprt_alpha'])
+
             db_path = 'cribbage_log.db'
             conn, sim_id = create_simulation(
                 db_path, config['name'], config['description'],
-                num_games, p1_strategy.name, p2_strategy.name, sim_target
+                num_games, p1_strategy.name, p2_strategy.name, sim_target,
+                master_seed=master_seed
             )
             conn.close()
 
@@ -74,28 +141,42 @@ if __name__ == '__main__':
                 'total': num_games,
             }
 
-            headless_interf = interface.Interface()
-
-            for i in range(1, num_games + 1):
-                p1 = crib.AI_Player(p1_strategy, simulate=True)
-                p2 = crib.AI_Player(p2_strategy, simulate=True)
-
-                g = crib.Game(2, [p1, p2], headless_interf, target_score=sim_target,
-                              simulation_id=sim_id)
-                g.play()
-
-                winner = g.score.index(max(g.score))
-                if winner == 0:
-                    results['p1_wins'] += 1
-                else:
-                    results['p2_wins'] += 1
-
-                interf.show_simulation_progress(i, num_games, results)
+            run_options = dict(
+                progress=interf.show_simulation_progress,
+                db_path=db_path, log_level=config.get('log_level', 'full'),
+                record_path=config.get('record_path'), duplicate=config.get('duplicate', False),
+                stop=stop, track_latency=True, trace=config.get('trace', False),
+                trace_path=config.get('trace_path'), hand_cache_size=config.get('hand_cache_size', 0)
+            )
+            if llm_strats:
+                # LLM clients can't be shared with worker processes
+                async_games.run_simulation_concurrent(
+                    p1_strategy, p2_strategy, num_games, sim_target, sim_id, results,
+                    master_seed, concurrency=concurrency, **run_options)
+            else:
+                simulation.run_simulation(
+                    p1_strategy, p2_strategy, num_games, sim_target, sim_id, results,
+                    master_seed, workers=config.get('workers', 1), **run_options)
+            results['total'] = results['p1_wins'] + results['p2_wins']
+            win_rate, half_width = stats.win_rate_interval(results)
+
+            results['llm_stats'] = {s.name: s.decision_stats() for s in
+                                    {id(s): s for s in [p1_strategy, p2_strategy]}.values()
+                                    if isinstance(s, LLMStrategy)}
+            if llm_cache is not None:
+                results['cache_stats']['LLM reply'] = llm_cache.stats()
 
             conn_final = sqlite3.connect(db_path)
-            complete_simulation(conn_final, sim_id)
+            complete_simulation(conn_final, sim_id, games_played=results['total'],
+                                stop_rule=stop.describe() if stop else None,
+                                decision=results.get('decision', 'inconclusive') if stop else None,
+                                p1_win_rate=win_rate, ci_half_width=half_width)
 
             interf.show_simulation_results(results)
 
     except interface.GameQuitException:
         pass
+    finally:
+        # commits last-used times the cache has not written yet
+        if llm_cache is not None:
+            llm_cache.close()
@@ -1,10 +1,17 @@
 import unittest
+import os
+import random
+import json
+import time
+import tempfile
 from unittest.mock import patch, MagicMock
-from card_deck.card_deck import Hand, Card
+from card_deck.card_deck import Hand, Card, Deck, mask_of
 from crib.ai_strategy import (
-    RandomStrategy, BasicStrategy, OptimizedStrategy,
-    LLMStrategy, get_llm_strategies,
+    RandomStrategy, BasicStrategy, OptimizedStrategy, ExpectimaxStrategy,
+    LLMStrategy, ModelList, get_llm_strategies,
 )
+from crib.pegging import PeggingState
+from crib.cache import DiskCache
 
 
 def make_hand(cards):
@@ -76,6 +83,57 @@ class OptimizedStrategyTestCase(unittest.TestCase):
         # All indices should be valid
         self.assertTrue(all(0 <= i < 6 for i in result))
 
+    def test_matches_exhaustive_starter_loop(self):
+        from crib.scoring import count_hand
+        from itertools import combinations
+        for n in range(30):
+            deck = Deck(rng=random.Random(n))
+            deck.shuffle()
+            hand = make_hand([deck.deal_card() for _ in range(6)])
+            starters = Deck().remove_cards(hand.cards).cards
+            best_keep, best_points = None, -1
+            for keep in combinations(range(6), 4):
+                points = sum(count_hand([hand.cards[i] for i in keep], s) for s in starters)
+                if points > best_points:
+                    best_keep, best_points = keep, points
+
+            s = OptimizedStrategy(crib_aware=False)
+            evaluation = s.evaluate_discards(hand, 2)
+            self.assertEqual(len(evaluation.options), 15)
+            self.assertEqual(evaluation.best.keep_indices, best_keep)
+            self.assertEqual(evaluation.best.hand_points, best_points)
+            self.assertAlmostEqual(evaluation.best.hand_ev, best_points / 46)
+            self.assertEqual(s.choose_crib_cards(hand, 2),
+                             [i for i in range(6) if i not in best_keep])
+
+    def test_crib_aware_adjusts_by_crib_ev(self):
+        from crib.crib_ev import crib_ev
+        hand = make_hand([Card('H', 5), Card('S', 5), Card('D', 9), Card('C', 13),
+                          Card('H', 2), Card('S', 12)])
+        s = OptimizedStrategy()
+        for is_my_crib, sign in ((True, 1), (False, -1)):
+            evaluation = s.evaluate_discards(hand, 2, is_my_crib)
+            for option in evaluation.options:
+                i, j = option.discard_indices
+                self.assertAlmostEqual(option.crib_ev,
+                                       sign * crib_ev(hand.cards[i], hand.cards[j], is_my_crib))
+                self.assertAlmostEqual(option.ev, option.hand_ev + option.crib_ev)
+            self.assertEqual(evaluation.best.ev, max(o.ev for o in evaluation.options))
+
+    def test_batch_matches_loop(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest('numpy not installed')
+        for n in range(20):
+            deck = Deck(rng=random.Random(n))
+            deck.shuffle()
+            hand = make_hand([deck.deal_card() for _ in range(6)])
+            for is_my_crib in (True, False):
+                self.assertEqual(
+                    sorted(OptimizedStrategy(batch=True).choose_crib_cards(hand, 2, is_my_crib)),
+                    sorted(OptimizedStrategy().choose_crib_cards(hand, 2, is_my_crib)))
+
     def test_choose_play_card_plays_highest_fitting(self):
         hand = make_hand([Card('H', 2), Card('S', 8)])
         s = OptimizedStrategy()
@@ -90,6 +148,69 @@ class OptimizedStrategyTestCase(unittest.TestCase):
         self.assertIsNone(idx)
 
 
+class StubPlayContext:
+    """Two-player PlayContext stand-in for player 0."""
+
+    def __init__(self, played, opponent_cards, unseen):
+        self.num_players = 2
+        self.player_index = 0
+        self.pegging = PeggingState()
+        for n in played:
+            self.pegging.play(n)
+        self.gos = [False, False]
+        self.who_played_last = 1 if played else None
+        self._opponent_cards = opponent_cards
+        self._unseen = unseen
+
+    def cards_left(self, player_index):
+        return self._opponent_cards
+
+    def unseen_mask(self):
+        return mask_of(self._unseen)
+
+    def unseen_cards(self):
+        return list(self._unseen)
+
+
+class ExpectimaxStrategyTestCase(unittest.TestCase):
+
+    def test_plays_greedy_without_context(self):
+        hand = make_hand([Card('H', 2), Card('S', 8)])
+        self.assertEqual(ExpectimaxStrategy().choose_play_card(hand, 20), 1)
+
+    def test_go(self):
+        hand = make_hand([Card('H', 10)])
+        context = StubPlayContext([10, 10, 2], 0, [])
+        self.assertIsNone(ExpectimaxStrategy().choose_play_card(hand, 22, context))
+
+    def test_takes_fifteen_over_highest_card(self):
+        # opponent is out of cards after an 8: 7 makes fifteen, then K for
+        # the last card (3 points); playing K first only scores last card
+        hand = make_hand([Card('H', 7), Card('S', 13)])
+        context = StubPlayContext([8], 0, [])
+        self.assertEqual(ExpectimaxStrategy().choose_play_card(hand, 8, context), 0)
+
+    def test_avoids_giving_away_pair(self):
+        # count 15 and the opponent holds the other two 5s: leading the 5
+        # lets them pair it, leading the 4 lets us pair theirs
+        hand = make_hand([Card('H', 4), Card('S', 5)])
+        context = StubPlayContext([5, 10], 2, [Card('D', 5), Card('C', 5)])
+        self.assertEqual(ExpectimaxStrategy().choose_play_card(hand, 15, context), 0)
+
+    def test_enumerates_opponent_hands(self):
+        unseen = [Card('H', 5), Card('S', 5), Card('D', 10), Card('C', 1)]
+        context = StubPlayContext([], 2, unseen)
+        hands = dict(ExpectimaxStrategy()._opponent_hands(context, 1))
+        self.assertEqual(hands, {(5, 5): 1, (5, 10): 2, (1, 5): 2, (1, 10): 1})
+
+    def test_samples_large_unseen_set(self):
+        hand = make_hand([Card('H', 5), Card('S', 4), Card('D', 3), Card('C', 2)])
+        unseen = [c for c in Deck(52).cards if c not in hand.cards]
+        context = StubPlayContext([], 4, unseen)
+        idx = ExpectimaxStrategy(samples=4).choose_play_card(hand, 0, context)
+        self.assertIn(idx, range(4))
+
+
 class LLMStrategyTestCase(unittest.TestCase):
 
     def _make_strategy(self):
@@ -227,6 +348,77 @@ class LLMStrategyTestCase(unittest.TestCase):
         self.assertEqual(result, expected)
 
 
+class LLMDeadlineTestCase(unittest.TestCase):
+
+    def slow_strategy(self, delay, reply="0,1"):
+        def create(**request):
+            time.sleep(delay)
+            return MagicMock(content=[MagicMock(text=reply)])
+        client = MagicMock()
+        client.messages.create.side_effect = create
+        return LLMStrategy("test-model", client=client, deadline=0.05, fallback=OptimizedStrategy())
+
+    def test_slow_reply_falls_back(self):
+        s = self.slow_strategy(1.0)
+        hand = make_hand([Card('H', 5), Card('S', 5), Card('D', 10), Card('C', 13), Card('H', 2), Card('S', 9)])
+        result = s.choose_crib_cards(hand, 2, is_my_crib=True)
+        self.assertEqual(result, OptimizedStrategy().choose_crib_cards(hand, 2, is_my_crib=True))
+        stats = s.decision_stats()
+        self.assertEqual((stats['decisions'], stats['timeouts'], stats['fallbacks']), (1, 1, 1))
+        self.assertLess(stats['max'], 0.5)
+
+    def test_reply_within_deadline(self):
+        s = self.slow_strategy(0)
+        hand = make_hand([Card('H', 5), Card('S', 3)])
+        self.assertEqual(s.choose_play_card(hand, 20), 0)
+        self.assertEqual(s.choose_play_card(make_hand([Card('H', 10)]), 25), None)
+        stats = s.decision_stats()
+        self.assertEqual((stats['decisions'], stats['timeouts'], stats['fallback_rate']), (1, 0, 0.0))
+
+
+class LLMCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'llm_cache.db')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_strategy(self, reply, replay=False):
+        s = LLMStrategy("test-model", "Test Model", client=MagicMock())
+        s.client.messages.create.return_value = MagicMock(content=[MagicMock(text=reply)])
+        if replay:
+            DiskCache(self.path).close() # replay needs an existing cache
+        s.cache = DiskCache(self.path, replay=replay)
+        self.addCleanup(s.cache.close)
+        return s
+
+    def test_relabelled_hand_hits(self):
+        s = self.make_strategy("0,1")
+        hand = make_hand([Card('H', 5), Card('S', 5), Card('D', 10), Card('C', 13)])
+        first = s.choose_crib_cards(hand, 2)
+        # the same hand with suits swapped and cards reordered
+        relabelled = make_hand([Card('D', 13), Card('C', 5), Card('S', 10), Card('H', 5)])
+        second = s.choose_crib_cards(relabelled, 2)
+        self.assertEqual(s.client.messages.create.call_count, 1)
+        self.assertEqual(sorted(hand.cards[i].number for i in first),
+                         sorted(relabelled.cards[i].number for i in second))
+        self.assertEqual(s.cache.stats()['hits'], 1)
+
+        # the explain flag is part of the key
+        s.explain = True
+        s.choose_crib_cards(hand, 2)
+        self.assertEqual(s.client.messages.create.call_count, 2)
+
+    def test_replay_miss_falls_back(self):
+        s = self.make_strategy("1", replay=True)
+        hand = make_hand([Card('H', 5), Card('S', 3)])
+        self.assertEqual(s.choose_play_card(hand, 20), BasicStrategy().choose_play_card(hand, 20))
+        s.client.messages.create.assert_not_called()
+        self.assertEqual(s.cache.stats()['misses'], 1)
+
+
 class GetLLMStrategiesTestCase(unittest.TestCase):
 
     def test_no_api_key(self):
@@ -271,5 +463,82 @@ class GetLLMStrategiesTestCase(unittest.TestCase):
                     self.assertIn("Could not initialize Anthropic API", error)
 
 
+
+def mock_anthropic(models):
+    """A stand-in anthropic module whose client lists (id, display name) models."""
+    client = MagicMock()
+    client.models.list.return_value = MagicMock(
+        data=[MagicMock(id=model_id, display_name=name) for model_id, name in models])
+    module = MagicMock()
+    module.Anthropic.return_value = client
+    return module
+
+
+class ModelListTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'models.json')
+        self.now = 10000.0
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def model_list(self):
+        return ModelList(self.path, max_age=100, clock=lambda: self.now)
+
+    def test_fresh_cache_used_without_api(self):
+        with open(self.path, 'w') as f:
+            json.dump({'fetched': self.now - 50, 'models': [['m1', 'Model 1']]}, f)
+        anthropic = mock_anthropic([])
+        with patch.dict('os.environ', {'ANTHROPIC_API_KEY': 'test-key'}), \
+                patch.dict('sys.modules', {'anthropic': anthropic}):
+            models = self.model_list()
+            models.start_refresh()
+            models.wait()
+            strategies = models.strategies()
+        self.assertEqual([(s.model, s.name) for s in strategies], [('m1', 'AI-LLM (Model 1)')])
+        anthropic.Anthropic.assert_not_called()
+
+    def test_refresh_saves_list(self):
+        anthropic = mock_anthropic([('m1', 'Model 1'), ('m2', 'Model 2')])
+        with patch.dict('os.environ', {'ANTHROPIC_API_KEY': 'test-key'}), \
+                patch.dict('sys.modules', {'anthropic': anthropic}):
+            models = self.model_list()
+            self.assertIsNone(models.models)
+            models.start_refresh()
+            models.wait()
+        self.assertEqual(models.models, [('m1', 'Model 1'), ('m2', 'Model 2')])
+        self.assertEqual(self.model_list().models, models.models)
+
+    def test_failed_refresh_keeps_stale_list(self):
+        with open(self.path, 'w') as f:
+            json.dump({'fetched': self.now - 500, 'models': [['m1', 'Model 1']]}, f)
+        anthropic = MagicMock()
+        anthropic.Anthropic.side_effect = Exception("offline")
+        with patch.dict('os.environ', {'ANTHROPIC_API_KEY': 'test-key'}), \
+                patch.dict('sys.modules', {'anthropic': anthropic}):
+            models = self.model_list()
+            models.start_refresh()
+            models.wait()
+        self.assertEqual(models.models, [('m1', 'Model 1')])
+        self.assertIn("offline", models.error)
+
+    def test_no_api_key(self):
+        with patch.dict('os.environ', {}, clear=True):
+            models = self.model_list()
+            models.start_refresh()
+            self.assertEqual(models.strategies(), [])
+        self.assertIn("ANTHROPIC_API_KEY", models.error)
+
+    def test_client_made_on_first_use(self):
+        anthropic = mock_anthropic([])
+        with patch.dict('os.environ', {'ANTHROPIC_API_KEY': 'test-key'}), \
+                patch.dict('sys.modules', {'anthropic': anthropic}):
+            s = LLMStrategy("m1")
+            anthropic.Anthropic.assert_not_called()
+            self.assertIs(s.client, anthropic.Anthropic.return_value)
+
+
 if __name__ == '__main__':
     unittest.main()
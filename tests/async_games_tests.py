@@ -0,0 +1,207 @@
+import unittest
+import os
+import random
+import asyncio
+import sqlite3
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import patch
+from card_deck.card_deck import Hand, Deck
+from crib import crib, simulation, stats, async_games
+from crib.ai_strategy import RandomStrategy, BasicStrategy, OptimizedStrategy, AsyncLLMStrategy
+from interface.interface import NullInterface
+
+
+class FakeStatusError(Exception):
+
+    def __init__(self, status_code, retry_after=None):
+        super().__init__('status %d' % status_code)
+        self.status_code = status_code
+        headers = {} if retry_after is None else {'retry-after': str(retry_after)}
+        self.response = SimpleNamespace(headers=headers)
+
+
+class FakeAsyncClient:
+    """Stands in for anthropic.AsyncAnthropic: replies "0,1" after latency
+    seconds, first raising each error in errors, and tracks how many
+    requests were in flight at once."""
+
+    def __init__(self, latency=0.001, errors=()):
+        self.latency = latency
+        self.errors = list(errors)
+        self.calls = 0
+        self.in_flight = 0
+        self.peak = 0
+        self.messages = self
+
+    async def create(self, **request):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            if self.errors:
+                raise self.errors.pop(0)
+            return SimpleNamespace(content=[SimpleNamespace(text='0,1')],
+                                   usage=SimpleNamespace(input_tokens=120, output_tokens=3))
+        finally:
+            self.in_flight -= 1
+
+
+def make_strategy(client, **kwargs):
+    kwargs.setdefault('base_delay', 0)
+    return AsyncLLMStrategy('fake-model', 'Fake', client=client, **kwargs)
+
+
+def six_card_hand():
+    hand = Hand()
+    for c in Deck(52).cards[:6]:
+        hand.receive_card(c)
+    return hand
+
+
+class PlayGameAsyncTestCase(unittest.TestCase):
+
+    def new_game(self, seed):
+        random.seed(seed)
+        players = [crib.AI_Player(BasicStrategy(), simulate=True), crib.AI_Player(RandomStrategy(), simulate=True)]
+        return crib.Game(2, players, NullInterface(), target_score=61, db_path=None, rng=random.Random(seed))
+
+    def test_same_game_as_play(self):
+        for seed in range(3):
+            game = self.new_game(seed)
+            game.play()
+            async_game = self.new_game(seed)
+            asyncio.run(async_games.play_game_async(async_game))
+            self.assertEqual(async_game.score, game.score)
+
+
+class AsyncLLMStrategyTestCase(unittest.TestCase):
+
+    def test_retries_rate_limits(self):
+        client = FakeAsyncClient(errors=[FakeStatusError(429, 0), FakeStatusError(529)])
+        s = make_strategy(client)
+        hand = six_card_hand()
+        self.assertEqual(asyncio.run(s.choose_crib_cards_async(hand, 2)), [0, 1])
+        self.assertEqual(s.stats, {'requests': 3, 'retries': 2, 'failures': 0})
+
+    def test_gives_up_on_client_errors(self):
+        client = FakeAsyncClient(errors=[FakeStatusError(400)])
+        s = make_strategy(client)
+        hand = six_card_hand()
+        result = asyncio.run(s.choose_crib_cards_async(hand, 2))
+        self.assertEqual(result, BasicStrategy().choose_crib_cards(hand, 2))
+        self.assertEqual(s.stats, {'requests': 1, 'retries': 0, 'failures': 1})
+
+    def test_deadline(self):
+        s = make_strategy(FakeAsyncClient(latency=1.0), deadline=0.02)
+        hand = six_card_hand()
+        result = asyncio.run(s.choose_crib_cards_async(hand, 2))
+        self.assertEqual(result, BasicStrategy().choose_crib_cards(hand, 2))
+        stats = s.decision_stats()
+        self.assertEqual((stats['timeouts'], stats['fallbacks']), (1, 1))
+        self.assertLess(stats['max'], 0.5)
+
+    def test_retry_delay(self):
+        s = make_strategy(FakeAsyncClient(), base_delay=1.0, max_delay=8.0, max_retries=3)
+        for attempt in range(3):
+            delay = s.retry_delay(FakeStatusError(429), attempt)
+            self.assertTrue(2 ** attempt / 2 <= delay <= 2 ** attempt)
+        self.assertIsNone(s.retry_delay(FakeStatusError(429), 3))
+        self.assertIsNone(s.retry_delay(FakeStatusError(404), 0))
+        self.assertIsNone(s.retry_delay(ValueError('bad'), 0))
+        self.assertEqual(s.retry_delay(FakeStatusError(503, retry_after=5), 0), 5.0)
+        self.assertEqual(s.retry_delay(FakeStatusError(429, retry_after=60), 0), 8.0)
+
+
+class RunSimulationAsyncTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_games_in_flight_at_once(self):
+        client = FakeAsyncClient()
+        llm = make_strategy(client, max_concurrency=3)
+        results = {'p1_wins': 0, 'p2_wins': 0}
+        progress = []
+        async_games.run_simulation_concurrent(llm, BasicStrategy(), 6, 31, None, results, 3, concurrency=4,
+                                              progress=lambda i, n, r: progress.append(i), track_latency=True)
+        self.assertEqual(progress, list(range(1, 7)))
+        self.assertEqual(results['p1_wins'] + results['p2_wins'], 6)
+        self.assertTrue(all(hist.count for hist in results['latency']))
+        self.assertEqual(client.peak, 3)
+        self.assertEqual(llm.stats['requests'], client.calls)
+
+        conn = sqlite3.connect('cribbage_log.db')
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM games WHERE completion = 'completed'").fetchone()[0], 6)
+        conn.close()
+
+    def test_llm_calls_logged(self):
+        client = FakeAsyncClient(errors=[FakeStatusError(429, 0)])
+        llm = make_strategy(client)
+        results = {'p1_wins': 0, 'p2_wins': 0}
+        async_games.run_simulation_concurrent(llm, BasicStrategy(), 3, 31, None, results, 3, concurrency=3)
+
+        conn = sqlite3.connect('cribbage_log.db')
+        rows = conn.execute("SELECT c.game_id, r.game_id, c.model, c.decision, c.input_tokens, c.output_tokens, "
+                            "c.retries, c.parsed, c.fallback, c.request_seconds, c.decision_seconds "
+                            "FROM llm_calls c LEFT JOIN rounds r ON r.id = c.round_id").fetchall()
+        conn.close()
+        self.assertEqual(len(rows), client.calls - 1)
+        self.assertEqual({row[0] for row in rows}, {1, 2, 3})
+        self.assertEqual({row[3] for row in rows}, {'crib', 'play'})
+        self.assertEqual(sum(row[6] for row in rows), 1)
+        self.assertTrue(all(row[7] for row in rows if row[3] == 'crib'))
+        for row in rows:
+            self.assertEqual(row[1], row[0])
+            self.assertEqual(row[2], 'fake-model')
+            self.assertEqual(row[4:6], (120, 3))
+            self.assertEqual(row[8], 1 - row[7])
+            self.assertLessEqual(row[9], row[10])
+
+    def test_matches_run_simulation_one_at_a_time(self):
+        serial = {'p1_wins': 0, 'p2_wins': 0}
+        simulation.run_simulation(RandomStrategy(), BasicStrategy(), 8, 61, None, serial, 11,
+                                  db_path=None, duplicate=True)
+        concurrent = {'p1_wins': 0, 'p2_wins': 0}
+        async_games.run_simulation_concurrent(RandomStrategy(), BasicStrategy(), 8, 61, None, concurrent, 11,
+                                              concurrency=1, db_path=None, duplicate=True)
+        self.assertEqual(concurrent, serial)
+
+    def test_stop_cancels_remaining_games(self):
+        results = {'p1_wins': 0, 'p2_wins': 0}
+        async_games.run_simulation_concurrent(OptimizedStrategy(), RandomStrategy(), 200, 61, None, results, 5,
+                                              concurrency=8, db_path=None, stop=stats.SPRTStop(margin=0.2))
+        self.assertEqual(results['decision'], 'p1_better')
+        self.assertLess(results['p1_wins'] + results['p2_wins'], 200)
+
+    def test_stop_logs_only_tallied_games(self):
+        started = []
+        start_game = simulation.start_game
+
+        def counting_start_game(task, setup):
+            started.append(task[0])
+            return start_game(task, setup)
+
+        results = {'p1_wins': 0, 'p2_wins': 0}
+        with patch('crib.simulation.start_game', counting_start_game):
+            async_games.run_simulation_concurrent(OptimizedStrategy(), RandomStrategy(), 200, 61, None, results, 5,
+                                                  concurrency=4, stop=stats.SPRTStop(margin=0.2))
+        played = results['p1_wins'] + results['p2_wins']
+        self.assertLess(played, 200)
+        # games are started as others finish, not all up front
+        self.assertLessEqual(len(started), played + 8)
+
+        conn = sqlite3.connect('cribbage_log.db')
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM games").fetchone()[0], played)
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import random
+from card_deck.card_deck import Card, Deck, Hand, CARDS
+from crib.scoring import count_hand, rank_breakdown_table, rank_key
+
+try:
+    import numpy as np
+    from crib.batch_scoring import count_hands_batch, keep_starter_scores, cards_to_ids
+except ImportError:
+    np = None
+
+
+def make_hand(cards):
+    hand = Hand()
+    for c in cards:
+        hand.receive_card(c)
+    return hand
+
+
+@unittest.skipIf(np is None, 'numpy not installed')
+class CountHandsBatchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.dealt = [rng.sample(range(52), 5) for _ in range(20000)]
+        self.hands = np.array([d[:4] for d in self.dealt])
+        self.starters = np.array([d[4] for d in self.dealt])
+
+    def test_matches_count_hand(self):
+        points = count_hands_batch(self.hands, self.starters)
+        expected = [count_hand([CARDS[i] for i in d[:4]], CARDS[d[4]]) for d in self.dealt]
+        self.assertEqual(points.tolist(), expected)
+
+    def test_breakdown(self):
+        points, parts = count_hands_batch(self.hands, self.starters, breakdown=True)
+        self.assertEqual(sorted(parts), ['fifteens', 'flush', 'nobs', 'pairs', 'runs'])
+        self.assertEqual((sum(parts.values()) == points).all(), True)
+        table = rank_breakdown_table()
+        for n, d in enumerate(self.dealt[:500]):
+            fifteens, pairs, runs = table[rank_key([CARDS[i].number for i in d])]
+            self.assertEqual((parts['fifteens'][n], parts['pairs'][n], parts['runs'][n]),
+                             (fifteens, pairs, runs))
+
+    def test_perfect_hand(self):
+        hand = cards_to_ids([Card('H', 5), Card('S', 5), Card('C', 5), Card('D', 11)])
+        points, parts = count_hands_batch([hand], [Card('D', 5).id], breakdown=True)
+        self.assertEqual(points[0], 29)
+        self.assertEqual(parts['nobs'][0], 1)
+
+    def test_bad_shapes(self):
+        with self.assertRaises(ValueError):
+            count_hands_batch(np.zeros((3, 5), dtype=int), np.zeros(3, dtype=int))
+        with self.assertRaises(ValueError):
+            count_hands_batch(np.zeros((3, 4), dtype=int), np.zeros(2, dtype=int))
+
+
+@unittest.skipIf(np is None, 'numpy not installed')
+class KeepStarterScoresTestCase(unittest.TestCase):
+
+    def test_matches_loop(self):
+        deck = Deck(rng=random.Random(7))
+        deck.shuffle()
+        hand = make_hand([deck.deal_card() for _ in range(6)])
+        keeps, starters, points = keep_starter_scores(hand, 2)
+        self.assertEqual(points.shape, (15, 46))
+        self.assertEqual(len(set(starters.tolist()) & {c.id for c in hand.cards}), 0)
+        for k, keep in enumerate(keeps):
+            kept = [hand.cards[i] for i in keep]
+            for s, starter in enumerate(starters):
+                self.assertEqual(points[k, s], count_hand(kept, CARDS[starter]))
+
+
+if __name__ == '__main__':
+    unittest.main()
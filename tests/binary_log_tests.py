@@ -0,0 +1,118 @@
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+from crib.crib import Game, AI_Player
+from crib.ai_strategy import OptimizedStrategy, RandomStrategy
+from crib.simulation import RecordCollector
+from interface.interface import Interface
+from logger.logger import LogWriter
+from logger import binary_log
+
+
+def play_seeded_game(seed, **kwargs):
+    random.seed(seed)
+    game = Game(2, [AI_Player(OptimizedStrategy(), simulate=True),
+                    AI_Player(RandomStrategy(), simulate=True)],
+                Interface(), target_score=121, **kwargs)
+    game.play()
+
+
+def seeded_record(seed):
+    collector = RecordCollector()
+    play_seeded_game(seed, log_writer=collector)
+    return collector.records[0]
+
+
+class EncodingTests(unittest.TestCase):
+
+    def test_round_trip(self):
+        record = seeded_record(3)
+        decoded = binary_log.decode_game(binary_log.encode_game(record))
+        self.assertEqual(decoded, record)
+
+    def test_round_trip_unfinished_game(self):
+        record = seeded_record(4)
+        record.update(end_time=None, completion='in_progress', simulation_id=None)
+        record['players'][0][4] = None
+        record['rounds'][-1]['crib_score'] = None
+        self.assertEqual(binary_log.decode_game(binary_log.encode_game(record)), record)
+
+    def test_much_smaller_than_json(self):
+        import json
+        record = seeded_record(5)
+        self.assertLess(len(binary_log.encode_game(record)) * 4, len(json.dumps(record)))
+
+
+class FileTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'games.crbl')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_games(self, seeds):
+        writer = binary_log.BinaryLogWriter(self.path)
+        for seed in seeds:
+            play_seeded_game(seed, log_writer=writer)
+        writer.close()
+
+    def test_append_and_stream(self):
+        self.write_games([1, 2])
+        self.write_games([3])
+        games = list(binary_log.read_games(self.path))
+        self.assertEqual(len(games), 3)
+        self.assertEqual(games[2], seeded_record(3) | {'start_time': games[2]['start_time'],
+                                                       'end_time': games[2]['end_time']})
+
+    def test_index_random_access(self):
+        self.write_games([1, 2, 3])
+        games = list(binary_log.read_games(self.path))
+        with binary_log.GameIndex(self.path) as index:
+            self.assertEqual(len(index), 3)
+            self.assertEqual(index[2], games[2])
+            self.assertEqual(index[0], games[0])
+
+    def test_truncated_record_ignored(self):
+        self.write_games([1, 2])
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 10)
+        self.assertEqual(len(list(binary_log.read_games(self.path))), 1)
+        with binary_log.GameIndex(self.path) as index:
+            self.assertEqual(len(index), 1)
+
+    def test_bad_header(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a game log')
+        with self.assertRaises(ValueError):
+            list(binary_log.read_games(self.path))
+        with self.assertRaises(ValueError):
+            binary_log.BinaryLogWriter(self.path)
+
+    def test_import_matches_database_log(self):
+        self.write_games([1, 2])
+        imported = os.path.join(self.tmp.name, 'imported.db')
+        self.assertEqual(binary_log.import_games(self.path, imported), 2)
+
+        direct = os.path.join(self.tmp.name, 'direct.db')
+        writer = LogWriter(direct)
+        for seed in [1, 2]:
+            play_seeded_game(seed, log_writer=writer)
+        writer.close()
+
+        def dump(db_path):
+            conn = sqlite3.connect(db_path)
+            rows = [conn.execute("SELECT * FROM %s ORDER BY id" % table).fetchall()
+                    for table in ['games', 'game_players', 'rounds', 'round_hands', 'plays']]
+            conn.close()
+            rows[0] = [row[3:] for row in rows[0]]  # timestamps differ between runs
+            return rows
+
+        self.assertEqual(dump(imported), dump(direct))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import unittest
+import os
+import random
+import sqlite3
+import tempfile
+from card_deck.card_deck import Card, Hand, CARDS
+from crib import scoring
+from crib.ai_strategy import OptimizedStrategy
+from crib.cache import LRUCache, DiskCache, canonical_suits, hand_score_key
+
+
+def make_hand(cards):
+    hand = Hand()
+    for c in cards:
+        hand.receive_card(c)
+    return hand
+
+
+def relabel(cards, mapping):
+    return [Card(mapping[c.suit], c.number) for c in cards]
+
+
+class LRUCacheTestCase(unittest.TestCase):
+
+    def test_eviction_order_and_counters(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)   # a is now most recent
+        cache.put('c', 3)                     # evicts b
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions'], stats['size']),
+                         (2, 1, 1, 2))
+        self.assertAlmostEqual(cache.hit_rate, 2 / 3)
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError):
+            LRUCache(0)
+
+
+class DiskCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'cache.db')
+        self.now = 1000.0
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def open(self, **kwargs):
+        return DiskCache(self.path, clock=lambda: self.now, **kwargs)
+
+    def test_persists_and_evicts_least_recently_used(self):
+        cache = self.open(maxsize=2)
+        cache.put('a', '1')
+        self.now += 1
+        cache.put('b', '2')
+        self.now += 1
+        self.assertEqual(cache.get('a'), '1')
+        self.now += 1
+        cache.put('c', '3')                   # evicts b
+        cache.close()
+
+        cache = self.open(maxsize=2)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c')), ('1', '3'))
+        self.assertEqual(cache.stats()['hit_rate'], 2 / 3)
+        cache.close()
+
+    def test_ttl(self):
+        cache = self.open(ttl=10)
+        cache.put('a', '1')
+        cache.put('b', '2')
+        self.now += 5
+        self.assertEqual(cache.get('a'), '1')
+        self.now += 6
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.prune(), 1)
+        self.assertEqual((cache.expired, len(cache)), (2, 0))
+        cache.close()
+
+    def test_replay_never_writes(self):
+        cache = self.open()
+        cache.put('a', '1')
+        cache.close()
+        cache = self.open(replay=True)
+        cache.put('b', '2')
+        self.assertEqual((cache.get('a'), cache.get('b')), ('1', None))
+        cache.close()
+
+    def test_replay_is_read_only(self):
+        missing = os.path.join(self.tmp.name, 'missing.db')
+        with self.assertRaises(FileNotFoundError):
+            DiskCache(missing, replay=True)
+        self.assertFalse(os.path.exists(missing))
+
+        cache = self.open()
+        cache.put('a', '1')
+        cache.close()
+        cache = self.open(replay=True)
+        with self.assertRaises(sqlite3.OperationalError):
+            cache._conn.execute("DELETE FROM llm_cache")
+        self.assertEqual(cache.get('a'), '1')
+        cache.close()
+
+
+class CanonicalSuitsTestCase(unittest.TestCase):
+
+    def test_invariant_under_suit_permutation(self):
+        rng = random.Random(5)
+        for _ in range(500):
+            cards = rng.sample(CARDS, 6)
+            suits = ['H', 'S', 'D', 'C']
+            rng.shuffle(suits)
+            mapping = dict(zip(['H', 'S', 'D', 'C'], suits))
+            self.assertEqual(canonical_suits(cards)[0], canonical_suits(relabel(cards, mapping))[0])
+            self.assertEqual(hand_score_key(cards[:4], cards[4]),
+                             hand_score_key(relabel(cards[:4], mapping), Card(mapping[cards[4].suit],
+                                                                              cards[4].number)))
+
+    def test_distinguishes_suit_patterns(self):
+        flush = [Card('H', 2), Card('H', 5), Card('H', 9), Card('H', 12)]
+        mixed = [Card('H', 2), Card('H', 5), Card('H', 9), Card('S', 12)]
+        self.assertNotEqual(canonical_suits(flush)[0], canonical_suits(mixed)[0])
+
+
+class CachedScoringTestCase(unittest.TestCase):
+
+    def tearDown(self):
+        scoring.set_hand_cache(None)
+
+    def test_count_hand_cache_matches(self):
+        rng = random.Random(11)
+        deals = [rng.sample(CARDS, 5) for _ in range(3000)]
+        expected = [scoring.count_hand(d[:4], d[4]) for d in deals]
+        cache = LRUCache(1000)
+        scoring.set_hand_cache(cache)
+        self.assertEqual([scoring.count_hand(d[:4], d[4]) for d in deals], expected)
+        self.assertEqual([scoring.count_hand(d[:4], d[4]) for d in deals[-500:]], expected[-500:])
+        self.assertGreaterEqual(cache.hits, 500)
+        self.assertGreater(cache.evictions, 0)
+
+    def test_discard_cache_hits_on_relabelled_hand(self):
+        s = OptimizedStrategy(cache=LRUCache(100))
+        cards = [Card('H', 5), Card('S', 5), Card('D', 9), Card('C', 13), Card('H', 2), Card('S', 12)]
+        first = s.choose_crib_cards(make_hand(cards), 2, is_my_crib=True)
+        relabelled = make_hand(relabel(cards, {'H': 'C', 'S': 'D', 'D': 'H', 'C': 'S'}))
+        second = s.choose_crib_cards(relabelled, 2, is_my_crib=True)
+        self.assertEqual(sorted(first), sorted(second))
+        self.assertEqual((s.cache.hits, s.cache.misses), (1, 1))
+        # crib ownership is part of the key
+        s.choose_crib_cards(make_hand(cards), 2, is_my_crib=False)
+        self.assertEqual(s.cache.misses, 2)
+
+    def test_cached_choices_have_best_ev(self):
+        rng = random.Random(13)
+        cached = OptimizedStrategy(cache=LRUCache(10000))
+        plain = OptimizedStrategy()
+        for _ in range(200):
+            hand = make_hand(rng.sample(CARDS, 6))
+            is_my_crib = rng.random() < 0.5
+            for _ in range(2):
+                choice = cached.choose_crib_cards(hand, 2, is_my_crib)
+                evaluation = plain.evaluate_discards(hand, 2, is_my_crib)
+                chosen = [o for o in evaluation.options if sorted(o.discard_indices) == sorted(choice)]
+                self.assertAlmostEqual(chosen[0].ev, evaluation.best.ev)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,6 @@
 import unittest
+import copy
+import pickle
 from card_deck import card_deck
 
 class DeckTestCase(unittest.TestCase):
@@ -46,5 +48,78 @@ class DeckTestCase(unittest.TestCase):
         self.assertEqual(len(cards_removed), 50)
 
 
+    def test_deal_card_from_top(self):
+        deck = card_deck.Deck()
+        self.assertIs(deck.deal_card(), card_deck.Card('H',1))
+        self.assertIs(deck.deal_card(), card_deck.Card('H',2))
+        self.assertEqual(deck.num_cards, 50)
+        self.assertNotIn(card_deck.Card('H',1), deck)
+        self.assertIn(card_deck.Card('H',3), deck)
+
+
+    def test_cards_are_interned(self):
+        c = card_deck.Card('S',12)
+        self.assertIs(c, card_deck.Card('S',12))
+        self.assertIs(c, card_deck.Card.from_id(c.id))
+        self.assertEqual([x.id for x in card_deck.Deck().cards], list(range(52)))
+        self.assertIs(copy.deepcopy(c), c)
+        self.assertIs(pickle.loads(pickle.dumps(c)), c)
+
+
+    def test_cards_are_immutable(self):
+        c = card_deck.Card('D',5)
+        with self.assertRaises(AttributeError):
+            c.number = 6
+        with self.assertRaises(ValueError):
+            card_deck.Card('X',5)
+
+
+    def test_hand_mask(self):
+        hand = card_deck.Hand()
+        hand.receive_card(card_deck.Card('H',1))
+        hand.receive_card(card_deck.Card('C',13))
+        self.assertEqual(hand.mask, 1 | 1 << 51)
+        deck = card_deck.Deck().remove_cards(hand.cards)
+        self.assertEqual(deck.mask & hand.mask, 0)
+        self.assertEqual(deck.num_cards, 50)
+
+
+class CardMaskTestCase(unittest.TestCase):
+
+    def test_round_trip(self):
+        cards = [card_deck.Card('C',13), card_deck.Card('H',1), card_deck.Card('D',7)]
+        mask = card_deck.mask_of(cards)
+        self.assertEqual(list(card_deck.iter_ids(mask)), sorted(c.id for c in cards))
+        self.assertEqual(card_deck.cards_of(mask), sorted(cards, key=lambda c: c.id))
+        self.assertEqual(card_deck.popcount(mask), 3)
+        self.assertEqual(card_deck.cards_of(0), [])
+
+    def test_rank_and_suit_masks(self):
+        self.assertEqual(card_deck.popcount(card_deck.FULL_MASK), 52)
+        fives = card_deck.cards_of(card_deck.RANK_MASKS[5])
+        self.assertEqual([c.number for c in fives], [5, 5, 5, 5])
+        self.assertEqual(card_deck.suit_counts(card_deck.RANK_MASKS[5]), {'H': 1, 'S': 1, 'D': 1, 'C': 1})
+
+        unseen = card_deck.FULL_MASK & ~card_deck.mask_of([card_deck.Card('H',5), card_deck.Card('S',5)])
+        counts = card_deck.rank_counts(unseen)
+        self.assertEqual(counts[5], 2)
+        self.assertEqual(sum(counts), 50)
+        self.assertEqual(card_deck.suit_counts(unseen)['H'], 12)
+
+    def test_value_masks(self):
+        # cards that fit when the count is 25: ace to six
+        fits = card_deck.cards_of(card_deck.VALUE_MASKS[31 - 25])
+        self.assertEqual({c.number for c in fits}, set(range(1, 7)))
+        self.assertEqual(card_deck.popcount(card_deck.VALUE_MASKS[10]), 52)
+        self.assertEqual(card_deck.VALUE_MASKS[0], 0)
+
+    def test_combination_masks(self):
+        mask = card_deck.mask_of(card_deck.Deck(6).cards)
+        subsets = list(card_deck.combination_masks(mask, 4))
+        self.assertEqual(len(subsets), 15)
+        self.assertEqual(len(set(subsets)), 15)
+        self.assertTrue(all(card_deck.popcount(m) == 4 and m & ~mask == 0 for m in subsets))
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
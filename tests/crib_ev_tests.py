@@ -0,0 +1,43 @@
+import unittest
+from card_deck.card_deck import Card
+from crib import crib_ev
+
+
+class PairIndexTestCase(unittest.TestCase):
+
+    def test_layout(self):
+        # pairs on the diagonal, suited above, offsuit below
+        self.assertEqual(crib_ev.pair_index(Card('H', 5), Card('S', 5)), 4 * 13 + 4)
+        self.assertEqual(crib_ev.pair_index(Card('H', 5), Card('H', 6)), 4 * 13 + 5)
+        self.assertEqual(crib_ev.pair_index(Card('H', 6), Card('H', 5)), 4 * 13 + 5)
+        self.assertEqual(crib_ev.pair_index(Card('H', 5), Card('C', 6)), 5 * 13 + 4)
+
+    def test_representatives_round_trip(self):
+        for index in range(crib_ev.NUM_ENTRIES):
+            c1, c2 = crib_ev.representative_pair(index)
+            self.assertIsNot(c1, c2)
+            self.assertEqual(crib_ev.pair_index(c1, c2), index)
+
+
+class TableTestCase(unittest.TestCase):
+
+    def test_table_loaded(self):
+        self.assertIsNotNone(crib_ev.TABLE)
+        self.assertEqual(len(crib_ev.TABLE), 2 * crib_ev.NUM_ENTRIES)
+
+    def test_values_are_plausible(self):
+        for is_my_crib in (True, False):
+            five_five = crib_ev.crib_ev(Card('H', 5), Card('S', 5), is_my_crib)
+            ace_king = crib_ev.crib_ev(Card('H', 1), Card('S', 13), is_my_crib)
+            self.assertGreater(five_five, ace_king)
+            for c1, c2 in ((Card('H', 1), Card('S', 13)), (Card('D', 5), Card('C', 10))):
+                self.assertTrue(0 < crib_ev.crib_ev(c1, c2, is_my_crib) < 29)
+
+    def test_uniform_entry_is_exact_mean(self):
+        # 5-5 is one of the most valuable discards under uniform opponents
+        index = crib_ev.pair_index(Card('H', 5), Card('S', 5))
+        self.assertGreater(crib_ev.uniform_entry(index), 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,7 +4,8 @@ import json
 from card_deck.card_deck import Card, Hand
 from crib.crib import Test_Player, Game, Round
 from interface.interface import Interface
-from logger.logger import Logger, card_to_str, cards_to_json, create_simulation, complete_simulation
+from logger.logger import (Logger, NullLogger, LogWriter, card_to_str, cards_to_json, create_simulation,
+                           complete_simulation, record_llm_call, LOG_SUMMARY, LOG_ROUNDS)
 
 
 class CardEncodingTests(unittest.TestCase):
@@ -175,6 +176,24 @@ class LoggerTests(unittest.TestCase):
 
         lg.close()
 
+    def test_quit_during_crib(self):
+        """A quit at the discard prompt keeps the round and the dealt hands."""
+        game, lg, conn, p1, p2 = _setup_round_with_known_hands()
+        game.crib_player = 0
+        lg.new_round(1, None)
+        lg.record_quit()
+
+        # the rows the logger wrote at the deal before rounds were batched
+        self.assertEqual(conn.execute(
+            "SELECT game_id, round_number, dealer_index, turn_up_card, jack_bonus_points, crib_score FROM rounds"
+        ).fetchall(), [(1, 1, 0, None, 0, None)])
+        self.assertEqual(conn.execute(
+            "SELECT round_id, player_index, dealt_cards, kept_cards, crib_cards, hand_score, play_score, "
+            "cumulative_score FROM round_hands ORDER BY player_index"
+        ).fetchall(), [(1, 0, cards_to_json(p1.hand.cards), None, None, None, None, None),
+                       (1, 1, cards_to_json(p2.hand.cards), None, None, None, None, None)])
+        lg.close()
+
     def test_schema_indexes(self):
         """Verify all expected indexes exist."""
         p1 = Test_Player([])
@@ -197,6 +216,9 @@ class LoggerTests(unittest.TestCase):
             'idx_round_hands_round',
             'idx_plays_round',
             'idx_games_simulation',
+            'idx_timings_simulation',
+            'idx_llm_calls_simulation',
+            'idx_llm_calls_game',
         }
         self.assertEqual(expected, index_names)
         game.logger.close()
@@ -242,6 +264,34 @@ class LoggerTests(unittest.TestCase):
 
         game.logger.close()
 
+    def test_round_committed_when_scored(self):
+        """Round rows become visible to other connections once scored."""
+        import tempfile, os
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'log.db')
+            game, lg, conn, p1, p2 = _setup_round_with_known_hands(db_path)
+            other = sqlite3.connect(db_path)
+
+            lg.new_round(1, 'ok')
+            lg.crib(game.game_round.establish_crib())
+            lg.turn_up(game.game_round.establish_turn_up())
+            lg.the_play(game.game_round.play())
+            self.assertEqual(other.execute("SELECT COUNT(*) FROM plays").fetchone()[0], 0)
+
+            lg.score_hands(game.game_round.score_hands())
+            self.assertEqual(other.execute("SELECT COUNT(*) FROM rounds").fetchone()[0], 1)
+            self.assertEqual(other.execute("SELECT COUNT(*) FROM round_hands").fetchone()[0], 2)
+            self.assertEqual(other.execute("SELECT COUNT(*) FROM plays").fetchone()[0], 9)  # 8 cards and the last card point
+
+            other.close()
+            lg.close()
+
+    def test_unlogged_game(self):
+        """Games created with db_path=None use a NullLogger."""
+        game = Game(2, [Test_Player([]), Test_Player([])], Interface(), crib_player=0, db_path=None)
+        self.assertIsInstance(game.logger, NullLogger)
+        self.assertIsNone(game.logger.game_id)
+
 
 class SimulationTests(unittest.TestCase):
 
@@ -319,6 +369,255 @@ class SimulationTests(unittest.TestCase):
         conn3.close()
         os.unlink(db_path)
 
+    def test_complete_simulation_records_outcome(self):
+        """Verify the stopping decision and interval are stored."""
+        import tempfile, os
+        with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as f:
+            db_path = f.name
+
+        conn, sim_id = create_simulation(db_path, 'Stop Test', None, 1000, 'Opt', 'Basic', 121)
+        complete_simulation(conn, sim_id, games_played=240, stop_rule='sprt margin=0.05',
+                            decision='p1_better', p1_win_rate=0.6, ci_half_width=0.06)
+
+        conn = sqlite3.connect(db_path)
+        row = conn.execute(
+            "SELECT games_played, stop_rule, decision, p1_win_rate, ci_low, ci_high "
+            "FROM simulations WHERE id = ?", (sim_id,)
+        ).fetchone()
+        self.assertEqual(row[:4], (240, 'sprt margin=0.05', 'p1_better', 0.6))
+        self.assertAlmostEqual(row[4], 0.54)
+        self.assertAlmostEqual(row[5], 0.66)
+        conn.close()
+        os.unlink(db_path)
+
+    def test_migration_adds_simulation_columns(self):
+        """Older databases get the new simulations columns."""
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE TABLE simulations (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, "
+                     "description TEXT, num_games INTEGER NOT NULL, player1_strategy TEXT NOT NULL, "
+                     "player2_strategy TEXT NOT NULL, target_score INTEGER NOT NULL, "
+                     "start_time TEXT NOT NULL, end_time TEXT)")
+        from logger.logger import _init_db
+        _init_db(conn)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(simulations)")}
+        self.assertTrue({'master_seed', 'games_played', 'decision', 'ci_low', 'ci_high'} <= columns)
+        conn.close()
+
+
+
+class LogWriterTests(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _play_seeded_game(self, **kwargs):
+        import random
+        from crib.crib import AI_Player
+        from crib.ai_strategy import OptimizedStrategy, RandomStrategy
+        random.seed(7)
+        game = Game(2, [AI_Player(OptimizedStrategy(), simulate=True),
+                        AI_Player(RandomStrategy(), simulate=True)],
+                    Interface(), target_score=121, **kwargs)
+        game.play()
+
+    def _dump(self, db_path):
+        conn = sqlite3.connect(db_path)
+        rows = {}
+        for table in ['games', 'game_players', 'rounds', 'round_hands', 'plays']:
+            rows[table] = conn.execute("SELECT * FROM %s ORDER BY id" % table).fetchall()
+        conn.close()
+        # timestamps differ between runs
+        rows['games'] = [row[3:] for row in rows['games']]
+        return rows
+
+    def test_same_rows_as_logger(self):
+        import os
+        direct = os.path.join(self.tmp.name, 'direct.db')
+        queued = os.path.join(self.tmp.name, 'queued.db')
+        self._play_seeded_game(db_path=direct)
+        writer = LogWriter(queued)
+        self._play_seeded_game(log_writer=writer)
+        writer.close()
+        self.assertEqual(writer.games_written, 1)
+        self.assertEqual(self._dump(queued), self._dump(direct))
+
+    def _row_counts(self, db_path):
+        conn = sqlite3.connect(db_path)
+        counts = [conn.execute("SELECT COUNT(*) FROM %s" % table).fetchone()[0]
+                  for table in ['games', 'game_players', 'rounds', 'round_hands', 'plays']]
+        conn.close()
+        return counts
+
+    def test_log_levels(self):
+        import os
+        full = os.path.join(self.tmp.name, 'full.db')
+        self._play_seeded_game(db_path=full)
+        full_counts = self._row_counts(full)
+        self.assertGreater(full_counts[4], 0)
+
+        for level, expected in [(LOG_SUMMARY, full_counts[:2] + [0, 0, 0]),
+                                (LOG_ROUNDS, full_counts[:4] + [0])]:
+            direct = os.path.join(self.tmp.name, 'direct-%s.db' % level)
+            self._play_seeded_game(db_path=direct, log_level=level)
+            self.assertEqual(self._row_counts(direct), expected)
+
+            queued = os.path.join(self.tmp.name, 'queued-%s.db' % level)
+            writer = LogWriter(queued)
+            self._play_seeded_game(log_writer=writer, log_level=level)
+            writer.close()
+            self.assertEqual(self._dump(queued), self._dump(direct))
+
+    def test_bad_log_level_raises(self):
+        with self.assertRaises(ValueError):
+            Game(2, [Test_Player([]), Test_Player([])], Interface(), log_level='verbose')
+
+    def test_quit_during_crib_same_rows(self):
+        import os
+        from logger.logger import RecordLogger
+        dumps = []
+        for name in ('direct.db', 'queued.db'):
+            db_path = os.path.join(self.tmp.name, name)
+            game, lg, conn, p1, p2 = _setup_round_with_known_hands(db_path)
+            writer = None
+            if name == 'queued.db':
+                lg.close()
+                os.remove(db_path)
+                writer = LogWriter(db_path)
+                lg = RecordLogger(game, writer)
+            game.crib_player = 0
+            lg.new_round(1, None)
+            lg.record_quit()
+            lg.close()
+            if writer:
+                writer.close()
+            dumps.append(self._dump(db_path))
+        self.assertEqual(len(dumps[0]['round_hands']), 2)
+        self.assertEqual(dumps[1], dumps[0])
+
+    def test_close_after_failed_write(self):
+        import os
+        import time
+        import threading
+        from unittest.mock import patch
+
+        def write_game(conn, record):
+            if record == 'slow':
+                time.sleep(0.2)
+            else:
+                raise sqlite3.OperationalError('database is locked')
+
+        with patch('logger.logger.write_game', write_game):
+            writer = LogWriter(os.path.join(self.tmp.name, 'log.db'))
+            writer.submit('slow')
+            # the failing record and close()'s sentinel queue up behind the slow one
+            writer.submit('bad')
+            errors = []
+
+            def close():
+                try:
+                    writer.close()
+                except sqlite3.OperationalError as e:
+                    errors.append(e)
+            closer = threading.Thread(target=close, daemon=True)
+            closer.start()
+            closer.join(5)
+        self.assertFalse(closer.is_alive())
+        self.assertEqual(len(errors), 1)
+
+    def test_bad_path_raises(self):
+        import os
+        with self.assertRaises(sqlite3.OperationalError):
+            LogWriter(os.path.join(self.tmp.name, 'missing', 'log.db'))
+
+
+class LLMCallTests(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _play_seeded_game(self, **kwargs):
+        import random
+        from crib.crib import AI_Player
+        from crib.ai_strategy import OptimizedStrategy, RandomStrategy
+
+        class ReportingStrategy(OptimizedStrategy):
+            def choose_crib_cards(self, hand, num_crib_cards, is_my_crib=False):
+                record_llm_call(model='fake', decision='crib', started_at=1.0, decision_seconds=0.5,
+                                input_tokens=100, output_tokens=3, parsed=1, fallback=0)
+                return super().choose_crib_cards(hand, num_crib_cards, is_my_crib)
+
+        random.seed(7)
+        game = Game(2, [AI_Player(ReportingStrategy(), simulate=True),
+                        AI_Player(RandomStrategy(), simulate=True)],
+                    Interface(), target_score=121, **kwargs)
+        game.play()
+
+    def _calls(self, db_path):
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT c.game_id, c.round_number, r.round_number, c.model, c.decision, "
+                            "c.input_tokens, c.parsed, c.fallback FROM llm_calls c "
+                            "LEFT JOIN rounds r ON r.id = c.round_id ORDER BY c.id").fetchall()
+        conn.close()
+        return rows
+
+    def test_calls_logged_with_round(self):
+        import os
+        direct = os.path.join(self.tmp.name, 'direct.db')
+        queued = os.path.join(self.tmp.name, 'queued.db')
+        self._play_seeded_game(db_path=direct)
+        writer = LogWriter(queued)
+        self._play_seeded_game(log_writer=writer)
+        writer.close()
+
+        calls = self._calls(direct)
+        self.assertGreater(len(calls), 1)
+        self.assertEqual(self._calls(queued), calls)
+        # one crib decision per round, linked to that round
+        self.assertEqual([c[1] for c in calls], list(range(1, len(calls) + 1)))
+        for call in calls:
+            self.assertEqual(call[0], 1)
+            self.assertEqual(call[2], call[1])
+            self.assertEqual(call[3:], ('fake', 'crib', 100, 1, 0))
+
+    def test_summary_level_keeps_calls(self):
+        import os
+        direct = os.path.join(self.tmp.name, 'direct.db')
+        self._play_seeded_game(db_path=direct, log_level=LOG_SUMMARY)
+        calls = self._calls(direct)
+        self.assertGreater(len(calls), 1)
+        self.assertTrue(all(c[2] is None for c in calls))
+
+    def test_no_game_no_log(self):
+        record_llm_call(model='fake', decision='play', started_at=1.0, decision_seconds=0.1, parsed=1, fallback=0)
+
+    def test_report(self):
+        from logger.llm_report import summarize, format_report
+        import os
+        direct = os.path.join(self.tmp.name, 'direct.db')
+        self._play_seeded_game(db_path=direct)
+        conn = sqlite3.connect(direct)
+        n = conn.execute("SELECT COUNT(*) FROM llm_calls").fetchone()[0]
+        conn.execute("UPDATE llm_calls SET parsed = 0, fallback = 1 WHERE id = 1")
+        report = summarize(conn, prices={'fake': (3.0, 15.0)})
+        conn.close()
+        self.assertEqual(len(report), 1)
+        row = report[0]
+        self.assertEqual((row['model'], row['decision'], row['calls']), ('fake', 'crib', n))
+        self.assertEqual((row['mean_s'], row['p95_s'], row['tokens_in']), (0.5, 0.5, 100))
+        self.assertAlmostEqual(row['fallback'], 1 / n)
+        self.assertAlmostEqual(row['parse_fail'], 1 / n)
+        self.assertEqual(row['timeout'], 0)
+        self.assertAlmostEqual(row['cost'], (100 * 3.0 + 3 * 15.0) / 1e6)
+        self.assertIn('fake', format_report(report))
+
 
 if __name__ == '__main__':
     unittest.main()
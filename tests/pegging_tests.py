@@ -0,0 +1,96 @@
+import unittest
+import random
+from card_deck.card_deck import Hand, CARDS
+from crib import crib
+from crib.pegging import PeggingState
+
+
+def random_sequences(rng, num_sequences):
+    """Yield lists of cards forming legal counts (never over 31)."""
+    for _ in range(num_sequences):
+        cards = list(CARDS)
+        rng.shuffle(cards)
+        sequence = []
+        count = 0
+        for c in cards:
+            if count + c.value > 31:
+                break
+            sequence.append(c)
+            count += c.value
+        yield sequence
+
+
+def low_card_sequences(rng, num_sequences):
+    """Sequences drawn from low ranks only, which makes long runs and pairs common."""
+    low = [c for c in CARDS if c.number <= 6]
+    for _ in range(num_sequences):
+        rng.shuffle(low)
+        sequence = []
+        count = 0
+        for c in low:
+            if count + c.value > 31:
+                break
+            sequence.append(c)
+            count += c.value
+        yield sequence
+
+
+class PeggingStateTestCase(unittest.TestCase):
+
+    def assert_matches_reference(self, sequences):
+        r = crib.Round(2, [crib.Test_Player([]), crib.Test_Player([])], 0)
+        for sequence in sequences:
+            state = PeggingState()
+            played_cards = Hand()
+            r.count = 0
+            for c in sequence:
+                points = state.play(c.number)
+                played_cards.receive_card(c)
+                r.count += c.value
+                self.assertEqual(points, r.score_played(c, played_cards),
+                                 [str(x) for x in played_cards.cards])
+                self.assertEqual(state.count, r.count)
+
+    def test_matches_reference_on_random_sequences(self):
+        self.assert_matches_reference(random_sequences(random.Random(1), 3000))
+
+    def test_matches_reference_on_low_card_sequences(self):
+        self.assert_matches_reference(low_card_sequences(random.Random(2), 3000))
+
+    def test_known_sequence(self):
+        # 2, 5, 3, 6, 4 -> run of five on the last card; J, A -> 31 but no run
+        state = PeggingState()
+        self.assertEqual([state.play(n) for n in (2, 5, 3, 6, 4)], [0, 0, 0, 0, 5])
+        self.assertEqual([state.play(n) for n in (11, 1)], [0, 2])
+        state.reset()
+        self.assertEqual([state.play(n) for n in (7, 7, 7, 7)], [0, 2, 6, 12])
+
+    def test_undo_restores_state(self):
+        rng = random.Random(3)
+        for sequence in low_card_sequences(rng, 300):
+            state = PeggingState()
+            snapshots = []
+            for c in sequence:
+                snapshots.append((state.count, list(state.numbers), state.pair_streak,
+                                  state.distinct_start))
+                state.play(c.number)
+            for c in reversed(sequence):
+                state.undo()
+                self.assertEqual((state.count, list(state.numbers), state.pair_streak,
+                                  state.distinct_start), snapshots.pop())
+            # replaying after undo scores the same as a fresh state
+            fresh = PeggingState()
+            self.assertEqual([state.play(c.number) for c in sequence],
+                             [fresh.play(c.number) for c in sequence])
+
+    def test_copy_is_independent(self):
+        state = PeggingState()
+        state.play(5)
+        other = state.copy()
+        other.play(10)
+        self.assertEqual(state.count, 5)
+        self.assertEqual(other.count, 15)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import io
+import unittest
+from crib.progress import LatencyHistogram, ProgressReporter, format_duration
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class LatencyHistogramTestCase(unittest.TestCase):
+
+    def test_mean_and_percentiles(self):
+        hist = LatencyHistogram()
+        for i in range(1, 101):
+            hist.add(i / 1000.0)
+        self.assertEqual(hist.count, 100)
+        self.assertAlmostEqual(hist.mean, 0.0505)
+        self.assertEqual(hist.max, 0.1)
+        # bucket edges are within 9% of the true value
+        self.assertAlmostEqual(hist.percentile(50), 0.05, delta=0.05 * 0.09)
+        self.assertAlmostEqual(hist.percentile(99), 0.099, delta=0.099 * 0.09)
+        self.assertEqual(hist.percentile(100), 0.1)
+
+    def test_merge_matches_single_histogram(self):
+        whole, a, b = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        for i in range(200):
+            t = (i % 37 + 1) * 1e-4
+            whole.add(t)
+            (a if i % 3 else b).add(t)
+        a.merge(b)
+        self.assertEqual(a.buckets, whole.buckets)
+        self.assertEqual(a.count, whole.count)
+        self.assertAlmostEqual(a.total, whole.total)
+        self.assertEqual(a.percentile(99), whole.percentile(99))
+
+    def test_empty(self):
+        hist = LatencyHistogram()
+        self.assertEqual(hist.mean, 0.0)
+        self.assertEqual(hist.percentile(99), 0.0)
+
+
+class ProgressReporterTestCase(unittest.TestCase):
+
+    def test_throttled(self):
+        out, clock = io.StringIO(), FakeClock()
+        reporter = ProgressReporter(interval=1.0, out=out, clock=clock)
+        results = {'p1_name': 'A', 'p2_name': 'B', 'p1_wins': 0, 'p2_wins': 0}
+        for game_num in range(1, 101):
+            results['p1_wins'] += 1
+            clock.now += 0.05
+            reporter(game_num, 100, results)
+        # 5 seconds of games after the first: a redraw each second, the
+        # last one for the final game
+        self.assertEqual(reporter.draws, 5)
+        self.assertTrue(out.getvalue().endswith('\n'))
+        last = out.getvalue().rstrip('\n').split('\r')[-1]
+        self.assertIn('Game 100/100', last)
+        self.assertIn('20.0 games/s', last)
+        self.assertIn('A 100.0%', last)
+
+    def test_shows_latency(self):
+        out = io.StringIO()
+        hist = LatencyHistogram()
+        hist.add(0.002)
+        results = {'p1_name': 'A', 'p2_name': 'B', 'p1_wins': 1, 'p2_wins': 0,
+                   'latency': [hist, LatencyHistogram()]}
+        ProgressReporter(out=out)(1, 1, results)
+        self.assertIn('A 2.0ms mean / 2.0ms p99', out.getvalue())
+        self.assertNotIn('B ', out.getvalue())
+
+    def test_format_duration(self):
+        self.assertEqual(format_duration(65), '1:05')
+        self.assertEqual(format_duration(3725), '1:02:05')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,8 @@
 import unittest
+from unittest.mock import patch
 from card_deck.card_deck import Hand, Card
 from crib import crib
+from interface import interface
 
 class RoundTestCase(unittest.TestCase):
     
@@ -78,7 +80,61 @@ class RoundTestCase(unittest.TestCase):
 
         self.assertEqual(r.score[0], 7)
         self.assertEqual(r.score[1], 1)
-        
+
+
+    def test_play_context_unseen_cards(self):
+        """ unseen cards exclude the player's hand and discards, the turn up
+        and every card played so far """
+        p1 = crib.Test_Player([0])
+        p1.hand = Hand()
+        for c in [Card('H',2), Card('S',3), Card('C',6)]:
+            p1.hand.receive_card(c)
+        p1.discards = [Card('D',9), Card('D',10)]
+        p1.played_cards.receive_card(Card('D',1))
+
+        p2 = crib.Test_Player([0])
+        p2.hand = Hand()
+        p2.played_cards.receive_card(Card('H',5))
+
+        r = crib.Round(2, [p1, p2], 1)
+        r.turn_up = Card('S',13)
+        r.pegging.play(5)
+        r.pegging.play(1)
+        r.gos = [False, True]
+        r.who_played_last = 0
+
+        context = crib.PlayContext(r, 0)
+        unseen = context.unseen_cards()
+        self.assertEqual(len(unseen), 52 - 8)
+        for c in [Card('H',2), Card('D',9), Card('S',13), Card('D',1), Card('H',5)]:
+            self.assertNotIn(c, unseen)
+        self.assertEqual(context.pegging.count, 6)
+        self.assertEqual(context.gos, [False, True])
+        self.assertEqual(context.who_played_last, 0)
+        self.assertEqual(context.cards_left(1), 0)
+
+
+    def test_headless_round_builds_no_terminal(self):
+        """ a Round without an interface is headless and never builds a Terminal """
+        p1 = crib.Test_Player([0,0,0,0])
+        p1.hand = Hand()
+        for c in [Card('H',2), Card('S',3), Card('C',6), Card('D',1)]:
+            p1.hand.receive_card(c)
+
+        p2 = crib.Test_Player([0,0,0,0])
+        p2.hand = Hand()
+        for c in [Card('H',5), Card('S',7), Card('C',1), Card('H',1)]:
+            p2.hand.receive_card(c)
+
+        with patch.object(interface, 'Terminal', side_effect=AssertionError('Terminal built')):
+            r = crib.Round(2, [p1, p2], 1)
+            r.play()
+
+        self.assertIsInstance(r.interf, interface.NullInterface)
+        self.assertEqual(r.score, [2, 7])
+        with self.assertRaises(RuntimeError):
+            r.interf.get_input('Choose a card: ')
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
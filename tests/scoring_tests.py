@@ -0,0 +1,66 @@
+import unittest
+import random
+from card_deck.card_deck import Card, Deck, Hand
+from crib.scoring import (
+    count_hand, count_hand_reference, rank_table, rank_breakdown_table, rank_key,
+)
+
+
+def make_hand(cards):
+    hand = Hand()
+    for c in cards:
+        hand.receive_card(c)
+    return hand
+
+
+class RankTableTestCase(unittest.TestCase):
+
+    def test_table_covers_all_rank_multisets(self):
+        self.assertEqual(len(rank_table()), 6175)
+        self.assertEqual(len(rank_breakdown_table()), 6175)
+
+    def test_breakdown_sums_to_total(self):
+        table = rank_table()
+        for key, parts in rank_breakdown_table().items():
+            self.assertEqual(sum(parts), table[key])
+
+    def test_rank_key_ignores_order(self):
+        self.assertEqual(rank_key([5, 5, 11, 5, 5]), rank_key([5, 5, 5, 5, 11]))
+        self.assertNotEqual(rank_key([1, 2, 3, 4, 5]), rank_key([1, 2, 3, 4, 6]))
+
+
+class CountHandTestCase(unittest.TestCase):
+
+    def test_perfect_hand(self):
+        hand = make_hand([Card('H', 5), Card('S', 5), Card('C', 5), Card('D', 11)])
+        self.assertEqual(count_hand(hand, Card('D', 5)), 29)
+
+    def test_flush_and_nobs(self):
+        hand = make_hand([Card('H', 2), Card('H', 4), Card('H', 8), Card('H', 11)])
+        self.assertEqual(count_hand(hand, Card('S', 13)), 4)
+        self.assertEqual(count_hand(hand, Card('H', 13)), 5 + 1)
+
+    def test_accepts_card_lists(self):
+        cards = [Card('H', 1), Card('S', 2), Card('C', 3), Card('D', 9)]
+        self.assertEqual(count_hand(cards, Card('D', 13)), count_hand(make_hand(cards), Card('D', 13)))
+
+    def test_matches_reference_on_random_hands(self):
+        rng = random.Random(1234)
+        for _ in range(5000):
+            deck = Deck()
+            cards = rng.sample(deck.cards, 5)
+            hand = make_hand(cards[:4])
+            self.assertEqual(count_hand(hand, cards[4]), count_hand_reference(hand, cards[4]),
+                             [str(c) for c in cards])
+
+    def test_matches_reference_for_other_hand_sizes(self):
+        rng = random.Random(99)
+        for size in (0, 1, 2, 3, 5):
+            for _ in range(200):
+                cards = rng.sample(Deck().cards, size + 1)
+                self.assertEqual(count_hand(cards[:-1], cards[-1]),
+                                 count_hand_reference(cards[:-1], cards[-1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+import os
+import sqlite3
+import tempfile
+from crib import simulation, stats, scoring
+from crib.cache import LRUCache
+from crib.ai_strategy import RandomStrategy, BasicStrategy, OptimizedStrategy
+
+
+class GameSeedTestCase(unittest.TestCase):
+
+    def test_deterministic_and_distinct(self):
+        self.assertEqual(simulation.game_seed(42, 7), simulation.game_seed(42, 7))
+        seeds = {simulation.game_seed(42, i) for i in range(1, 1001)}
+        self.assertEqual(len(seeds), 1000)
+        self.assertNotEqual(simulation.game_seed(42, 1), simulation.game_seed(43, 1))
+
+
+class RunSimulationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # games log to cribbage_log.db in the working directory
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def run_games(self, workers, master_seed=1234, num_games=12):
+        results = {'p1_wins': 0, 'p2_wins': 0}
+        progress = []
+        simulation.run_simulation(RandomStrategy(), BasicStrategy(), num_games, 61, None, results,
+                                  master_seed, workers=workers,
+                                  progress=lambda i, n, r: progress.append((i, n)))
+        self.assertEqual(progress, [(i, num_games) for i in range(1, num_games + 1)])
+        self.assertEqual(results['p1_wins'] + results['p2_wins'], num_games)
+        return results
+
+    def test_cache_stats_from_every_worker(self):
+        lookups = []
+        for workers in (1, 2):
+            results = {'p1_wins': 0, 'p2_wins': 0}
+            strategy = OptimizedStrategy(cache=LRUCache(1000))
+            simulation.run_simulation(strategy, BasicStrategy(), 6, 61, None, results, 9, workers=workers,
+                                      db_path=None, hand_cache_size=1000)
+            caches = results['cache_stats']
+            self.assertEqual(sorted(caches), ['AI-Opt', simulation.HAND_CACHE])
+            lookups.append({name: st['hits'] + st['misses'] for name, st in caches.items()})
+            self.assertGreater(lookups[-1][simulation.HAND_CACHE], 0)
+        self.assertEqual(lookups[1], lookups[0])
+        # the serial run puts count_hand back as it was
+        self.assertIsNone(scoring.set_hand_cache(None))
+
+    def test_reproducible_across_worker_counts(self):
+        serial = self.run_games(1)
+        self.assertEqual(self.run_games(1), serial)
+        self.assertEqual(self.run_games(2), serial)
+
+    def test_duplicate_pairs_share_deals(self):
+        collector = simulation.RecordCollector()
+        simulation._init_worker(RandomStrategy(), BasicStrategy(), 61, None, collector)
+        seed = simulation.game_seed(99, 1)
+        first = simulation.play_game((1, seed, False))
+        second = simulation.play_game((2, seed, True))
+        self.assertIsNotNone(first[3])
+        self.assertIsNotNone(second[3])
+
+        # the strategies swap seats but every seat is dealt the same cards
+        self.assertEqual([p[3] for p in first[3]['players']], ['AI-Random', 'AI-Basic'])
+        self.assertEqual([p[3] for p in second[3]['players']], ['AI-Basic', 'AI-Random'])
+        for r1, r2 in zip(first[3]['rounds'], second[3]['rounds']):
+            self.assertEqual(r1['dealer_index'], r2['dealer_index'])
+            self.assertEqual([h[1] for h in r1['hands']], [h[1] for h in r2['hands']])
+            self.assertEqual(r1['turn_up_card'], r2['turn_up_card'])
+
+        # results come back in player 1, player 2 order
+        self.assertEqual(second[2], [second[3]['players'][1][4], second[3]['players'][0][4]])
+
+    def test_duplicate_results(self):
+        results = {'p1_wins': 0, 'p2_wins': 0}
+        simulation.run_simulation(RandomStrategy(), BasicStrategy(), 7, 61, None, results, 5,
+                                  duplicate=True, db_path=None)
+        self.assertEqual(results['p1_wins'] + results['p2_wins'], 8)
+        self.assertEqual(results['pairs'], 4)
+        self.assertEqual(results['pair_wins'], results['p1_wins'])
+        p1_sweeps = results.get('p1_sweeps', 0)
+        splits = 4 - p1_sweeps - results.get('p2_sweeps', 0)
+        self.assertEqual(2 * p1_sweeps + splits, results['p1_wins'])
+
+    def test_sprt_stops_early(self):
+        results = {'p1_wins': 0, 'p2_wins': 0}
+        progress = []
+        simulation.run_simulation(OptimizedStrategy(), RandomStrategy(), 200, 61, None, results, 5,
+                                  db_path=None, stop=stats.SPRTStop(margin=0.2),
+                                  progress=lambda i, n, r: progress.append(i))
+        self.assertEqual(results['decision'], 'p1_better')
+        games = results['p1_wins'] + results['p2_wins']
+        self.assertLess(games, 200)
+        self.assertEqual(progress, list(range(1, games + 1)))
+
+    def test_stop_checked_after_whole_pairs(self):
+        results = {'p1_wins': 0, 'p2_wins': 0}
+        simulation.run_simulation(OptimizedStrategy(), RandomStrategy(), 200, 61, None, results, 5,
+                                  db_path=None, duplicate=True, stop=stats.SPRTStop(margin=0.2))
+        self.assertEqual(results['decision'], 'p1_better')
+        self.assertEqual(results['p1_wins'] + results['p2_wins'], 2 * results['pairs'])
+
+    def test_latency_tracked(self):
+        counts = []
+        for workers in (1, 2):
+            results = {'p1_wins': 0, 'p2_wins': 0}
+            simulation.run_simulation(RandomStrategy(), BasicStrategy(), 6, 61, None, results, 7,
+                                      workers=workers, db_path=None, duplicate=True, track_latency=True)
+            self.assertTrue(all(hist.count for hist in results['latency']))
+            counts.append([hist.count for hist in results['latency']])
+        # the same games make the same decisions wherever they are played
+        self.assertEqual(counts[0], counts[1])
+
+        results = {'p1_wins': 0, 'p2_wins': 0}
+        simulation.run_simulation(RandomStrategy(), BasicStrategy(), 2, 61, None, results, 7, db_path=None)
+        self.assertNotIn('latency', results)
+
+    def test_games_logged_through_one_writer(self):
+        for workers in (1, 2):
+            self.run_games(workers, num_games=6)
+        conn = sqlite3.connect('cribbage_log.db')
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM games WHERE completion = 'completed'").fetchone()[0], 12)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM game_players WHERE is_winner = 1").fetchone()[0], 12)
+        # every round of every game has both hands scored
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM round_hands WHERE hand_score IS NULL").fetchone()[0], 0)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM round_hands").fetchone()[0],
+                         2 * conn.execute("SELECT COUNT(*) FROM rounds").fetchone()[0])
+        conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
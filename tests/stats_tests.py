@@ -0,0 +1,58 @@
+import unittest
+from crib import stats
+
+
+class StatsTestCase(unittest.TestCase):
+
+    def test_proportion_ci(self):
+        p, half = stats.proportion_ci(60, 100)
+        self.assertAlmostEqual(p, 0.6)
+        self.assertAlmostEqual(half, 1.959964 * (0.6 * 0.4 / 100) ** 0.5, places=5)
+        self.assertEqual(stats.proportion_ci(0, 0), (0.0, 1.0))
+
+    def test_paired_ci(self):
+        # pairs won 2, 1, 1, 0 times by player 1: mean 1, sample variance 2/3
+        rate, half = stats.paired_ci(4, 6, 4)
+        self.assertAlmostEqual(rate, 0.5)
+        self.assertAlmostEqual(half, 1.959964 * (2 / 3 / 4) ** 0.5 / 2, places=5)
+
+    def test_all_splits_have_no_variance(self):
+        rate, half = stats.paired_ci(10, 10, 10)
+        self.assertEqual((rate, half), (0.5, 0.0))
+        self.assertEqual(stats.equivalent_games(rate, half), float('inf'))
+
+    def test_equivalent_games(self):
+        p, half = stats.proportion_ci(500, 1000)
+        self.assertAlmostEqual(stats.equivalent_games(p, half), 1000)
+
+
+    def test_win_rate_interval_uses_pairs(self):
+        results = {'p1_wins': 4, 'p2_wins': 4, 'pairs': 4, 'pair_wins': 4, 'pair_wins_sq': 6}
+        self.assertEqual(stats.win_rate_interval(results), stats.paired_ci(4, 6, 4))
+        del results['pairs']
+        self.assertEqual(stats.win_rate_interval(results), stats.proportion_ci(4, 8))
+
+
+class StoppingRuleTestCase(unittest.TestCase):
+
+    def test_sprt_bounds(self):
+        rule = stats.SPRTStop(margin=0.1, alpha=0.05)
+        # each net win adds log(0.6 / 0.4); log(19) needs 8 of them
+        self.assertIsNone(rule.check({'p1_wins': 17, 'p2_wins': 10}))
+        self.assertEqual(rule.check({'p1_wins': 18, 'p2_wins': 10}), 'p1_better')
+        self.assertEqual(rule.check({'p1_wins': 10, 'p2_wins': 18}), 'p2_better')
+
+    def test_sprt_rejects_bad_margin(self):
+        with self.assertRaises(ValueError):
+            stats.SPRTStop(margin=0.5)
+
+    def test_confidence_stop(self):
+        rule = stats.ConfidenceStop(half_width=0.05, min_games=100)
+        self.assertIsNone(rule.check({'p1_wins': 50, 'p2_wins': 0}))
+        # +/- 9.8% at 100 games, +/- 4.4% at 500
+        self.assertIsNone(rule.check({'p1_wins': 50, 'p2_wins': 50}))
+        self.assertEqual(rule.check({'p1_wins': 250, 'p2_wins': 250}), 'precision_reached')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import json
+import random
+import sqlite3
+import tempfile
+import unittest
+from crib import crib, simulation, trace
+from crib.ai_strategy import BasicStrategy, RandomStrategy
+from interface.interface import NullInterface
+
+
+def play(seed, tracer=None):
+    random.seed(seed)
+    players = [crib.AI_Player(BasicStrategy(), simulate=True), crib.AI_Player(RandomStrategy(), simulate=True)]
+    g = crib.Game(2, players, NullInterface(), target_score=61, db_path=None,
+                  rng=random.Random(seed), tracer=tracer)
+    g.play()
+    return g
+
+
+class TracerTestCase(unittest.TestCase):
+
+    def test_add_and_merge(self):
+        a, b = trace.Tracer(), trace.Tracer()
+        a.add(trace.PHASE, 'deal', 1.0, 1.5)
+        a.add(trace.PHASE, 'deal', 2.0, 2.25)
+        b.add(trace.PHASE, 'deal', 3.0, 4.0)
+        b.add(trace.LOG, 'crib', 3.0, 3.1)
+        a.merge(b)
+        self.assertEqual(a.stats[(trace.PHASE, 'deal')], [3, 1.75, 1.0])
+        self.assertEqual([row[:3] for row in a.summary()],
+                         [(trace.PHASE, 'deal', 3), (trace.LOG, 'crib', 1)])
+
+    def test_events_capped(self):
+        tracer = trace.Tracer(keep_events=True, max_events=2)
+        for i in range(3):
+            tracer.add(trace.PHASE, 'play', i, i + 0.5)
+        self.assertEqual(len(tracer.events), 2)
+        self.assertEqual(tracer.dropped, 1)
+        self.assertEqual(tracer.stats[(trace.PHASE, 'play')][0], 3)
+
+    def test_traced_game(self):
+        tracer = trace.Tracer(keep_events=True)
+        g = play(11, tracer)
+        # tracing does not change the game
+        self.assertEqual(g.score, play(11).score)
+
+        for phase in ('deal', 'crib', 'turn_up', 'play', 'score'):
+            self.assertEqual(tracer.stats[(trace.PHASE, phase)][0], g.round_number)
+        self.assertEqual(tracer.stats[(trace.STRATEGY, 'AI-Basic.choose_crib_cards')][0], g.round_number)
+        self.assertIn((trace.STRATEGY, 'AI-Random.choose_play_card'), tracer.stats)
+        self.assertEqual(tracer.stats[(trace.LOG, 'score_hands')][0], g.round_number)
+        self.assertEqual(tracer.stats[(trace.INTERFACE, 'show_turn_up')][0], g.round_number)
+
+        events = tracer.chrome_trace()['traceEvents']
+        self.assertEqual(len(events), sum(calls for calls, _, _ in tracer.stats.values()))
+        self.assertEqual(min(e['ts'] for e in events), 0)
+        self.assertTrue(all(e['ph'] == 'X' and e['dur'] >= 0 for e in events))
+
+
+class SimulationTraceTestCase(unittest.TestCase):
+
+    def test_timings_and_chrome_trace(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'log.db')
+            trace_path = os.path.join(tmp, 'trace.json')
+            results = {'p1_wins': 0, 'p2_wins': 0}
+            simulation.run_simulation(BasicStrategy(), RandomStrategy(), 4, 61, 7, results, 3,
+                                      workers=2, db_path=db_path, trace_path=trace_path)
+
+            conn = sqlite3.connect(db_path)
+            rows = dict(((category, name), (sim_id, calls)) for sim_id, category, name, calls in conn.execute(
+                "SELECT simulation_id, category, name, calls FROM timings"))
+            rounds = conn.execute("SELECT COUNT(*) FROM rounds").fetchone()[0]
+            conn.close()
+            self.assertEqual(rows[(trace.PHASE, 'play')], (7, rounds))
+            self.assertEqual(rows[(trace.LOG, 'close')], (7, 4))
+
+            with open(trace_path) as f:
+                events = json.load(f)['traceEvents']
+            self.assertEqual(sum(1 for e in events if e['name'] == 'close'), 4)
+            self.assertEqual(results['tracer'].stats[(trace.PHASE, 'play')][0], rounds)
+
+
+if __name__ == '__main__':
+    unittest.main()